@@ -0,0 +1,225 @@
+"""
+离线批量分析录制的车内视频：视线、头部姿态、手势。
+
+用法（在 backend 目录下）：
+    python batch_analyze.py -v drive1.mp4 drive2.mp4 -o batch_results
+    python batch_analyze.py -v drive1.mp4 --format parquet --workers 4
+
+每段视频按工作进程数切成几段连续的帧，每个工作进程持有自己的 dlib 与 MediaPipe 模型，
+自行解码并顺序分析分到的一段；每段视频的逐帧结果写入一个 NPZ（或 Parquet）文件。
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+# 参数解析器
+ap = argparse.ArgumentParser(description="离线批量分析车内视频（视线/头部姿态/手势）")
+ap.add_argument("-v", "--video", nargs="+", required=True,
+                help="path(s) to input video files")
+ap.add_argument("-o", "--output-dir", default="batch_results",
+                help="directory for per-video result files")
+ap.add_argument("--format", choices=["npz", "parquet"], default="npz",
+                help="output format (parquet requires pyarrow)")
+ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                help="number of worker processes, one per core by default")
+ap.add_argument("--chunk-size", type=int, default=64,
+                help="number of frames a worker decodes at a time (affects memory only, not results)")
+ap.add_argument("--warmup", type=int, default=30,
+                help="frames before each part analysed only to warm up tracking and calibration")
+ap.add_argument("--detection-scale", type=float, default=0.5,
+                help="resolution ratio used for face detection")
+
+# 结果列：名称 -> dtype
+RESULT_COLUMNS = {
+    "frame_index": np.int64,
+    "timestamp": np.float64,
+    "face_found": np.bool_,
+    "gaze": np.str_,
+    "head": np.str_,
+    "gesture": np.str_,
+    "face_time": np.float32,
+    "gaze_time": np.float32,
+    "head_time": np.float32,
+    "gesture_time": np.float32,
+}
+
+# 每个工作进程自己的模型实例，由 _init_worker 创建
+_worker = None
+
+
+def _init_worker(detection_scale):
+    """进程池初始化：每个工作进程加载一份 dlib 与 MediaPipe 模型"""
+    global _worker
+    from sight.gaze_tracking import GazeTracking, FaceAnalysisContext
+    from sight.gaze_tracking.face_analysis import DEFAULT_PREDICTOR_PATH
+    from sight.headtrack import HeadTracker
+    from gesture.gesture import GestureEngine
+
+    _worker = {
+        "face_context": FaceAnalysisContext(detection_scale=detection_scale),
+        "gaze": GazeTracking(),
+        "headpose": HeadTracker(predictor_path=DEFAULT_PREDICTOR_PATH),
+        "gesture": GestureEngine(),
+    }
+
+
+def classify_gaze(gaze):
+    """与 MultiModalApp.detect_gaze 相同的视线方向判定"""
+    if gaze.look_down():
+        return '向下看'
+    elif gaze.look_right():
+        return '向右看'
+    elif gaze.look_left():
+        return '向左看'
+    elif gaze.look_center():
+        return '眼睛居中'
+    return '未检测到眼动'
+
+
+def _reset_worker():
+    """丢弃帧间状态：人脸跟踪、瞳孔阈值校准、点头/摇头计数和手势缓冲区"""
+    _worker["face_context"].reset()
+    _worker["gaze"].reset()
+    _worker["headpose"].reset()
+    _worker["gesture"].reset()
+
+
+def _analyze_frame(frame, timestamp):
+    """分析一帧，返回 (结果, 各阶段耗时)；帧间状态保存在工作进程的模型实例中"""
+    face_context = _worker["face_context"]
+    gaze = _worker["gaze"]
+    t0 = time.perf_counter()
+    face_context.refresh(frame)
+    t1 = time.perf_counter()
+    gaze.refresh(frame, face_context)
+    gaze_result = classify_gaze(gaze)
+    t2 = time.perf_counter()
+    head_result = _worker["headpose"].get_status(frame, face_context, now=timestamp)
+    t3 = time.perf_counter()
+    gesture_result = _worker["gesture"].process(frame).gesture
+    t4 = time.perf_counter()
+    return (face_context.face_located, gaze_result, head_result, gesture_result), (t1 - t0, t2 - t1, t3 - t2, t4 - t3)
+
+
+def read_frames(path, start, stop, chunk_size):
+    """
+    解码第 start 帧到第 stop 帧（不含，None 表示到结尾），每 chunk_size 帧产出一次
+    (起始帧号, 时间戳列表, 帧列表)。start 之前的帧用 grab() 跳过而不按帧号定位，
+    部分编码格式按帧号定位并不精确。
+    """
+    capture = cv2.VideoCapture(path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    index = 0
+    try:
+        while index < start and capture.grab():
+            index += 1
+        timestamps, frames = [], []
+        while stop is None or index < stop:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            timestamps.append(index / fps)
+            frames.append(frame)
+            index += 1
+            if len(frames) == chunk_size:
+                yield index - len(frames), timestamps, frames
+                timestamps, frames = [], []
+        if frames:
+            yield index - len(frames), timestamps, frames
+    finally:
+        capture.release()
+
+
+def analyze_part(path, start, stop, warmup, chunk_size):
+    """
+    在工作进程中顺序分析视频的一段连续帧 [start, stop)。
+    模型在工作进程初始化时只创建一次；每段开始时重置帧间状态，先分析 start 之前的
+    warmup 帧预热人脸跟踪、瞳孔校准、头部姿态和手势状态并丢弃其结果，之后状态在整段内延续。
+    chunk_size 只决定每次解码多少帧，不影响结果；跨块的点头、摇头和手势也不会丢失。
+    """
+    _reset_worker()
+    rows = {name: [] for name in RESULT_COLUMNS}
+    for chunk_start, timestamps, frames in read_frames(path, max(0, start - warmup), stop, chunk_size):
+        for offset, (timestamp, frame) in enumerate(zip(timestamps, frames)):
+            index = chunk_start + offset
+            (face_found, gaze_result, head_result, gesture_result), times = _analyze_frame(frame, timestamp)
+            if index < start:
+                continue
+            rows["frame_index"].append(index)
+            rows["timestamp"].append(timestamp)
+            rows["face_found"].append(face_found)
+            rows["gaze"].append(gaze_result)
+            rows["head"].append(head_result)
+            rows["gesture"].append(gesture_result)
+            rows["face_time"].append(times[0])
+            rows["gaze_time"].append(times[1])
+            rows["head_time"].append(times[2])
+            rows["gesture_time"].append(times[3])
+    return rows
+
+
+def split_frames(frame_count, parts):
+    """把 frame_count 帧切成 parts 段连续区间 [(start, stop)]，最后一段的 stop 为 None（读到结尾）"""
+    if frame_count <= 0 or parts <= 1 or frame_count < parts:
+        return [(0, None)]
+    bounds = [frame_count * i // parts for i in range(parts)]
+    return list(zip(bounds, bounds[1:] + [None]))
+
+
+def analyze_video(executor, path, chunk_size, parts, warmup):
+    """把一段视频切成 parts 段分发到进程池，每段由一个工作进程从头到尾顺序分析，按帧顺序合并结果"""
+    capture = cv2.VideoCapture(path)
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+
+    futures = [executor.submit(analyze_part, path, start, stop, warmup, chunk_size)
+               for start, stop in split_frames(frame_count, parts)]
+    results = {name: [] for name in RESULT_COLUMNS}
+    for future in futures:
+        rows = future.result()
+        for name in RESULT_COLUMNS:
+            results[name].extend(rows[name])
+    return {name: np.array(values, dtype=RESULT_COLUMNS[name]) for name, values in results.items()}
+
+
+def write_results(columns, output_path, fmt):
+    """把逐帧结果写为列式文件"""
+    if fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("输出 Parquet 需要安装 pyarrow：pip install pyarrow")
+        table = pa.table({name: pa.array(values.tolist()) if values.dtype.kind == "U" else values
+                          for name, values in columns.items()})
+        pq.write_table(table, output_path)
+    else:
+        np.savez_compressed(output_path, **columns)
+
+
+def main():
+    arguments = vars(ap.parse_args())
+    os.makedirs(arguments["output_dir"], exist_ok=True)
+    workers = max(1, arguments["workers"])
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(arguments["detection_scale"],)) as executor:
+        for path in arguments["video"]:
+            start = time.time()
+            columns = analyze_video(executor, path, max(1, arguments["chunk_size"]), workers,
+                                    max(0, arguments["warmup"]))
+            name = os.path.splitext(os.path.basename(path))[0]
+            output_path = os.path.join(arguments["output_dir"], f"{name}.{arguments['format']}")
+            write_results(columns, output_path, arguments["format"])
+            elapsed = time.time() - start
+            frame_count = len(columns["frame_index"])
+            fps = frame_count / elapsed if elapsed > 0 else 0
+            print(f"{path}: {frame_count} 帧，耗时 {elapsed:.1f}s（{fps:.1f} FPS），结果已写入 {output_path}")
+
+
+if __name__ == '__main__':
+    main()
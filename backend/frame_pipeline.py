@@ -0,0 +1,132 @@
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+
+class FrameRingBuffer:
+    """
+    有界环形帧缓冲区。
+    采集线程写入，推理线程读取；写满时丢弃最旧的帧，读取时只取最新的一帧并丢弃更早的帧，
+    保证推理总是处理最新的画面。
+    """
+    def __init__(self, capacity=2):
+        self.frames = deque(maxlen=capacity)
+        self.dropped = 0
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """取出最新的一帧并丢弃更早的帧，超时返回 None"""
+        with self._cond:
+            if not self.frames:
+                self._cond.wait(timeout)
+            if not self.frames:
+                return None
+            item = self.frames.pop()
+            self.dropped += len(self.frames)
+            self.frames.clear()
+            return item
+
+    def clear(self):
+        with self._cond:
+            self.frames.clear()
+
+
+class CaptureThread(threading.Thread):
+    """专用摄像头采集线程，把 (source_id, 采集时间, frame) 写入环形缓冲区"""
+    def __init__(self, frame_buffer, src=0):
+        super().__init__(daemon=True)
+        self.frame_buffer = frame_buffer
+        self.cap = cv2.VideoCapture(src)
+        self.source_id = 0
+        self._cap_lock = threading.Lock()
+        self._running = threading.Event()
+        self._running.set()
+
+    def run(self):
+        while self._running.is_set():
+            with self._cap_lock:
+                ret, frame = self.cap.read()
+                source_id = self.source_id
+            if not ret:
+                time.sleep(0.03)
+                continue
+            self.frame_buffer.put((source_id, time.time(), frame))
+
+    def switch_source(self, src):
+        """切换摄像头；推理线程通过 source_id 的变化感知切换"""
+        with self._cap_lock:
+            self.cap.release()
+            self.cap = cv2.VideoCapture(src)
+            self.source_id += 1
+        self.frame_buffer.clear()
+
+    def stop(self):
+        self._running.clear()
+        self.join(timeout=1.0)
+        with self._cap_lock:
+            self.cap.release()
+
+
+class InferenceWorker(threading.Thread):
+    """
+    推理调度线程：从环形缓冲区取帧，调用 analyze(frame, executor) 完成推理，
+    各识别器在线程池中对同一帧并发运行。结果只保留最新一份，由界面线程取走渲染。
+    推理失败时结果为 {'error': 异常, 'traceback': 堆栈文本, 'failures': 连续失败帧数}，由界面线程显示。
+    """
+    def __init__(self, frame_buffer, analyze, on_source_change=None, max_workers=3):
+        super().__init__(daemon=True)
+        self.frame_buffer = frame_buffer
+        self.analyze = analyze
+        self.on_source_change = on_source_change
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._result = None
+        self._result_lock = threading.Lock()
+        self._running = threading.Event()
+        self._running.set()
+        self._source_id = 0
+        self._failures = 0
+
+    def run(self):
+        while self._running.is_set():
+            item = self.frame_buffer.get(timeout=0.1)
+            if item is None:
+                continue
+            source_id, captured_at, frame = item
+            if source_id != self._source_id:
+                self._source_id = source_id
+                if self.on_source_change:
+                    self.on_source_change()
+            try:
+                result = self.analyze(frame, self.executor)
+            except Exception as e:
+                self._failures += 1
+                result = {'error': e, 'traceback': traceback.format_exc(), 'failures': self._failures}
+            else:
+                self._failures = 0
+            result['latency'] = time.time() - captured_at
+            with self._result_lock:
+                self._result = result
+
+    def take_result(self):
+        """取走最新的推理结果，没有新结果时返回 None"""
+        with self._result_lock:
+            result, self._result = self._result, None
+        return result
+
+    def stop(self):
+        """停止推理并等待进行中的帧推理完成，返回后识别器不再被调用，可以安全释放"""
+        self._running.clear()
+        if self.is_alive():
+            self.join()
+        self.executor.shutdown(wait=True)
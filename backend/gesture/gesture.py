@@ -2,6 +2,20 @@ import mediapipe as mp
 import cv2
 import numpy as np
 import time
+from collections import namedtuple
+
+NUM_LANDMARKS = 21
+# 批量计算的关节角三元组 (a, b, c)，角度以 b 为顶点：
+#   0    拇指 3-2-1（判断拇指是否伸展）
+#   1-4  食指~小指 指尖-远侧指间关节-近侧指间关节
+#   5-8  食指~小指 远侧指间关节-近侧指间关节-掌骨基部
+#   9    拇指 4-3-2（拇指关节角）
+JOINT_TRIPLETS = np.array(
+    [[3, 2, 1]]
+    + [[tip, tip - 1, tip - 2] for tip in (8, 12, 16, 20)]
+    + [[tip - 1, tip - 2, tip - 3] for tip in (8, 12, 16, 20)]
+    + [[4, 3, 2]]
+)
 
 class SignRe:
     def __init__(self):
@@ -10,7 +24,7 @@ class SignRe:
         self.mp_hands = mp.solutions.hands  # 手势识别的API
         # 定义指尖索引
         self.TIP_IDS = [4, 8, 12, 16, 20]  # 拇指、食指、中指、无名指、小指
-        self.cap = cv2.VideoCapture(0)
+        self.cap = None  # 仅在 start() 独立运行时打开摄像头，避免与主程序抢占设备
         self.image = None
         self.gesV = False
         self.fingers = []
@@ -22,6 +36,7 @@ class SignRe:
         self.joints_angle_buffer = []
         self.print_interval = 3.0  # 设置为3秒
         self.gesture_buffer = []
+        self._points = np.empty((2, NUM_LANDMARKS, 3), dtype=np.float32)  # 两只手的关键点批数组，逐帧复用
 
     def calculate_angle(self, a, b, c):
         """计算三个点之间的角度"""
@@ -31,79 +46,72 @@ class SignRe:
         angle = np.degrees(np.arccos(cosine_angle))
         return angle
 
+    def landmarks_to_array(self, landmarks, out=None):
+        """把一只手的21个关键点转换为 (21,3) float32 数组"""
+        if hasattr(landmarks, 'landmark'):
+            landmarks = landmarks.landmark
+        if out is None:
+            out = np.empty((NUM_LANDMARKS, 3), dtype=np.float32)
+        out.reshape(-1)[:] = np.fromiter(
+            (v for lm in landmarks for v in (lm.x, lm.y, lm.z)),
+            dtype=np.float32, count=NUM_LANDMARKS * 3)
+        return out
+
+    def hands_to_batch(self, hands):
+        """把最多两只手的关键点写入复用的 (N,21,3) 批数组"""
+        if len(hands) > self._points.shape[0]:
+            self._points = np.empty((len(hands), NUM_LANDMARKS, 3), dtype=np.float32)
+        for i, hand_landmarks in enumerate(hands):
+            self.landmarks_to_array(hand_landmarks, out=self._points[i])
+        return self._points[:len(hands)]
+
+    @staticmethod
+    def batch_joint_angles(points):
+        """
+        对 (N,21,3) 关键点批量计算 JOINT_TRIPLETS 中所有关节角（度），返回 (N,10)
+        """
+        ba = points[:, JOINT_TRIPLETS[:, 0]] - points[:, JOINT_TRIPLETS[:, 1]]
+        bc = points[:, JOINT_TRIPLETS[:, 2]] - points[:, JOINT_TRIPLETS[:, 1]]
+        cosine = np.einsum('nkd,nkd->nk', ba, bc) / (
+            np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1))
+        return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+    def batch_finger_states(self, points):
+        """
+        批量计算每只手的五指伸展标志和拇指角度。
+
+        返回：
+            fingers (N,5) int 数组，1表示伸展；
+            thumb_angles (N,) 拇指与中指方向夹角（折叠到0-90度）；
+            thumb_joints_angles (N,) 拇指关节角
+        """
+        angles = self.batch_joint_angles(points)
+        fingers = np.empty((points.shape[0], 5), dtype=np.int64)
+        # 拇指需要特殊处理，因为它的方向与其他四指不同：大于150度则认为拇指伸展
+        fingers[:, 0] = angles[:, 0] > 150
+        # 其他四指：指尖-远侧指间关节-近侧指间关节 和 远侧指间关节-近侧指间关节-掌骨基部 两个角度都足够大
+        fingers[:, 1:] = (angles[:, 1:5] > 160) & (angles[:, 5:9] > 90)
+
+        # 拇指方向与中指方向（作为其他手指的参考方向）在图像平面内的夹角
+        thumb_direction = points[:, 4, :2] - points[:, 2, :2]
+        finger_direction = points[:, 12, :2] - points[:, 9, :2]
+        cosine = np.einsum('nd,nd->n', thumb_direction, finger_direction) / (
+            np.linalg.norm(thumb_direction, axis=-1) * np.linalg.norm(finger_direction, axis=-1))
+        thumb_angles = np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+        thumb_angles = np.where(thumb_angles > 90, 180 - thumb_angles, thumb_angles)
+        return fingers, thumb_angles, angles[:, 9]
+
     def finger_is_extended(self, landmarks, finger_tip_id):
         """检查指定的手指是否伸展"""
-        if finger_tip_id == self.TIP_IDS[0]:  # 对于拇指，用不同的方法判断
-            #print(self.TIP_IDS[0])
-            #thumb_I = landmarks[self.TIP_IDS[0]]
-            thumb_II = landmarks[self.TIP_IDS[0] - 1]
-            thumb_III = landmarks[self.TIP_IDS[0] - 2]
-            thumb_IV = landmarks[self.TIP_IDS[0] - 3]
-            #thumb_V = landmarks[self.TIP_IDS[0] - 4]
-
-            # 拇指需要特殊处理，因为它的方向与其他四指不同。
-            angle2 = self.calculate_angle(
-                np.array([thumb_II.x, thumb_II.y, thumb_II.z]),
-                np.array([thumb_III.x, thumb_III.y, thumb_III.z]),
-                np.array([thumb_IV.x, thumb_IV.y, thumb_IV.z])
-            )
-            return angle2 > 150  # 假设大于150度则认为拇指伸展
-
-        else:
-            finger_tip = landmarks[finger_tip_id]
-            finger_dip = landmarks[finger_tip_id - 1]
-            finger_pip = landmarks[finger_tip_id - 2]
-            finger_mcp = landmarks[finger_tip_id - 3]
-
-            # 计算两个角度: 指尖-远侧指间关节-近侧指间关节 和 远侧指间关节-近侧指间关节-掌骨基部
-            angle_tip = self.calculate_angle(
-                np.array([finger_tip.x, finger_tip.y, finger_tip.z]),
-                np.array([finger_dip.x, finger_dip.y, finger_dip.z]),
-                np.array([finger_pip.x, finger_pip.y, finger_pip.z])
-            )
-
-            angle_dip = self.calculate_angle(
-                np.array([finger_dip.x, finger_dip.y, finger_dip.z]),
-                np.array([finger_pip.x, finger_pip.y, finger_pip.z]),
-                np.array([finger_mcp.x, finger_mcp.y, finger_mcp.z])
-            )
-
-            # 如果两个角度都足够大，则认为手指伸展
-            return angle_tip > 160 and angle_dip > 90
+        points = self.landmarks_to_array(landmarks)[np.newaxis]
+        fingers, _, _ = self.batch_finger_states(points)
+        return bool(fingers[0, self.TIP_IDS.index(finger_tip_id)])
 
-    def calculate_thumb_angle_with_fingers(self, landmarks):
-        # 计算拇指与其他手指的夹角
-        thumb_direction = np.array([
-            landmarks[4].x - landmarks[2].x,
-            landmarks[4].y - landmarks[2].y
-        ])
-        
-        # 使用中指作为其他手指的参考方向
-        finger_direction = np.array([
-            landmarks[12].x - landmarks[9].x,
-            landmarks[12].y - landmarks[9].y
-        ])
-        
-        # 计算夹角（度数）
-        angle = np.degrees(np.arccos(
-            np.clip(np.dot(thumb_direction, finger_direction) / 
-            (np.linalg.norm(thumb_direction) * np.linalg.norm(finger_direction)), -1.0, 1.0)
-        ))
-        
-        if angle > 90:
-            angle = 180 - angle
-        
-       
-        thumb_angle_joints = self.calculate_angle(
-            np.array([landmarks[4].x, landmarks[4].y, landmarks[4].z]),
-            np.array([landmarks[3].x, landmarks[3].y, landmarks[3].z]),
-            np.array([landmarks[2].x, landmarks[2].y, landmarks[2].z])
-        )
-        
-       
+    def _record_thumb_angles(self, angle, thumb_angle_joints):
+        """累积拇指角度，每隔 print_interval 秒输出一次缓冲区中最常见的手势"""
         self.angle_buffer.append(angle)
         self.joints_angle_buffer.append(thumb_angle_joints)
-        
+
         # 每3秒计算并输出一次平均值
         current_time = time.time()
         if current_time - self.last_angle_print_time >= self.print_interval:
@@ -111,47 +119,70 @@ class SignRe:
                 avg_angle = sum(self.angle_buffer) / len(self.angle_buffer)
                 avg_joints_angle = sum(self.joints_angle_buffer) / len(self.joints_angle_buffer)
               #  print(f" 拇指关节角度: {avg_joints_angle:.2f}度, 与其他手指夹角: {avg_angle:.2f}度")
-                
+
                 # 基于平均值进行手势判断
                 if self.gesture_buffer:
                     most_common_gesture = max(set(self.gesture_buffer), key=self.gesture_buffer.count)
                     print(f"识别到手势：{most_common_gesture}")
-                
+
                 # 清空所有缓冲区
                 self.angle_buffer = []
                 self.joints_angle_buffer = []
                 self.gesture_buffer = []
                 self.last_angle_print_time = current_time
-            
+
+    def calculate_thumb_angle_with_fingers(self, landmarks):
+        # 计算拇指与其他手指的夹角
+        points = self.landmarks_to_array(landmarks)[np.newaxis]
+        _, thumb_angles, thumb_joints_angles = self.batch_finger_states(points)
+        angle, thumb_angle_joints = float(thumb_angles[0]), float(thumb_joints_angles[0])
+        self._record_thumb_angles(angle, thumb_angle_joints)
         return angle, thumb_angle_joints
 
+    def ges_batch(self, hands):
+        """
+        批量识别多只手的手势：所有手的关键点堆叠成 (N,21,3) 后一次性完成向量化计算。
+
+        参数：
+            hands: hand_landmarks 列表（通常最多两只手）
+        返回：
+            每只手的手指伸展编码列表
+        """
+        if not hands:
+            return []
+        points = self.hands_to_batch(hands)
+        fingers, thumb_angles, thumb_joints_angles = self.batch_finger_states(points)
+
+        values = []
+        for k in range(len(hands)):
+            thumb_angle = float(thumb_angles[k])
+            thumb_joints_angle = float(thumb_joints_angles[k])
+            self._record_thumb_angles(thumb_angle, thumb_joints_angle)
+            self.fingers = fingers[k].tolist()
+
+            # 判断其他四指是否蜷缩
+            other_fingers_folded = self.fingers[1:] == [0, 0, 0, 0]
+
+            # 将手势判断结果存入缓冲区，不立即输出
+            if other_fingers_folded:
+                if thumb_angle < 45 and thumb_joints_angle < 160:
+                    self.gesture_buffer.append("握拳")
+                elif 45 <= thumb_angle <= 90 and thumb_joints_angle > 160:
+                    self.gesture_buffer.append("竖拇指")
+            elif self.fingers == [1, 1, 1, 1, 1]:
+                self.gesture_buffer.append("挥手")
+
+            values.append(int("".join(str(x) for x in self.fingers), 2))
+            self.fingers = []
+        return values
+
     def ges(self, hand_landmarks):
         """识别手势"""
-        for tip in self.TIP_IDS:
-            if self.finger_is_extended(hand_landmarks.landmark, tip):
-                self.fingers.append(1)
-            else:
-                self.fingers.append(0)
-
-        thumb_angle, thumb_joints_angle = self.calculate_thumb_angle_with_fingers(hand_landmarks.landmark)
-        
-        # 判断其他四指是否蜷缩
-        other_fingers_folded = self.fingers[1:] == [0, 0, 0, 0]
-        
-        # 将手势判断结果存入缓冲区，不立即输出
-        if other_fingers_folded:
-            if thumb_angle < 45 and thumb_joints_angle < 160:
-                self.gesture_buffer.append("握拳")
-            elif 45 <= thumb_angle <= 90 and thumb_joints_angle > 160:
-                self.gesture_buffer.append("竖拇指")
-        elif self.fingers == [1, 1, 1, 1, 1]:
-            self.gesture_buffer.append("挥手")
-
-        gesture_value = int("".join(str(x) for x in self.fingers), 2)
-        self.fingers = []
-        return gesture_value
+        return self.ges_batch([hand_landmarks])[0]
 
     def start(self):
+        if self.cap is None:
+            self.cap = cv2.VideoCapture(0)
         with self.mp_hands.Hands(
                 static_image_mode=False,  # False表示为视频流检测
                 max_num_hands=2,  # 最大可检测到两只手掌
@@ -250,6 +281,73 @@ class SignRe:
             return max(set(self.gesture_buffer), key=self.gesture_buffer.count)
         return None
 
+
+# 单帧手势识别结果：gesture 为手势名称（无则为'无手势'），values 为每只手的手指伸展编码
+GestureResult = namedtuple('GestureResult', ['gesture', 'hand_count', 'values'])
+
+
+class GestureEngine:
+    """
+    长生命周期的手势识别引擎。
+    整个程序运行期间只持有一个 mp_hands.Hands 实例，避免每帧重建 TFLite 计算图，
+    并让 MediaPipe 的跟踪模式（依赖帧间状态）真正生效，减少手掌检测的运行次数。
+    """
+    def __init__(self, sign=None, max_num_hands=2, model_complexity=0,
+                 min_detection_confidence=0.5, min_tracking_confidence=0.5):
+        self.sign = sign if sign is not None else SignRe()
+        self.hands_options = dict(
+            static_image_mode=False,  # False表示为视频流检测，启用跟踪模式
+            max_num_hands=max_num_hands,
+            model_complexity=model_complexity,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+        self.hands = None
+        self._open()
+
+    def _open(self):
+        self.hands = self.sign.mp_hands.Hands(**self.hands_options)
+
+    def process(self, frame):
+        """处理一帧 BGR 图像，返回 GestureResult"""
+        if self.hands is None:
+            raise RuntimeError("GestureEngine 已关闭")
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        rgb_frame.flags.writeable = False  # 只读传入，MediaPipe 可避免额外拷贝
+        results = self.hands.process(rgb_frame)
+        if not results.multi_hand_landmarks:
+            return GestureResult('无手势', 0, {})
+        values = {}
+        hand_values = self.sign.ges_batch(results.multi_hand_landmarks)
+        for i, value in enumerate(hand_values):
+            label = str(i)
+            if results.multi_handedness and i < len(results.multi_handedness):
+                label = results.multi_handedness[i].classification[0].label
+            values[label] = value
+        gesture = self.sign.get_last_gesture()
+        return GestureResult(gesture if gesture else '无手势', len(results.multi_hand_landmarks), values)
+
+    def reset(self):
+        """切换摄像头后调用：丢弃帧间跟踪状态和手势缓冲区"""
+        self.close()
+        self.sign.gesture_buffer = []
+        self.sign.angle_buffer = []
+        self.sign.joints_angle_buffer = []
+        self._open()
+
+    def close(self):
+        """释放 MediaPipe 计算图"""
+        if self.hands is not None:
+            self.hands.close()
+            self.hands = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
 if __name__ == "__main__":
     Sg = SignRe()
     Sg.start()
\ No newline at end of file
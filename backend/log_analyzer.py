@@ -1,10 +1,19 @@
 import re
 import datetime
 import json
+import os
+import sys
 import threading
 from collections import defaultdict, Counter
 from user_manager import UserManager
 
+# 日志分段轮转与 system 包共用同一实现：把仓库根目录追加到 sys.path 末尾，
+# 不会遮蔽 backend 目录下同名的 voice / sight / gesture 包
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+from system.log_rotation import SegmentedLog, open_segment
+
 # 新增
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
@@ -28,14 +37,49 @@ INTERACTION_MODES = {
     '场景': ['自由多模态识别', '分心检测', '导航确认', '音乐状态']
 }
 
+_LINE_PREFIX = re.compile(r'\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] (?:\[(.*?)\] )?')
+
+
+def parse_line_prefix(line):
+    """解析日志行开头的 [时间戳] [用户名]，返回 (时间戳, 用户名)；不以时间戳开头的行（续行、堆栈等）返回 None"""
+    match = _LINE_PREFIX.match(line)
+    if not match:
+        return None
+    try:
+        timestamp = datetime.datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+    return timestamp, match.group(2)
+
+
+def read_log_rows(f):
+    """逐行产出 log.txt 的 (时间戳, 用户名)，供分段统计使用，无法解析的行跳过"""
+    for line in f:
+        prefix = parse_line_prefix(line)
+        if prefix is not None:
+            yield prefix
+
+
+# log.txt 超过 10MB 或跨天时封存为 gzip 分段（log.txt_segments/），manifest.json 记录各分段的时间范围和用户
+log_segments = SegmentedLog(LOG_FILE, read_log_rows)
+
+
 class LogAnalyzer:
     """
     多模态交互日志分析工具
     用于分析用户交互行为、识别模式和提供系统改进建议
     """
-    def __init__(self, log_file=None):
+    def __init__(self, log_file=None, since=None, until=None):
+        """
+        参数:
+        log_file - 活动日志文件，默认 log.txt
+        since, until - 只加载该时间窗口内的日志（datetime，None 表示不限），只读取与窗口重叠的分段
+        """
         print("LogAnalyzer: 初始化开始...")
         self.log_file = log_file or LOG_FILE
+        self.segments = log_segments if log_file is None else SegmentedLog(log_file, read_log_rows)
+        self.since = since
+        self.until = until
         self.log_data = []
         self.user_sessions = defaultdict(list)
 
@@ -45,6 +89,7 @@ class LogAnalyzer:
 
         # self._lock = threading.Lock() # 暂时注释掉锁的初始化, FOR DEBUGGING
 
+        self.segments.recover() # 补登记上次退出时未完成封存的分段
         print("LogAnalyzer: 开始加载日志...")
         start_time_load_logs = datetime.datetime.now()
         self.load_logs()
@@ -78,28 +123,45 @@ class LogAnalyzer:
         return False
 
     def load_logs(self):
-        """加载并解析日志文件"""
+        """加载并解析日志：与时间窗口重叠的已封存分段（自动解压）加上当前的活动文件"""
         print("  load_logs: 开始执行...")
         processed_lines = 0
         start_time = datetime.datetime.now()
-        # with self._lock:  # 使用线程锁保护日志加载 - FOR DEBUGGING, lock is commented out in __init__
-        try:
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                print(f"  load_logs: 打开文件 {self.log_file} 成功.")
-                for i, line in enumerate(f):
-                    line_content = line.strip()
-                    print(f"  load_logs: 正在处理行 #{i+1}, 内容: '{line_content[:100]}'...") # 打印行号和部分内容，避免过长
-                    if line_content:
-                        self._parse_log_line(line_content) # 传递 strip 后的内容
-                        processed_lines += 1
-                    if (i + 1) % 200 == 0: # 每处理200行打印一次进度
-                        now = datetime.datetime.now()
-                        print(f"  load_logs: 已处理 {i + 1} 行... 当前耗时: {now - start_time}")
-        except FileNotFoundError:
+        # 日志时间戳精确到秒，窗口边界也按秒比较
+        since = self.since.replace(microsecond=0) if self.since else None
+        until = self.until.replace(microsecond=0) if self.until else None
+        paths = self.segments.segment_paths(self.since, self.until)
+        if not paths:
             print(f"  load_logs: 错误 - 日志文件 {self.log_file} 未找到。")
             return # 如果文件未找到，提前返回
-        except Exception as e:
-            print(f"  load_logs: 日志加载时发生错误: {e}")
+        # with self._lock:  # 使用线程锁保护日志加载 - FOR DEBUGGING, lock is commented out in __init__
+        for path in paths:
+            # 续行（多行消息、异常堆栈等）没有时间戳，跟随前一条带时间戳的记录决定是否在窗口内；
+            # 文件开头的续行找不到所属记录，只在不限时间窗口时保留
+            in_window = since is None and until is None
+            try:
+                with open_segment(path, encoding='utf-8') as f:
+                    print(f"  load_logs: 打开文件 {path} 成功.")
+                    for i, line in enumerate(f):
+                        line_content = line.strip()
+                        print(f"  load_logs: 正在处理行 #{i+1}, 内容: '{line_content[:100]}'...") # 打印行号和部分内容，避免过长
+                        prefix = parse_line_prefix(line_content)
+                        if prefix is not None:
+                            timestamp = prefix[0]
+                            in_window = (since is None or timestamp >= since) and (until is None or timestamp <= until)
+                        if not in_window:
+                            continue
+                        if line_content:
+                            self._parse_log_line(line_content) # 传递 strip 后的内容
+                            processed_lines += 1
+                        if (i + 1) % 200 == 0: # 每处理200行打印一次进度
+                            now = datetime.datetime.now()
+                            print(f"  load_logs: 已处理 {i + 1} 行... 当前耗时: {now - start_time}")
+            except FileNotFoundError:
+                # 读取期间活动文件刚好被轮转
+                print(f"  load_logs: 错误 - 日志文件 {path} 未找到。")
+            except Exception as e:
+                print(f"  load_logs: 日志加载时发生错误: {e}")
 
         end_time = datetime.datetime.now()
         print(f"  load_logs: 执行完毕。共处理有效日志行: {processed_lines}。总耗时: {end_time - start_time}")
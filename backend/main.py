@@ -11,21 +11,28 @@ import numpy as np
 from imutils import face_utils
 
 # 视觉识别
-from sight.gaze_tracking import GazeTracking
+from sight.gaze_tracking import GazeTracking, FaceAnalysisContext
+from sight.gaze_tracking.calibration import Calibration
 from sight.headtrack import HeadTracker
 #from sight.eyetrack import EyeTracker
 # 手势识别
-from gesture.gesture import SignRe
+from gesture.gesture import SignRe, GestureEngine
+from frame_pipeline import FrameRingBuffer, CaptureThread, InferenceWorker
 # 语音识别
 from voice import record
-from user_manager import UserManager
+from voice.prompts import PRIORITY_MUSIC, PRIORITY_PROMPT, PRIORITY_SAFETY
+from user_manager import UserManager, SYSTEM_ROLES
+from user_profile import UserProfile
 
 # 新增
-from log_analyzer import LogAnalyzer
+from log_analyzer import LogAnalyzer, log_segments
 from profile_analytics import ProfileAnalytics
 
 
 LOG_FILE = 'log.txt'
+LOG_ANALYSIS_WINDOW_DAYS = 30 # 启动时只加载最近 30 天的日志分段
+DETECTION_SCALE = 0.5  # 人脸检测分辨率比例
+CALIBRATION_DIR = 'gaze_calibration'  # 按用户保存的瞳孔阈值校准结果
 
 SCENES = [
     {
@@ -41,6 +48,7 @@ SCENES = [
         'color': '#ff3333',
         'audio1': r'E:\system\voice\temp\security_converted.wav',  # "已注意行车安全"
         'audio2': r'E:\system\voice\temp\look_straight.wav',      # "请立即目视前方"
+        'audio_priority': PRIORITY_SAFETY,  # 安全警告打断其他提示并暂停音乐
     },
     {
         'name': '场景2 导航确认',
@@ -50,6 +58,7 @@ SCENES = [
         'color2': '#ffd700',
         'audio1': r'E:\system\voice\temp\navigation_converted.wav',  # "已开启导航"
         'audio2': r'E:\system\voice\temp\navigation_converted.wav',
+        'audio_priority': PRIORITY_PROMPT,
     },
     {
         'name': '场景3 音乐状态',
@@ -59,6 +68,7 @@ SCENES = [
         'color2': '#ffd700',
         'audio1': r'E:\system\voice\temp\music1_converted.wav',  # 音乐播放
         'audio2': r'',
+        'audio_priority': PRIORITY_MUSIC,
     },
 ]
 
@@ -75,13 +85,16 @@ class HeadPoseDetector:
         self.nod_time = 0
         self.shake_time = 0
 
-    def get_pose(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_detector(gray, 0)
+    def get_pose(self, frame, face_context=None):
+        # 传入 FaceAnalysisContext 时直接复用本帧已预测好的特征点
+        if face_context is not None:
+            all_shapes = face_context.landmarks
+        else:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces = self.face_detector(gray, 0)
+            all_shapes = [face_utils.shape_to_np(self.landmark_predictor(gray, face)) for face in faces]
         status = '静止'
-        for face in faces:
-            shape = self.landmark_predictor(gray, face)
-            shape = face_utils.shape_to_np(shape)
+        for shape in all_shapes:
             # 点头检测（眉毛到下颌距离变化）
             brow = shape[21:27]  # 左右眉毛
             jaw = shape[6:11]    # 下颌
@@ -201,29 +214,47 @@ class MultiModalApp:
         # 用户管理
         self.user_manager = UserManager()
         self.create_user_panel()
+        self.register_driver_seat()
 
         # 初始化识别器
+        # 人脸检测与特征点预测每帧只做一次，由视线和头部姿态识别共享
+        # 跟踪模式：每5帧做一次完整人脸检测，其余帧用相关滤波跟踪器预测人脸区域；
+        # 检测在半分辨率上进行，特征点与瞳孔仍使用原分辨率
+        self.face_context = FaceAnalysisContext(detect_interval=5, detection_scale=DETECTION_SCALE)
         self.gaze = GazeTracking()
+        self.load_gaze_calibration()
+        self.load_voice_commands()
+        self.preload_scene_audio()
         self.gesture = SignRe()
+        # 整个程序生命周期只创建一个 MediaPipe Hands 实例
+        self.gesture_engine = GestureEngine(self.gesture)
         self.headpose = HeadTracker()
-        self.cap = cv2.VideoCapture(0)
+        # 采集 → 推理 → 渲染 流水线：采集和推理各自在后台线程运行，Tk 主线程只负责渲染
+        self.frame_buffer = FrameRingBuffer(capacity=2)
+        self.capture_thread = CaptureThread(self.frame_buffer, 0)
+        self.inference_worker = InferenceWorker(self.frame_buffer, self.analyze_frame,
+                                                on_source_change=self.on_camera_changed)
         #self.eyetracker = EyeTracker()
 
         self.last_gaze = ''
         self.last_gesture = ''
+        self.last_inference_error = None
         self.last_voice = ''
         self.last_gaze_type = ''
         self.last_gesture_type = ''
         self.last_voice_type = ''
         self.last_headpose = '静止'
 
+        self.capture_thread.start()
+        self.inference_worker.start()
         self.update_frame()
         # self.voice_thread = threading.Thread(target=self.voice_recognition_loop, daemon=True)
         # self.voice_thread.start()
         self.flash_timer()
 
         # 新增
-        self.log_analyzer = LogAnalyzer()
+        self.log_analyzer = LogAnalyzer(
+            since=datetime.datetime.now() - datetime.timedelta(days=LOG_ANALYSIS_WINDOW_DAYS))
         self.profile_analytics = ProfileAnalytics()
 
     # 新增
@@ -254,24 +285,39 @@ class MultiModalApp:
             else:
                 btn.config(bg='#e3eaf2', fg='#1a73e8')
 
-    def update_frame(self):
-        ret, frame = self.cap.read()
-        if not ret:
-            self.root.after(30, self.update_frame)
-            return
+    def analyze_frame(self, frame, executor):
+        """推理阶段（后台线程）：手势与人脸分析并发，头部姿态与视线在人脸分析后并发"""
+        # 手势识别
+        gesture_future = executor.submit(self.detect_gesture, frame)
 
+        # 人脸检测与特征点（视线、头部姿态共用）
+        self.face_context.refresh(frame)
 
         # 头部姿态
-        headpose_result = self.headpose.get_status(frame)
-        self.last_headpose = headpose_result
-
-        # 手势识别
-        gesture_result = self.detect_gesture(frame)
+        headpose_future = executor.submit(self.headpose.get_status, frame, self.face_context)
 
         # 目光区域
         # gaze_result = self.eyetracker.get_status(frame)
         # self.last_gaze = gaze_result# self.gaze.refresh(frame)
-        self.gaze.refresh(frame)
+        gaze_future = executor.submit(self.detect_gaze, frame)
+
+        gaze_result, show_frame = gaze_future.result()
+        headpose_result = headpose_future.result()
+        gesture_result = gesture_future.result()
+
+        # 画面缩放放在后台线程，界面线程只需生成 PhotoImage
+        display_frame = cv2.cvtColor(show_frame, cv2.COLOR_BGR2RGB)
+        img = Image.fromarray(display_frame)
+        img = img.resize((900, 480))
+        return {
+            'gaze': gaze_result,
+            'headpose': headpose_result,
+            'gesture': gesture_result,
+            'image': img,
+        }
+
+    def detect_gaze(self, frame):
+        self.gaze.refresh(frame, self.face_context)
         #frame = self.gaze.annotated_frame()
         gaze_result = ''
         if self.gaze.look_down():
@@ -284,18 +330,38 @@ class MultiModalApp:
             gaze_result = '眼睛居中'
         else:
             gaze_result = '未检测到眼动'
-        self.last_gaze = gaze_result
 
         # 画面显示
         #display_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         show_frame = self.gaze.annotated_frame()
         if show_frame is None:
             show_frame = frame
+        return gaze_result, show_frame
 
-        display_frame = cv2.cvtColor(show_frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(display_frame)
-        img = img.resize((900, 480))
-        imgtk = ImageTk.PhotoImage(image=img)
+    def update_frame(self):
+        """渲染阶段（Tk 主线程）：取最新推理结果，更新画面、场景逻辑和结果文本"""
+        result = self.inference_worker.take_result()
+        if result is None:
+            self.root.after(15, self.update_frame)
+            return
+        if 'error' in result:
+            self.show_inference_error(result)
+            self.root.after(15, self.update_frame)
+            return
+        if self.last_inference_error is not None:
+            # 推理恢复：清除错误提示，之后由场景逻辑更新状态栏
+            self.status_label.config(text='', fg='black')
+            self.last_inference_error = None
+
+        self.save_gaze_calibration()
+
+        gaze_result = result['gaze']
+        headpose_result = result['headpose']
+        gesture_result = result['gesture']
+        self.last_gaze = gaze_result
+        self.last_headpose = headpose_result
+
+        imgtk = ImageTk.PhotoImage(image=result['image'])
         self.video_label.imgtk = imgtk
         self.video_label.configure(image=imgtk)
 
@@ -315,24 +381,50 @@ class MultiModalApp:
         self.result_text.insert(tk.END, f'{self.last_voice}\n', 'value')
         self.result_text.config(state='disabled')
 
-        self.root.after(30, self.update_frame)
+        self.root.after(15, self.update_frame)
+
+    def _calibration_path(self):
+        username = self.user_manager.get_current_user().username
+        return os.path.join(CALIBRATION_DIR, f'{username}.json')
+
+    def load_gaze_calibration(self):
+        """加载当前用户的瞳孔阈值校准结果，已校准的用户启动时无需重新校准"""
+        self.gaze.calibration = Calibration.load(self._calibration_path())
+        self.calibration_saved = self.gaze.calibration.is_complete()
+
+    def save_gaze_calibration(self):
+        """校准刚完成时保存一次"""
+        if not self.calibration_saved and self.gaze.calibration.is_complete():
+            self.gaze.calibration.save(self._calibration_path())
+            self.calibration_saved = True
 
     def detect_gesture(self, frame):
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        with self.gesture.mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=2,
-            model_complexity=0,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        ) as hands:
-            results = hands.process(rgb_frame)
-            if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    self.gesture.ges(hand_landmarks)
-                gesture = self.gesture.get_last_gesture()
-                return gesture if gesture else '无手势'
-        return '无手势'
+        return self.gesture_engine.process(frame).gesture
+
+    def on_camera_changed(self):
+        """推理线程收到新摄像头的第一帧时调用：清除人脸跟踪和手势的帧间状态"""
+        self.face_context.reset()
+        self.gesture_engine.reset()
+
+    def switch_camera(self, src):
+        """切换摄像头；推理线程收到新摄像头的第一帧时会重置帧间跟踪状态"""
+        self.capture_thread.switch_source(src)
+
+    def on_close(self):
+        """关闭窗口时停止流水线，释放摄像头与 MediaPipe 资源"""
+        self.capture_thread.stop()
+        # 等推理线程和线程池中的任务都结束后再关闭 MediaPipe，避免关闭时仍有帧在推理
+        self.inference_worker.stop()
+        self.gesture_engine.close()
+        self.root.destroy()
+
+    def show_inference_error(self, result):
+        """推理失败时在状态栏提示；同一个错误连续出现时堆栈只输出一次"""
+        self.status_label.config(text=f"帧推理失败（连续 {result['failures']} 帧）: {result['error']}",
+                                 bg='#f0f4f8', fg='#c0392b')
+        if result['traceback'] != self.last_inference_error:
+            self.last_inference_error = result['traceback']
+            print(result['traceback'])
 
     def handle_scene_logic(self, gaze_result, headpose_result, gesture_result):
         scene = SCENES[self.scene_idx]
@@ -349,9 +441,10 @@ class MultiModalApp:
                     self.last_gaze_time = time.time()
                 elif time.time() - self.last_gaze_time > 3 and not self.warning_active:
                     self.warning_active = True
+                    # 先播放警告音再更新界面；以偏离满 3 秒的时刻作为触发时间，统计触发到播放的延迟
+                    record.play_audio(scene['audio1'], trigger_time=self.last_gaze_time + 3)
                     self.status_label.config(text='警告！请目视前方', bg=scene['color'], fg='white')
                     self.icon_label.config(text=scene['icon'], bg=scene['color'])
-                    record.play_audio(scene['audio1'])
                     self.log_result('警告', '请目视前方')
             else:
                 self.gaze_off_road = False
@@ -507,6 +600,8 @@ class MultiModalApp:
         now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         user = self.user_manager.get_current_user().username if hasattr(self, 'user_manager') and self.user_manager else 'unknown'
         log_line = f'[{now}] [{user}] {mode}: {content}\n'
+        # 超过大小上限或跨天时先封存当前文件，压缩在后台线程进行，不阻塞界面
+        log_segments.maybe_rotate(background=True)
         with open(LOG_FILE, 'a', encoding='utf-8') as f:
             f.write(log_line)
 
@@ -529,6 +624,27 @@ class MultiModalApp:
         username = self.user_var.get()
         self.user_manager.set_current_user(username)
         self.update_user_permission()
+        self.register_driver_seat()
+        self.load_gaze_calibration()
+        self.load_voice_commands()
+
+    def preload_scene_audio(self):
+        """启动时把各场景的提示音解码到内存，触发时立即播放"""
+        for scene in SCENES:
+            for key in ('audio1', 'audio2'):
+                if scene.get(key):
+                    record.prompts.register(scene[key], scene.get('audio_priority', PRIORITY_PROMPT))
+        record.prompts.preload()
+
+    def load_voice_commands(self):
+        """把当前用户的常用语音指令加入语音指令匹配索引"""
+        username = self.user_manager.get_current_user().username
+        record.set_user_commands(UserProfile(username).get('常用语音指令', []))
+
+    def register_driver_seat(self):
+        """把当前登录用户登记到驾驶位，驾驶位（以及单麦克风模式）的语音指令按其角色检查权限"""
+        user = self.user_manager.get_current_user()
+        record.assign_seat('driver', user.username, role=SYSTEM_ROLES.get(user.user_type))
 
     def update_user_permission(self):
         user = self.user_manager.get_current_user()
@@ -539,6 +655,7 @@ class MultiModalApp:
 if __name__ == '__main__':
     root = tk.Tk()
     app = MultiModalApp(root)
+    root.protocol('WM_DELETE_WINDOW', app.on_close)
 
     # 新增 等待主界面完成初始化后再启动线程
     def start_voice_thread():
@@ -1 +1,2 @@
 from .gaze_tracking import GazeTracking
+from .face_analysis import FaceAnalysisContext
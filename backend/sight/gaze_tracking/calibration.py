@@ -1,4 +1,6 @@
 from __future__ import division
+import json
+import os
 import cv2
 from .pupil import Pupil
 
@@ -9,15 +11,27 @@ class Calibration(object):
     best binarization threshold value for the person and the webcam.
     """
 
+    # 候选阈值（升序），虹膜占比随阈值单调不减，可以二分查找
+    CANDIDATE_THRESHOLDS = tuple(range(5, 100, 5))
+    AVERAGE_IRIS_SIZE = 0.48
+
     def __init__(self):
         self.nb_frames = 20
         self.thresholds_left = []
         self.thresholds_right = []
+        # 累计和用于维护滑动平均，避免每次 get_threshold 都重新求和
+        self._threshold_sums = [0, 0]
 
     def is_complete(self):
         """Returns true if the calibration is completed"""
         return len(self.thresholds_left) >= self.nb_frames and len(self.thresholds_right) >= self.nb_frames
 
+    def _thresholds(self, eye_side):
+        if eye_side == 0:
+            return self.thresholds_left
+        elif eye_side == 1:
+            return self.thresholds_right
+
     def get_threshold(self, eye_side):
         """
         返回给定眼睛的阈值。
@@ -25,10 +39,9 @@ class Calibration(object):
         参数：
             eye_side: 指示是左眼（0）还是右眼（1）
         """
-        if eye_side == 0:
-            return int(sum(self.thresholds_left) / len(self.thresholds_left))
-        elif eye_side == 1:
-            return int(sum(self.thresholds_right) / len(self.thresholds_right))
+        thresholds = self._thresholds(eye_side)
+        if thresholds is not None:
+            return int(self._threshold_sums[eye_side] / len(thresholds))
 
     @staticmethod
     def calculate_iris_size(eye_frame):
@@ -49,18 +62,49 @@ class Calibration(object):
         """
         计算用于二值化给定眼睛帧的最佳阈值。
 
+        双边滤波和腐蚀只做一次，各候选阈值只重复最后的二值化；
+        由于虹膜占比随阈值单调不减，用二分查找代替线性扫描，
+        结果与逐个尝试全部候选阈值相同（距离相同时取较小的阈值）。
+
         参数：
             eye_image (numpy.ndarray): 要分析的眼睛图像
         """
-        avg_iris_size = 0.48
-        trial_results = {}
+        preprocessed_image = Pupil.preprocess_eye_image(eye_image)
+        candidates = Calibration.CANDIDATE_THRESHOLDS
+        iris_sizes = {}
 
-        for threshold in range(5, 100, 5):
-            processed_image = Pupil.process_eye_image(eye_image, threshold)
-            trial_results[threshold] = Calibration.calculate_iris_size(processed_image)
+        def iris_size(index):
+            if index not in iris_sizes:
+                binary_image = Pupil.binarize(preprocessed_image, candidates[index])
+                iris_sizes[index] = Calibration.calculate_iris_size(binary_image)
+            return iris_sizes[index]
 
-        optimal_threshold, iris_size = min(trial_results.items(), key=lambda pair: abs(pair[1] - avg_iris_size))
-        return optimal_threshold
+        def first_index_at_least(value):
+            low, high = 0, len(candidates)
+            while low < high:
+                middle = (low + high) // 2
+                if iris_size(middle) < value:
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+
+        # 第一个虹膜占比 >= 平均值的阈值，以及它左边的那个阈值，二者之一最接近平均值
+        upper = first_index_at_least(Calibration.AVERAGE_IRIS_SIZE)
+        if upper == len(candidates):
+            best = upper - 1
+        elif upper == 0:
+            best = 0
+        elif abs(iris_size(upper - 1) - Calibration.AVERAGE_IRIS_SIZE) <= \
+                abs(iris_size(upper) - Calibration.AVERAGE_IRIS_SIZE):
+            best = upper - 1
+        else:
+            best = upper
+
+        # 占比相同的阈值距离也相同，取其中最小的阈值
+        if best > 0:
+            best = first_index_at_least(iris_size(best))
+        return candidates[best]
 
     def assess_calibration(self, eye_image, eye_side):
         """
@@ -70,9 +114,44 @@ class Calibration(object):
             eye_image (numpy.ndarray): 眼睛的图像
             eye_side: 指示是左眼（0）还是右眼（1）
         """
+        thresholds = self._thresholds(eye_side)
+        if thresholds is None:
+            return
         optimal_threshold = self.determine_optimal_threshold(eye_image)
+        thresholds.append(optimal_threshold)
+        self._threshold_sums[eye_side] += optimal_threshold
 
-        if eye_side == 0:
-            self.thresholds_left.append(optimal_threshold)
-        elif eye_side == 1:
-            self.thresholds_right.append(optimal_threshold)
\ No newline at end of file
+    def to_dict(self):
+        """导出校准结果，用于按用户持久化"""
+        return {
+            "nb_frames": self.nb_frames,
+            "thresholds_left": list(self.thresholds_left),
+            "thresholds_right": list(self.thresholds_right),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """由 to_dict() 的结果恢复校准状态"""
+        calibration = cls()
+        calibration.nb_frames = int(data.get("nb_frames", calibration.nb_frames))
+        calibration.thresholds_left = [int(t) for t in data.get("thresholds_left", [])]
+        calibration.thresholds_right = [int(t) for t in data.get("thresholds_right", [])]
+        calibration._threshold_sums = [sum(calibration.thresholds_left), sum(calibration.thresholds_right)]
+        return calibration
+
+    def save(self, path):
+        """把校准结果保存为 JSON 文件"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        """从 JSON 文件加载校准结果；文件不存在或损坏时返回一个未校准的实例"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError):
+            return cls()
@@ -4,6 +4,25 @@ import cv2
 from .pupil import Pupil
 
 
+class EyeBuffer(object):
+    """
+    Preallocated memory reused by Eye.extract_eye between frames, so that
+    isolating an eye does not allocate anything frame-sized.
+    """
+
+    def __init__(self, capacity=64 * 64):
+        self._mask = np.empty(capacity, np.uint8)
+        self._eye = np.empty(capacity, np.uint8)
+
+    def get(self, height, width):
+        """Returns contiguous (height, width) views for the mask and the isolated eye"""
+        size = height * width
+        if size > self._mask.size:
+            self._mask = np.empty(size, np.uint8)
+            self._eye = np.empty(size, np.uint8)
+        return self._mask[:size].reshape(height, width), self._eye[:size].reshape(height, width)
+
+
 class Eye(object):
     """
     This class creates a new frame to isolate the eye and
@@ -13,12 +32,13 @@ class Eye(object):
     LEFT_EYE_POINTS = [36, 37, 38, 39, 40, 41]
     RIGHT_EYE_POINTS = [42, 43, 44, 45, 46, 47]
 
-    def __init__(self, original_frame, landmarks, side, calibration):
+    def __init__(self, original_frame, landmarks, side, calibration, buffer=None):
         self.frame = None
         self.origin = None
         self.center = None
         self.pupil = None
         self.landmark_points = None
+        self._buffer = buffer
 
         self._analyze(original_frame, landmarks, side, calibration)
 
@@ -47,21 +67,27 @@ class Eye(object):
         eye_region = eye_region.astype(np.int32)
         self.landmark_points = eye_region
 
-        # 应用掩模以仅获取眼睛部分
+        # 先确定裁剪区域，只在眼睛的包围框内构建掩模，不再分配整帧大小的数组
+        crop_margin = 5
         frame_height, frame_width = img_frame.shape[:2]
-        black_background = np.zeros((frame_height, frame_width), np.uint8)
-        mask_layer = np.full((frame_height, frame_width), 255, np.uint8)
-        cv2.fillPoly(mask_layer, [eye_region], (0, 0, 0))
-        isolated_eye = cv2.bitwise_not(black_background, img_frame.copy(), mask=mask_layer)
+        min_x = max(0, int(np.min(eye_region[:, 0])) - crop_margin)
+        max_x = min(frame_width, int(np.max(eye_region[:, 0])) + crop_margin)
+        min_y = max(0, int(np.min(eye_region[:, 1])) - crop_margin)
+        max_y = min(frame_height, int(np.max(eye_region[:, 1])) + crop_margin)
+        crop_height, crop_width = max(0, max_y - min_y), max(0, max_x - min_x)
+
+        if self._buffer is not None:
+            mask_layer, isolated_eye = self._buffer.get(crop_height, crop_width)
+        else:
+            mask_layer = np.empty((crop_height, crop_width), np.uint8)
+            isolated_eye = np.empty((crop_height, crop_width), np.uint8)
 
-        # 对眼睛进行裁剪
-        crop_margin = 5
-        min_x = np.min(eye_region[:, 0]) - crop_margin
-        max_x = np.max(eye_region[:, 0]) + crop_margin
-        min_y = np.min(eye_region[:, 1]) - crop_margin
-        max_y = np.max(eye_region[:, 1]) + crop_margin
+        # 应用掩模以仅获取眼睛部分：眼睛多边形内保留原像素，其余置为白色
+        mask_layer.fill(255)
+        cv2.fillPoly(mask_layer, [eye_region - np.int32((min_x, min_y))], (0, 0, 0))
+        cv2.bitwise_or(img_frame[min_y:max_y, min_x:max_x], mask_layer, dst=isolated_eye)
 
-        self.frame = isolated_eye[min_y:max_y, min_x:max_x]
+        self.frame = isolated_eye
         self.origin = (min_x, min_y)
 
         eye_height, eye_width = self.frame.shape[:2]
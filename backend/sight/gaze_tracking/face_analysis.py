@@ -0,0 +1,186 @@
+import os
+import cv2
+import dlib
+from imutils import face_utils
+
+
+DEFAULT_PREDICTOR_PATH = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), "trained_models/shape_predictor_68_face_landmarks.dat"))
+
+
+def scale_rect(rect, factor):
+    """按比例缩放 dlib 矩形，用于把低分辨率上的检测结果映射回原图"""
+    return dlib.rectangle(int(round(rect.left() * factor)), int(round(rect.top() * factor)),
+                          int(round(rect.right() * factor)), int(round(rect.bottom() * factor)))
+
+
+def to_full_resolution(rect, scale):
+    """把在 scale 比例图像上得到的矩形映射回原分辨率；scale >= 1 时原样返回"""
+    if scale >= 1.0:
+        return rect
+    return scale_rect(rect, 1.0 / scale)
+
+
+def downscale(gray, scale):
+    """按 scale 缩小灰度图；scale >= 1 时原样返回"""
+    if scale >= 1.0:
+        return gray
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def detect_faces(face_detector, gray, scale=1.0):
+    """
+    在缩小后的灰度图上运行 HOG 人脸检测，并把人脸矩形映射回原分辨率。
+    HOG 检测的开销大致随 scale 的平方下降，特征点和瞳孔仍在原分辨率上计算。
+
+    参数：
+        face_detector: dlib.get_frontal_face_detector() 返回的检测器
+        gray (numpy.ndarray): 原分辨率灰度图
+        scale (float): 检测分辨率相对原图的比例，1.0 表示不缩放
+    """
+    faces = face_detector(downscale(gray, scale), 0)
+    return [to_full_resolution(face, scale) for face in faces]
+
+
+class FaceAnalysisContext(object):
+    """
+    每帧只做一次灰度转换、人脸检测和68点特征点预测，
+    结果由 GazeTracking、HeadTracker 和 HeadPoseDetector 共享，
+    避免每个识别器各自跑一遍 HOG 检测器和 shape_predictor。
+    """
+
+    def __init__(self, predictor_path=DEFAULT_PREDICTOR_PATH, detect_interval=1, min_tracking_confidence=7.0,
+                 detection_scale=1.0, tracking_padding=0.1):
+        """
+        参数：
+            predictor_path (str): 68点特征点模型路径
+            detection_scale (float): 人脸检测与跟踪使用的分辨率比例（如 0.5），
+                特征点仍在原分辨率灰度图上预测
+            detect_interval (int): 跟踪模式下每隔多少帧运行一次完整的 HOG 人脸检测，
+                1 表示每帧都检测（不启用跟踪）
+            min_tracking_confidence (float): 相关滤波跟踪器的置信度（PSR）低于该值时
+                立即回退到完整检测
+            tracking_padding (float): 跟踪器的跟踪区域在人脸矩形每边向外扩展的比例（相对宽高），
+                让相关滤波器包含脸部轮廓和一部分背景；交给 shape_predictor 的仍是去掉扩展后的人脸矩形，
+                与 HOG 检测框的尺度一致
+        """
+        self.frame = None
+        self.gray = None
+        self.faces = []
+        self.shapes = []
+        self.landmarks = []
+        self.detected = False  # 本帧是否运行了完整检测
+        self.tracking_confidence = None
+
+        self.detection_scale = detection_scale
+        self._detection_gray = None
+        self.detect_interval = max(1, int(detect_interval))
+        self.min_tracking_confidence = min_tracking_confidence
+        self.tracking_padding = tracking_padding
+        self._trackers = []
+        self._frames_since_detection = 0
+
+        # _face_detector is used to detect faces
+        self._face_detector = dlib.get_frontal_face_detector()
+
+        # _predictor is used to get facial landmarks of a given face
+        self._predictor = dlib.shape_predictor(predictor_path)
+
+    @property
+    def face_located(self):
+        """Check that at least one face has been detected"""
+        return len(self.faces) > 0
+
+    @property
+    def face(self):
+        """Returns the rectangle of the first detected face (the driver)"""
+        return self.faces[0] if self.faces else None
+
+    @property
+    def shape(self):
+        """Returns the dlib landmarks of the first detected face"""
+        return self.shapes[0] if self.shapes else None
+
+    @property
+    def points(self):
+        """Returns the (68, 2) landmark array of the first detected face"""
+        return self.landmarks[0] if self.landmarks else None
+
+    def refresh(self, frame):
+        """
+        分析新的一帧：转换灰度图、检测人脸并预测特征点。
+
+        参数：
+            frame (numpy.ndarray): 摄像头传入的 BGR 帧
+        """
+        self.frame = frame
+        self.gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # 检测和跟踪共用同一张缩小后的灰度图
+        self._detection_gray = downscale(self.gray, self.detection_scale)
+
+        faces = None
+        if self._trackers and self._frames_since_detection < self.detect_interval:
+            faces = self._track_faces()
+        if faces is None:
+            faces = self._detect_faces()
+
+        self.faces = faces
+        self.shapes = [self._predictor(self.gray, face) for face in self.faces]
+        self.landmarks = [face_utils.shape_to_np(shape) for shape in self.shapes]
+        return self
+
+    def reset(self):
+        """丢弃跟踪状态，下一帧强制运行完整检测（例如切换摄像头之后）"""
+        self._trackers = []
+        self._frames_since_detection = 0
+
+    def _detect_faces(self):
+        """在整帧上运行 HOG 检测器，并用检测结果重新初始化跟踪器"""
+        small_faces = list(self._face_detector(self._detection_gray, 0))
+        self.detected = True
+        self.tracking_confidence = None
+        self._frames_since_detection = 1
+        self._trackers = []
+        if self.detect_interval > 1:
+            for face in small_faces:
+                tracker = dlib.correlation_tracker()
+                tracker.start_track(self._detection_gray, self._pad(face))
+                self._trackers.append(tracker)
+        return [to_full_resolution(face, self.detection_scale) for face in small_faces]
+
+    def _pad(self, face):
+        """跟踪区域：人脸矩形每边按 tracking_padding 向外扩展（可以超出画面）"""
+        pad_x = face.width() * self.tracking_padding
+        pad_y = face.height() * self.tracking_padding
+        return dlib.drectangle(face.left() - pad_x, face.top() - pad_y, face.right() + pad_x, face.bottom() + pad_y)
+
+    def _track_faces(self):
+        """
+        用相关滤波跟踪器预测人脸位置，特征点随后在该区域内预测。
+        跟踪区域去掉 tracking_padding 的扩展还原为人脸矩形，裁剪到画面内后交给 shape_predictor。
+        任一跟踪器置信度过低或人脸移出画面时返回 None，由调用方回退到完整检测。
+        """
+        frame_height, frame_width = self._detection_gray.shape[:2]
+        faces = []
+        confidence = None
+        for tracker in self._trackers:
+            tracker_confidence = tracker.update(self._detection_gray)
+            confidence = tracker_confidence if confidence is None else min(confidence, tracker_confidence)
+            if tracker_confidence < self.min_tracking_confidence:
+                return None
+            position = tracker.get_position()
+            # 扩展后的宽度是人脸宽度的 (1 + 2 * padding) 倍
+            inset = self.tracking_padding / (1 + 2 * self.tracking_padding)
+            inset_x = position.width() * inset
+            inset_y = position.height() * inset
+            left = max(0, int(round(position.left() + inset_x)))
+            top = max(0, int(round(position.top() + inset_y)))
+            right = min(frame_width - 1, int(round(position.right() - inset_x)))
+            bottom = min(frame_height - 1, int(round(position.bottom() - inset_y)))
+            if right - left < 10 or bottom - top < 10:
+                return None
+            faces.append(to_full_resolution(dlib.rectangle(left, top, right, bottom), self.detection_scale))
+        self.detected = False
+        self.tracking_confidence = confidence
+        self._frames_since_detection += 1
+        return faces
@@ -2,8 +2,9 @@ from __future__ import division
 import os
 import cv2
 import dlib
-from .eye import Eye
+from .eye import Eye, EyeBuffer
 from .calibration import Calibration
+from .face_analysis import detect_faces
 
 
 class GazeTracking(object):
@@ -13,11 +14,19 @@ class GazeTracking(object):
     and pupils and allows to know if the eyes are open or closed
     """
 
-    def __init__(self):
+    def __init__(self, detection_scale=1.0):
+        """
+        Arguments:
+            detection_scale (float): Resolution ratio used for face detection,
+                landmarks and pupils are still computed at full resolution
+        """
         self.frame = None
+        self.detection_scale = detection_scale
         self.eye_left = None
         self.eye_right = None
         self.calibration = Calibration()
+        # 左右眼各自复用的裁剪缓冲区
+        self._eye_buffers = (EyeBuffer(), EyeBuffer())
 
         # _face_detector is used to detect faces
         self._face_detector = dlib.get_frontal_face_detector()
@@ -39,28 +48,52 @@ class GazeTracking(object):
         except Exception:
             return False
 
-    def _analyze(self):
-        """Detects the face and initialize Eye objects"""
+    def _analyze(self, face_context=None):
+        """Detects the face and initialize Eye objects
+
+        Arguments:
+            face_context (FaceAnalysisContext): Shared per-frame face analysis, if any
+        """
+        if face_context is not None:
+            frame = face_context.gray
+            landmarks = face_context.shape
+            if landmarks is None:
+                self.eye_left = None
+                self.eye_right = None
+            else:
+                self.eye_left = Eye(frame, landmarks, 0, self.calibration, self._eye_buffers[0])
+                self.eye_right = Eye(frame, landmarks, 1, self.calibration, self._eye_buffers[1])
+            return
+
         frame = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
-        faces = self._face_detector(frame)
+        faces = detect_faces(self._face_detector, frame, self.detection_scale)
 
         try:
             landmarks = self._predictor(frame, faces[0])
-            self.eye_left = Eye(frame, landmarks, 0, self.calibration)
-            self.eye_right = Eye(frame, landmarks, 1, self.calibration)
+            self.eye_left = Eye(frame, landmarks, 0, self.calibration, self._eye_buffers[0])
+            self.eye_right = Eye(frame, landmarks, 1, self.calibration, self._eye_buffers[1])
 
         except IndexError:
             self.eye_left = None
             self.eye_right = None
 
-    def refresh(self, frame):
+    def refresh(self, frame, face_context=None):
         """Refreshes the frame and analyzes it.
 
         Arguments:
             frame (numpy.ndarray): The frame to analyze
+            face_context (FaceAnalysisContext): Optional context already refreshed
+                with this frame; its gray image and landmarks are reused instead
+                of running face detection again
         """
         self.frame = frame
-        self._analyze()
+        self._analyze(face_context)
+
+    def reset(self):
+        """丢弃瞳孔阈值校准，之后的帧重新校准（例如开始分析一段新视频时）"""
+        self.calibration = Calibration()
+        self.eye_left = None
+        self.eye_right = None
 
     def get_left_eye_position(self):
         """Returns the coordinates of the left pupil"""
@@ -17,15 +17,16 @@ class Pupil(object):
         self.detect_iris(eye_frame)
 
     @staticmethod
-    def process_eye_image(eye_frame, threshold):
-        """Performs operations on the eye frame to isolate the iris
+    def preprocess_eye_image(eye_frame):
+        """Filters and erodes the eye frame. This part does not depend on the
+        threshold, so calibration computes it once and reuses it for every
+        candidate threshold.
 
         Arguments:
             eye_frame (numpy.ndarray): Frame containing an eye and nothing else
-            threshold (int): Threshold value used to binarize the eye frame
 
         Returns:
-            A frame with a single element representing the iris
+            The filtered and eroded eye frame
         """
         # 创建一个3x3的结构元素
         structuring_element = np.ones((3, 3), np.uint8)
@@ -34,13 +35,32 @@ class Pupil(object):
         filtered_eye_image = cv2.bilateralFilter(eye_frame, 10, 15, 15)
 
         # 使用结构元素对图像进行腐蚀操作，以去除小的干扰
-        eroded_image = cv2.erode(filtered_eye_image, structuring_element, iterations=3)
+        return cv2.erode(filtered_eye_image, structuring_element, iterations=3)
+
+    @staticmethod
+    def binarize(preprocessed_eye, threshold):
+        """Binarizes a frame returned by preprocess_eye_image
 
+        Arguments:
+            preprocessed_eye (numpy.ndarray): Filtered and eroded eye frame
+            threshold (int): Threshold value used to binarize the eye frame
+        """
         # 使用给定的阈值对图像进行二值化处理
-        binary_image = cv2.threshold(eroded_image, threshold, 255, cv2.THRESH_BINARY)[1]
+        return cv2.threshold(preprocessed_eye, threshold, 255, cv2.THRESH_BINARY)[1]
+
+    @staticmethod
+    def process_eye_image(eye_frame, threshold):
+        """Performs operations on the eye frame to isolate the iris
+
+        Arguments:
+            eye_frame (numpy.ndarray): Frame containing an eye and nothing else
+            threshold (int): Threshold value used to binarize the eye frame
 
+        Returns:
+            A frame with a single element representing the iris
+        """
         # 返回处理后的二值化图像
-        return binary_image
+        return Pupil.binarize(Pupil.preprocess_eye_image(eye_frame), threshold)
 
     def detect_iris(self, eye_frame):
         """Detects the iris and estimates the position of the iris by
@@ -10,6 +10,11 @@ import dlib
 import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
+try:
+    from sight.gaze_tracking.face_analysis import detect_faces
+except ImportError:
+    # 在 sight 目录下直接运行本脚本时
+    from gaze_tracking.face_analysis import detect_faces
 
 def calculate_nose_to_jaw_distances(nose_points, jaw_points):
     distance_left1 = dist.euclidean(nose_points[0], jaw_points[0])  # 27, 0
@@ -34,9 +39,16 @@ ap.add_argument("-v", "--video", type=str, default="camera",
                 help="path to input video file")
 
 class HeadTracker:
-    def __init__(self, predictor_path='sight/gaze_tracking/trained_models/shape_predictor_68_face_landmarks.dat'):
+    def __init__(self, predictor_path='sight/gaze_tracking/trained_models/shape_predictor_68_face_landmarks.dat',
+                 detection_scale=1.0):
+        # detection_scale < 1 时在缩小图上检测人脸，特征点仍在原分辨率上预测
+        self.detection_scale = detection_scale
         self.face_detector = dlib.get_frontal_face_detector()
         self.landmark_predictor = dlib.shape_predictor(predictor_path)
+        self.reset()
+
+    def reset(self):
+        """清空点头/摇头计数与状态保持（例如开始分析一段新视频时）"""
         self.left_counter = 0
         self.right_counter = 0
         self.total_face_movements = 0
@@ -47,16 +59,26 @@ class HeadTracker:
         self.shake_flag = False
         self.nod_time = 0
         self.shake_time = 0
-        self.last_nod_time = 0
-        self.last_shake_time = 0
+        # 用负无穷而不是0，视频时间戳从0开始时也不会误判为刚点过头/摇过头
+        self.last_nod_time = float('-inf')
+        self.last_shake_time = float('-inf')
 
-    def get_status(self, frame):
+    def _detect_landmarks(self, frame):
         gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        detected_faces = self.face_detector(gray_frame, 0)
+        detected_faces = detect_faces(self.face_detector, gray_frame, self.detection_scale)
+        return [face_utils.shape_to_np(self.landmark_predictor(gray_frame, face)) for face in detected_faces]
+
+    def get_status(self, frame, face_context=None, now=None):
+        # now 为当前帧时间（秒），离线分析视频时传入视频时间戳；默认使用系统时间
+        if now is None:
+            now = time.time()
+        # 传入 FaceAnalysisContext 时直接复用本帧已预测好的特征点
+        if face_context is not None:
+            all_landmarks = face_context.landmarks
+        else:
+            all_landmarks = self._detect_landmarks(frame)
         status = '静止'
-        for face in detected_faces:
-            landmarks = self.landmark_predictor(gray_frame, face)
-            landmarks = face_utils.shape_to_np(landmarks)
+        for landmarks in all_landmarks:
             # 头部点
             (nose_start, nose_end) = face_utils.FACIAL_LANDMARKS_IDXS["nose"]
             (jaw_start, jaw_end) = face_utils.FACIAL_LANDMARKS_IDXS['jaw']
@@ -73,7 +95,7 @@ class HeadTracker:
             elif self.nod_counter != 0 and distance_eyebrow_left + distance_eyebrow_right >= jaw_width + 3:
                 self.total_nods += 1
                 self.nod_counter = 0
-                self.last_nod_time = time.time()
+                self.last_nod_time = now
                 status = '点头'
             # 摇头检测
             distance_left1 = np.linalg.norm(nose_points[0] - jaw_points[0])
@@ -88,10 +110,9 @@ class HeadTracker:
                 self.total_face_movements += 1
                 self.right_counter = 0
                 self.left_counter = 0
-                self.last_shake_time = time.time()
+                self.last_shake_time = now
                 status = '摇头'
         # 状态保持1秒
-        now = time.time()
         if status == '静止':
             if now - self.last_nod_time < 1:
                 status = '点头'
@@ -0,0 +1,223 @@
+"""
+可插拔的语音识别后端。
+
+所有后端都实现 ASRBackend 协议：transcribe(pcm, rate) 接收 16-bit 单声道 PCM，
+返回识别文本，识别失败返回 None。streaming 为 True 的后端还实现 start_stream(rate)，
+返回的会话在音频到达过程中逐块 accept(pcm) 并给出部分识别结果，finish() 返回最终结果。
+    AssemblyAIBackend  云端识别（原有实现）
+    VoskBackend        本地离线识别，CPU 运行，不需要网络
+    FixtureBackend     确定性的测试后端，按音频内容返回预先登记的文本
+CachedASRBackend 可以包装任意后端，按 PCM 内容哈希缓存识别结果。
+"""
+import hashlib
+import io
+import json
+import threading
+import time
+import wave
+from collections import OrderedDict
+from typing import Optional, Protocol
+
+VOSK_MODEL_DIR = "models/vosk-model-small-cn-0.22"  # 本地离线识别模型目录
+
+
+class ASRBackend(Protocol):
+    name: str
+    streaming: bool
+
+    def transcribe(self, pcm, rate) -> Optional[str]:
+        ...
+
+
+class ASRStream(Protocol):
+    def accept(self, pcm) -> Optional[str]:
+        ...
+
+    def finish(self) -> Optional[str]:
+        ...
+
+
+def content_hash(pcm):
+    """PCM 内容哈希，可直接接受 bytes、bytearray 或 memoryview，不复制数据"""
+    return hashlib.blake2b(pcm, digest_size=16).hexdigest()
+
+
+def pcm_to_wav(pcm, rate, channels=1):
+    """把 16-bit PCM 字节封装为内存中的 WAV 文件对象"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+    buffer.seek(0)
+    return buffer
+
+
+class AssemblyAIBackend:
+    """AssemblyAI 云端识别，阻塞直到远端任务完成"""
+    name = "assemblyai"
+    streaming = False
+
+    def __init__(self, language_code="zh", api_key=None):
+        import assemblyai as aai
+        self._aai = aai
+        if api_key:
+            aai.settings.api_key = api_key
+        self.config = aai.TranscriptionConfig(language_code=language_code)
+
+    def transcribe(self, pcm, rate):
+        transcriber = self._aai.Transcriber(config=self.config)
+        transcript = transcriber.transcribe(pcm_to_wav(pcm, rate))
+        if transcript.status == "completed":
+            return transcript.text
+        return None
+
+
+class VoskBackend:
+    """Vosk (Kaldi) 本地离线识别，模型只加载一次"""
+    name = "vosk"
+    streaming = True
+
+    def __init__(self, model_dir=VOSK_MODEL_DIR):
+        try:
+            import vosk
+        except ImportError:
+            raise RuntimeError("本地离线识别需要安装 vosk：pip install vosk")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(model_dir)
+
+    def transcribe(self, pcm, rate):
+        recognizer = self._vosk.KaldiRecognizer(self.model, rate)
+        recognizer.AcceptWaveform(bytes(pcm))
+        text = json.loads(recognizer.FinalResult()).get("text", "")
+        # 中文模型按词输出，词之间有空格
+        text = text.replace(" ", "")
+        return text or None
+
+    def start_stream(self, rate):
+        return _VoskStream(self._vosk.KaldiRecognizer(self.model, rate))
+
+
+class _VoskStream:
+    """Vosk 流式识别会话：检测到句内端点时固定已识别部分，之后继续给出部分结果"""
+
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+        self._final_parts = []
+
+    def accept(self, pcm):
+        if self.recognizer.AcceptWaveform(bytes(pcm)):
+            self._final_parts.append(json.loads(self.recognizer.Result()).get("text", ""))
+            partial = ""
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        return "".join(self._final_parts + [partial]).replace(" ", "") or None
+
+    def finish(self):
+        self._final_parts.append(json.loads(self.recognizer.FinalResult()).get("text", ""))
+        return "".join(self._final_parts).replace(" ", "") or None
+
+
+class FixtureBackend:
+    """
+    确定性的测试后端：按 PCM 内容哈希查表返回文本，未登记的音频返回 default。
+    delay 可以模拟识别耗时，calls 记录实际调用次数。
+    流式会话中，已收到的音频是某段登记音频的前缀时，按已收到的比例返回文本前缀作为部分结果。
+    """
+    name = "fixture"
+    streaming = True
+
+    def __init__(self, transcripts=None, default=None, delay=0.0):
+        self.transcripts = dict(transcripts or {})
+        self.default = default
+        self.delay = delay
+        self.calls = 0
+        self._registered = []
+
+    def register(self, pcm, text):
+        """登记一段音频对应的识别文本"""
+        self.transcripts[content_hash(pcm)] = text
+        self._registered.append((bytes(pcm), text))
+
+    def partial(self, received):
+        """已收到的音频对应的部分识别结果"""
+        for pcm, text in self._registered:
+            if pcm.startswith(received):
+                return text[:len(text) * len(received) // len(pcm)] or None
+        return None
+
+    def start_stream(self, rate):
+        return _FixtureStream(self, rate)
+
+    def transcribe(self, pcm, rate):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return self.transcripts.get(content_hash(pcm), self.default)
+
+
+class _FixtureStream:
+    def __init__(self, backend, rate):
+        self.backend = backend
+        self.rate = rate
+        self._received = bytearray()
+
+    def accept(self, pcm):
+        self._received += pcm
+        return self.backend.partial(bytes(self._received))
+
+    def finish(self):
+        return self.backend.transcribe(bytes(self._received), self.rate)
+
+
+class CachedASRBackend:
+    """按 (PCM 内容哈希, 采样率) 缓存识别结果的 LRU 包装，相同的音频段不会重复识别"""
+
+    def __init__(self, backend, maxsize=128):
+        self.backend = backend
+        self.name = backend.name
+        self.streaming = getattr(backend, "streaming", False)
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def transcribe(self, pcm, rate):
+        key = (content_hash(pcm), rate)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        text = self.backend.transcribe(pcm, rate)
+        # 识别失败（None）不缓存，下次仍会重试
+        if text is not None:
+            with self._lock:
+                self._cache[key] = text
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        return text
+
+    def start_stream(self, rate):
+        """流式识别不经过缓存，直接交给被包装的后端"""
+        return self.backend.start_stream(rate)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def create_asr_backend(name, **kwargs):
+    """按名称创建后端：assemblyai、vosk（local）或 fixture"""
+    if name == "assemblyai":
+        return AssemblyAIBackend(**kwargs)
+    if name in ("vosk", "local"):
+        return VoskBackend(**kwargs)
+    if name == "fixture":
+        return FixtureBackend(**kwargs)
+    raise ValueError(f"未知的语音识别后端: {name}")
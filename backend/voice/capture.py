@@ -0,0 +1,340 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+try:
+    import pyaudio
+except ImportError:  # 没有声卡的 CI 环境中只能使用虚拟音频源（见 replay.py）
+    pyaudio = None
+
+# PortAudio 常量，与 pyaudio 中的取值一致
+PA_INT16 = pyaudio.paInt16 if pyaudio is not None else 8
+PA_CONTINUE = pyaudio.paContinue if pyaudio is not None else 0
+PA_INPUT_OVERFLOW = pyaudio.paInputOverflow if pyaudio is not None else 2
+
+
+class Utterance(namedtuple('Utterance', ['pcm', 'start_time', 'duration', 'buffer'])):
+    """
+    一段完整语音：16-bit PCM（指向 buffer 的 memoryview，不是副本）、开始时间（time.time()）和时长（秒）。
+    pcm 用完（识别结束）后调用 release() 把缓冲区还给缓冲池。
+    """
+    __slots__ = ()
+
+    def release(self):
+        if self.buffer is not None:
+            self.buffer.release()
+
+
+class AudioRingBuffer:
+    """
+    单生产者/单消费者的无锁环形缓冲区，按固定大小的块存放 int16 采样。
+    PortAudio 回调线程写入，识别线程读取；写指针和读指针各自只由一个线程修改，
+    不需要互斥锁。读者落后超过容量时跳到最旧的有效块，并计入 dropped。
+    """
+    def __init__(self, capacity, chunk_samples):
+        self.capacity = capacity
+        self._slots = np.zeros((capacity, chunk_samples), dtype=np.int16)
+        self._write_count = 0
+        self._read_count = 0
+        self.dropped = 0
+        self._data_ready = threading.Event()
+
+    def write(self, data):
+        """写入一块 PCM 字节（只在生产者线程调用）"""
+        samples = np.frombuffer(data, dtype=np.int16)
+        slot = self._slots[self._write_count % self.capacity]
+        n = min(len(samples), len(slot))
+        slot[:n] = samples[:n]
+        slot[n:] = 0
+        # 先写数据再发布写指针
+        self._write_count += 1
+        self._data_ready.set()
+
+    def read(self, timeout=None):
+        """取出下一块采样（只在消费者线程调用），超时返回 None"""
+        while True:
+            while self._read_count == self._write_count:
+                self._data_ready.clear()
+                if self._read_count != self._write_count:
+                    break
+                if not self._data_ready.wait(timeout):
+                    return None
+            behind = self._write_count - self._read_count
+            if behind > self.capacity:
+                self.dropped += behind - self.capacity
+                self._read_count = self._write_count - self.capacity
+            index = self._read_count
+            chunk = self._slots[index % self.capacity].copy()
+            # 复制期间该槽位被生产者覆盖则丢弃这一块重新读取
+            if self._write_count - index > self.capacity:
+                continue
+            self._read_count = index + 1
+            return chunk
+
+    def clear(self):
+        """丢弃所有未读数据（只在消费者线程调用）"""
+        self._read_count = self._write_count
+
+    def __len__(self):
+        return min(self._write_count - self._read_count, self.capacity)
+
+
+class UtteranceBuffer:
+    """
+    预分配的语音段缓冲区：按最长录音时长一次分配，逐块原地写入，
+    以 memoryview（pcm）或 NumPy 视图（samples）交给识别后端，不拼接也不复制。
+    """
+    def __init__(self, max_samples, pool=None):
+        self._data = bytearray(max_samples * 2)
+        self._view = memoryview(self._data)
+        self._samples = np.frombuffer(self._data, dtype=np.int16)
+        self._pool = pool
+        self.length = 0
+
+    @property
+    def capacity(self):
+        return len(self._samples)
+
+    @property
+    def full(self):
+        return self.length >= self.capacity
+
+    def append(self, samples):
+        """写入一块采样，返回实际写入的采样数（缓冲区满时截断）"""
+        n = min(len(samples), self.capacity - self.length)
+        self._samples[self.length:self.length + n] = samples[:n]
+        self.length += n
+        return n
+
+    @property
+    def pcm(self):
+        return self._view[:self.length * 2]
+
+    @property
+    def samples(self):
+        return self._samples[:self.length]
+
+    def clear(self):
+        self.length = 0
+
+    def release(self):
+        """归还缓冲池；之后 pcm / samples 视图的内容会被下一段语音覆盖"""
+        if self._pool is not None:
+            self._pool.release(self)
+
+
+class UtteranceBufferPool:
+    """
+    固定数量的 UtteranceBuffer，稳定运行时不再分配内存。
+    识别积压导致所有缓冲区都在使用时临时分配一个不归还的缓冲区，并计入 extra_allocations。
+    """
+    def __init__(self, max_samples, size=4):
+        self.max_samples = max_samples
+        self.extra_allocations = 0
+        self._free = [UtteranceBuffer(max_samples, pool=self) for _ in range(size)]
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+            self.extra_allocations += 1
+        return UtteranceBuffer(self.max_samples)
+
+    def release(self, buffer):
+        buffer.clear()
+        with self._lock:
+            self._free.append(buffer)
+
+    def __len__(self):
+        """空闲缓冲区数量"""
+        return len(self._free)
+
+
+def utterance_samples(max_duration, rate, chunk):
+    """分段器在 max_duration 下最多写入的采样数（超过时长的那一块也会写入）"""
+    return (int(max_duration * rate / chunk) + 1) * chunk
+
+
+class EnergyVAD:
+    """逐块的 RMS 能量语音活动检测"""
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def is_speech(self, samples):
+        if len(samples) == 0:
+            return False
+        rms = np.sqrt(np.mean(np.square(samples, dtype=np.float64))) / 32768.0
+        return rms > self.threshold
+
+
+class UtteranceSegmenter:
+    """
+    流式语音分段：逐块输入采样，检测到语音开始后累积音频，
+    静音超过 silence_duration 或总时长超过 max_duration 时输出一段 Utterance。
+    语音开始前保留 pre_roll 秒音频，避免丢失触发词的第一个音节。
+    on_audio 回调会按顺序收到属于当前语音段的每一块采样（包括 pre_roll），可用于流式识别。
+    语音段写入从 buffer_pool 取得的预分配缓冲区，没有给出缓冲池时按 max_duration 自建一个。
+    """
+    def __init__(self, vad, rate, chunk, silence_duration, max_duration, pre_roll=0.3, on_audio=None,
+                 buffer_pool=None):
+        self.vad = vad
+        self.on_audio = on_audio
+        self.rate = rate
+        self.chunk = chunk
+        self.silence_duration = silence_duration
+        self.max_duration = max_duration
+        self.buffer_pool = buffer_pool or UtteranceBufferPool(utterance_samples(max_duration, rate, chunk), size=1)
+        self._pre_roll = deque(maxlen=max(0, int(round(pre_roll * rate / chunk))))
+        self._buffer = None
+        self.reset()
+
+    def reset(self):
+        if self._buffer is not None:
+            self._buffer.release()
+        self._buffer = None
+        self._silence = 0.0
+        self._recording = False
+        self._start_time = None
+        self._pre_roll.clear()
+
+    def push(self, samples, timestamp=None):
+        """输入一块 int16 采样，一段语音结束时返回 Utterance，否则返回 None"""
+        chunk_duration = len(samples) / self.rate
+        if self.vad.is_speech(samples):
+            if not self._recording:
+                self._recording = True
+                self._buffer = self.buffer_pool.acquire()
+                now = timestamp if timestamp is not None else time.time()
+                self._start_time = now - len(self._pre_roll) * chunk_duration
+                for chunk in self._pre_roll:
+                    self._append(chunk)
+            self._append(samples)
+            self._silence = 0.0
+        elif self._recording:
+            self._silence += chunk_duration
+            self._append(samples)
+            if self._silence > self.silence_duration:
+                return self._finish()
+        else:
+            self._pre_roll.append(samples)
+            return None
+
+        if self._buffer.length / self.rate > self.max_duration or self._buffer.full:
+            return self._finish()
+        return None
+
+    def _append(self, samples):
+        self._buffer.append(samples)
+        if self.on_audio is not None:
+            self.on_audio(samples)
+
+    def _finish(self):
+        buffer, self._buffer = self._buffer, None
+        utterance = Utterance(buffer.pcm, self._start_time, buffer.length / self.rate, buffer)
+        self.reset()
+        return utterance
+
+
+class AudioCaptureService:
+    """
+    常驻音频采集服务。
+    整个程序运行期间只打开一次输入设备，PortAudio 回调把音频写入环形缓冲区；
+    识别线程从缓冲区读取并分段，语音段以内存中的 PCM 字节交给调用方，不落盘。
+    相比每次录音都重新打开设备，避免了设备打开延迟和触发词开头的丢失。
+    """
+    def __init__(self, rate=16000, channels=1, chunk=1024, buffer_seconds=10,
+                 audio_interface_factory=None, input_device_index=None):
+        """
+        参数：
+            rate (int): 采样率
+            channels (int): 声道数
+            chunk (int): 每块的帧数
+            buffer_seconds (float): 环形缓冲区能容纳的音频时长
+            audio_interface_factory: 返回 PyAudio 兼容对象的工厂，默认 pyaudio.PyAudio，
+                回放测试时传入 replay.VirtualPyAudio
+            input_device_index (int): 输入设备编号，None 表示默认设备
+        """
+        self.rate = rate
+        self.channels = channels
+        self.chunk = chunk
+        self.input_device_index = input_device_index
+        if audio_interface_factory is None:
+            if pyaudio is None:
+                raise RuntimeError("音频采集需要安装 pyaudio：pip install pyaudio")
+            audio_interface_factory = pyaudio.PyAudio
+        self.audio_interface_factory = audio_interface_factory
+        capacity = max(2, int(buffer_seconds * rate / chunk))
+        self.ring = AudioRingBuffer(capacity, chunk * channels)
+        self.overflows = 0
+        self._audio = None
+        self._stream = None
+
+    @property
+    def running(self):
+        return self._stream is not None
+
+    def start(self):
+        if self._stream is not None:
+            return self
+        self._audio = self.audio_interface_factory()
+        self._stream = self._audio.open(format=PA_INT16,
+                                        channels=self.channels,
+                                        rate=self.rate,
+                                        input=True,
+                                        input_device_index=self.input_device_index,
+                                        frames_per_buffer=self.chunk,
+                                        stream_callback=self._on_audio)
+        self._stream.start_stream()
+        return self
+
+    def _on_audio(self, in_data, frame_count, time_info, status):
+        """PortAudio 回调线程：只做一次拷贝写入环形缓冲区"""
+        if status & PA_INPUT_OVERFLOW:
+            self.overflows += 1
+        self.ring.write(in_data)
+        return None, PA_CONTINUE
+
+    def read_chunk(self, timeout=None):
+        """读取下一块 int16 采样，超时返回 None"""
+        return self.ring.read(timeout)
+
+    def next_utterance(self, segmenter, timeout=None, should_continue=None):
+        """
+        持续读取音频直到 segmenter 输出一段语音。
+
+        参数：
+            segmenter (UtteranceSegmenter): 分段器
+            timeout (float): 最长等待时间（秒），None 表示一直等待
+            should_continue: 可选的无参函数，返回 False 时提前结束
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while self.running:
+            if should_continue is not None and not should_continue():
+                return None
+            if deadline is not None and time.time() > deadline:
+                return None
+            samples = self.read_chunk(timeout=0.1)
+            if samples is None:
+                continue
+            utterance = segmenter.push(samples)
+            if utterance is not None:
+                return utterance
+        return None
+
+    def stop(self):
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.stop_stream()
+            stream.close()
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
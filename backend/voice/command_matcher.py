@@ -0,0 +1,167 @@
+"""
+语音指令模糊匹配。
+
+识别文本先做繁体转简体、去标点，再转为拼音音节序列（同音误识别如"小北/小贝"、
+"到航/导航"因此距离为 0）。所有标准指令及其变体预先建立音节 n-gram 倒排索引，
+查询时只对共享 n-gram 最多的少量候选计算子串编辑距离，几千条短语也能在亚毫秒内完成。
+"""
+import re
+from collections import Counter, defaultdict, namedtuple
+
+try:
+    import opencc
+    _converter = opencc.OpenCC('t2s')
+except ImportError:
+    _converter = None
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+# 没有安装 opencc 时使用的繁简对照表，覆盖车载指令中的常用字
+_TRADITIONAL = ("開關啓啟動導航樂機燈車窗調節廣播電話給張鍵聽說語音錄貝輩亂體風溫氣頻視門鎖後鏡"
+                "這個們來時間點過還嗎嘿請讓應該為與從對會無暫暖熱涼條繼續進發見親愛聲響"
+                "閉靜設區號場幫麼邊換經認處藍隨資訊")
+_SIMPLIFIED = ("开关启启动导航乐机灯车窗调节广播电话给张键听说语音录贝辈乱体风温气频视门锁后镜"
+               "这个们来时间点过还吗嘿请让应该为与从对会无暂暖热凉条继续进发见亲爱声响"
+               "闭静设区号场帮么边换经认处蓝随资讯")
+_TRADITIONAL_TABLE = str.maketrans(_TRADITIONAL, _SIMPLIFIED)
+
+_PUNCTUATION = re.compile(r"[\s　-〿＀-￯,.!?;:'\"，。！？；：、]+")
+
+CommandMatch = namedtuple('CommandMatch', ['command', 'phrase', 'confidence', 'margin'])
+
+
+def to_simplified(text):
+    """繁体转简体"""
+    if _converter is not None:
+        return _converter.convert(text)
+    return text.translate(_TRADITIONAL_TABLE)
+
+
+def normalize_text(text):
+    """繁体转简体并去掉空白和标点"""
+    return _PUNCTUATION.sub('', to_simplified(text or '')).lower()
+
+
+def to_syllables(text):
+    """把规范化后的文本转为拼音音节元组；没有安装 pypinyin 时按字切分"""
+    if lazy_pinyin is not None:
+        return tuple(lazy_pinyin(text))
+    return tuple(text)
+
+
+def _ngrams(tokens, n):
+    if len(tokens) < n:
+        return {tuple(tokens)} if tokens else set()
+    return {tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1)}
+
+
+def substring_distance(pattern, text):
+    """
+    pattern 与 text 中任意子串之间的最小编辑距离（text 首尾的多余内容不计代价），
+    用于"请帮我打开音乐吧"这类带前后缀的识别结果。
+    """
+    previous = [0] * (len(text) + 1)
+    for i, token in enumerate(pattern, 1):
+        current = [i] + [0] * len(text)
+        for j, other in enumerate(text, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (token != other))
+        previous = current
+    return min(previous)
+
+
+class CommandMatcher:
+    """
+    标准指令及其变体的预编译索引。
+    match() 返回 CommandMatch(标准指令, 命中的短语, 置信度, 与次优标准指令的置信度差)，
+    置信度低于 min_confidence 时返回 None。
+    """
+    def __init__(self, phrases=None, ngram=2, min_confidence=0.6, max_candidates=20):
+        """
+        参数：
+            phrases (dict): 短语 -> 标准指令，标准指令本身也会作为短语加入
+            ngram (int): 倒排索引使用的音节 n-gram 长度
+            min_confidence (float): 返回匹配结果的最低置信度
+            max_candidates (int): 每次查询最多精确计算距离的候选短语数
+        """
+        self.ngram = ngram
+        self.min_confidence = min_confidence
+        self.max_candidates = max_candidates
+        self._entries = []  # (短语, 标准指令, 音节序列)
+        self._known = {}  # 规范化短语 -> 条目编号
+        self._index = defaultdict(list)
+        self._syllable_index = defaultdict(list)
+        for phrase, command in (phrases or {}).items():
+            self.add(phrase, command)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def commands(self):
+        return {command for _, command, _ in self._entries}
+
+    def add(self, phrase, command=None):
+        """加入一条短语；command 为空时短语本身就是标准指令"""
+        command = command or phrase
+        key = normalize_text(phrase)
+        if not key or (key in self._known and self._entries[self._known[key]][1] == command):
+            return
+        if command != phrase:
+            self.add(command)
+        syllables = to_syllables(key)
+        entry_id = len(self._entries)
+        self._entries.append((phrase, command, syllables))
+        self._known[key] = entry_id
+        for gram in _ngrams(syllables, self.ngram):
+            self._index[gram].append(entry_id)
+        for syllable in set(syllables):
+            self._syllable_index[syllable].append(entry_id)
+
+    def update(self, phrases):
+        """批量加入短语，phrases 可以是 短语->标准指令 的字典或短语列表"""
+        items = phrases.items() if isinstance(phrases, dict) else ((p, None) for p in phrases)
+        for phrase, command in items:
+            self.add(phrase, command)
+
+    def _candidates(self, syllables):
+        votes = Counter()
+        for gram in _ngrams(syllables, self.ngram):
+            votes.update(self._index.get(gram, ()))
+        if not votes:
+            # 没有共享 n-gram（例如只有一个音节识别对了），退回按单个音节投票
+            for syllable in set(syllables):
+                votes.update(self._syllable_index.get(syllable, ()))
+        return [entry_id for entry_id, _ in votes.most_common(self.max_candidates)]
+
+    def match(self, text):
+        """返回与识别文本最匹配的标准指令，没有足够可信的匹配时返回 None"""
+        key = normalize_text(text)
+        if not key:
+            return None
+        # 规范化后完全相同的短语直接命中
+        if key in self._known:
+            phrase, command, _ = self._entries[self._known[key]]
+            return CommandMatch(command, phrase, 1.0, 1.0)
+
+        syllables = to_syllables(key)
+        best_by_command = {}
+        for entry_id in self._candidates(syllables):
+            phrase, command, phrase_syllables = self._entries[entry_id]
+            distance = substring_distance(phrase_syllables, syllables)
+            # 匹配部分之外多出来的内容轻微扣分，避免短短语在长句中过于自信
+            extra = max(0, len(syllables) - len(phrase_syllables))
+            confidence = 1.0 - distance / len(phrase_syllables) - 0.02 * extra
+            if confidence > best_by_command.get(command, (-1.0, None))[0]:
+                best_by_command[command] = (confidence, phrase)
+        if not best_by_command:
+            return None
+
+        ranked = sorted(best_by_command.items(), key=lambda item: item[1][0], reverse=True)
+        command, (confidence, phrase) = ranked[0]
+        if confidence < self.min_confidence:
+            return None
+        runner_up = ranked[1][1][0] if len(ranked) > 1 else 0.0
+        return CommandMatch(command, phrase, confidence, confidence - max(runner_up, 0.0))
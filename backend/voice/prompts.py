@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# 播放优先级：安全警告 > 普通提示音（导航等） > 音乐
+PRIORITY_MUSIC = 0
+PRIORITY_PROMPT = 1
+PRIORITY_SAFETY = 2
+PRIORITY_NAMES = {PRIORITY_MUSIC: '音乐', PRIORITY_PROMPT: '提示', PRIORITY_SAFETY: '安全警告'}
+
+
+class PromptManager:
+    """
+    预加载的提示音管理器。
+    启动时把所有提示音解码为 pygame.mixer.Sound 常驻内存，每个优先级占用一个保留声道，
+    播放时不读磁盘、不创建线程。安全警告会打断普通提示并暂停音乐，播完后恢复音乐。
+    每次播放记录从触发（如分心计时到 3 秒）到声音开始输出的延迟。
+    """
+    def __init__(self, mixer, output_latency=0.0):
+        """
+        参数：
+            mixer: 已初始化的 pygame.mixer 模块
+            output_latency (float): 混音器输出缓冲带来的固定延迟（秒），计入测得的延迟
+        """
+        self.mixer = mixer
+        self.output_latency = output_latency
+        priorities = sorted(PRIORITY_NAMES)
+        mixer.set_num_channels(max(mixer.get_num_channels(), len(priorities)))
+        mixer.set_reserved(len(priorities))
+        self.channels = {priority: mixer.Channel(priority) for priority in priorities}
+        self.latencies = {priority: deque(maxlen=200) for priority in priorities}
+        self._priorities = {}
+        self._sounds = {}
+        self._lock = threading.Lock()
+        self._resume_timer = None
+
+    def register(self, path, priority=PRIORITY_PROMPT):
+        """登记提示音文件及其优先级"""
+        if path:
+            self._priorities[path] = priority
+
+    def preload(self):
+        """解码所有已登记的提示音，返回成功加载的数量"""
+        loaded = 0
+        for path in self._priorities:
+            if self._load(path) is not None:
+                loaded += 1
+        return loaded
+
+    def _load(self, path):
+        sound = self._sounds.get(path)
+        if sound is None and os.path.exists(path):
+            try:
+                sound = self._sounds[path] = self.mixer.Sound(path)
+            except Exception as e:
+                print(f"加载提示音失败 {path}: {e}")
+        return sound
+
+    def play(self, path, priority=None, trigger_time=None):
+        """
+        在对应优先级的声道上播放提示音，返回是否开始播放。
+
+        参数：
+            path (str): 提示音文件
+            priority (int): 优先级，None 时使用登记的优先级
+            trigger_time (float): 触发时刻（time.time()），用于统计触发到播放的延迟
+        """
+        if priority is None:
+            priority = self._priorities.get(path, PRIORITY_PROMPT)
+        sound = self._load(path)
+        if sound is None:
+            print(f"错误: 文件 {path} 不存在")
+            return False
+
+        with self._lock:
+            safety_busy = self.channels[PRIORITY_SAFETY].get_busy()
+            if priority == PRIORITY_PROMPT and safety_busy:
+                # 安全警告播放期间不插入普通提示
+                return False
+            channel = self.channels[priority]
+            channel.play(sound)
+            if priority == PRIORITY_SAFETY:
+                self.channels[PRIORITY_PROMPT].stop()
+                self.channels[PRIORITY_MUSIC].pause()
+                self._schedule_resume(sound.get_length())
+            elif priority == PRIORITY_MUSIC and safety_busy:
+                channel.pause()
+
+        latency = (time.time() - trigger_time if trigger_time is not None else 0.0) + self.output_latency
+        self.latencies[priority].append(latency)
+        print(f"播放: {path}（{PRIORITY_NAMES[priority]}，触发到播放 {latency * 1000:.0f} ms）")
+        return True
+
+    def _schedule_resume(self, delay):
+        if self._resume_timer is not None:
+            self._resume_timer.cancel()
+        self._resume_timer = threading.Timer(delay, self._resume_music)
+        self._resume_timer.daemon = True
+        self._resume_timer.start()
+
+    def _resume_music(self):
+        with self._lock:
+            if self.channels[PRIORITY_SAFETY].get_busy():
+                self._schedule_resume(0.1)
+                return
+            self._resume_timer = None
+            self.channels[PRIORITY_MUSIC].unpause()
+
+    def stop(self, priority=PRIORITY_MUSIC):
+        """停止某个优先级声道上的播放"""
+        with self._lock:
+            self.channels[priority].stop()
+
+    def stop_all(self):
+        with self._lock:
+            if self._resume_timer is not None:
+                self._resume_timer.cancel()
+                self._resume_timer = None
+            for channel in self.channels.values():
+                channel.stop()
+
+    def latency_stats(self):
+        """返回 {优先级名称: (次数, 平均延迟 ms, P95 延迟 ms)}"""
+        stats = {}
+        for priority, samples in self.latencies.items():
+            if samples:
+                values = np.array(samples) * 1000.0
+                stats[PRIORITY_NAMES[priority]] = (len(values), float(values.mean()),
+                                                   float(np.percentile(values, 95)))
+        return stats
@@ -1,25 +1,81 @@
-import pyaudio
-import wave
 import numpy as np
 import os
-import assemblyai as aai
+import sys
+try:
+    import assemblyai as aai
+except ImportError:  # 只使用本地或 fixture 识别后端（如 CI 中的回放测试）时不需要
+    aai = None
 import time
 from pygame import mixer
 import threading
+from concurrent.futures import CancelledError
+
+try:
+    from voice.capture import AudioCaptureService, UtteranceBufferPool, UtteranceSegmenter, utterance_samples
+    from voice.vad import AdaptiveVAD
+    from voice.wakeword import WakeWordDetector
+    from voice.asr import CachedASRBackend, create_asr_backend, pcm_to_wav
+    from voice.transcription import TranscriptionWorker
+    from voice.command_matcher import CommandMatcher
+    from voice.prompts import PromptManager, PRIORITY_MUSIC, PRIORITY_PROMPT, PRIORITY_SAFETY
+    from voice.streaming import IntentDebouncer, StreamingCommandRecognizer
+    from voice.seats import MultiSeatCapture, Seat, SeatListener, SeatOccupancy
+except ImportError:
+    from capture import AudioCaptureService, UtteranceBufferPool, UtteranceSegmenter, utterance_samples
+    from vad import AdaptiveVAD
+    from wakeword import WakeWordDetector
+    from asr import CachedASRBackend, create_asr_backend, pcm_to_wav
+    from transcription import TranscriptionWorker
+    from command_matcher import CommandMatcher
+    from prompts import PromptManager, PRIORITY_MUSIC, PRIORITY_PROMPT, PRIORITY_SAFETY
+    from streaming import IntentDebouncer, StreamingCommandRecognizer
+    from seats import MultiSeatCapture, Seat, SeatListener, SeatOccupancy
+
+# 按乘员角色检查指令权限，权限数据由 system 包管理：把仓库根目录追加到 sys.path 末尾，
+# 不会遮蔽 backend 目录下同名的 voice 包
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+try:
+    from system import user_manager as system_users
+    from system.config import DEFAULT_USER_ID
+    check_permission = system_users.check_permission
+except ImportError as e:
+    print(f"警告：无法导入系统管理模块（{e}），语音指令不做权限检查。")
+    system_users = None
+    check_permission = None
+    DEFAULT_USER_ID = "guest_user"
 
 # 配置音频参数
 SAMPLE_RATE = 16000  # 采样率 16000 Hz
 CHANNELS = 1         # 单声道
+MIC_ARRAY_CHANNELS = int(os.environ.get("VOICE_MIC_CHANNELS", "1"))  # 麦克风阵列声道数，大于 1 时按座位分别监听
+SEATS = (Seat("driver", 0), Seat("passenger", 1))  # 座位及其麦克风声道
+CROSSTALK_RATIO = 0.25  # 声道能量低于最响声道的该倍数时视为其他座位的串音
 SAMPLE_WIDTH = 2     # 16-bit PCM（2 字节）
 CHUNK = 1024         # 每次读取的帧数
+MIXER_BUFFER = 512   # 播放缓冲帧数，越小提示音输出延迟越低
 OUTPUT_DIR = "temp"  # 临时文件保存目录
-TRIGGER_FILE = os.path.join(OUTPUT_DIR, "trigger.wav")  # 触发词临时文件
-COMMAND_FILE = os.path.join(OUTPUT_DIR, "command.wav")  # 指令文件
-RMS_THRESHOLD = 0.0010  # RMS 能量阈值，用于 VAD
-SILENCE_DURATION = 4  # 静音持续时间（秒）
+TRIGGER_FILE = os.path.join(OUTPUT_DIR, "trigger.wav")  # 调试模式下保存的最近一次触发词录音
+COMMAND_FILE = os.path.join(OUTPUT_DIR, "command.wav")  # 调试模式下保存的最近一次指令录音
+DEBUG_AUDIO = os.environ.get("VOICE_DEBUG_AUDIO") == "1"  # 调试模式：把录到的语音段写入上面两个 WAV 文件
+UTTERANCE_BUFFERS = 4  # 预分配的语音段缓冲区个数（正在识别的语音段各占一个）
+WAKEWORD_TEMPLATE_DIR = os.path.join(OUTPUT_DIR, "wakeword")  # 录制的"小贝"样本（*.wav），用于本地唤醒词检测
+RMS_THRESHOLD = 0.0010  # RMS 能量绝对下限，用于 VAD
+VAD_HANGOVER = 0.3  # VAD 拖尾时长（秒），句中短暂停顿仍视为语音
+SILENCE_DURATION = 0.5  # 拖尾结束后再持续该时长（秒）的静音即结束录音
+TRIGGER_MAX_DURATION = 3  # 触发词最长录音时长（秒）
+COMMAND_MAX_DURATION = 10  # 指令最长录音时长（秒）
+COMMAND_MAX_AGE = 5.0  # 指令等待识别超过该时长（秒）且有新指令到达时，视为过期并取消
+EARLY_INTENT_CONFIDENCE = 0.85  # 流式识别中部分结果提前触发指令所需的置信度
+EARLY_INTENT_MARGIN = 0.3  # 以及与次优指令的最小置信度差
+INTENT_DEBOUNCE = 2.0  # 同一指令在该时长（秒）内只触发一次
+ASR_BACKEND = os.environ.get("VOICE_ASR_BACKEND", "assemblyai")  # 语音识别后端：assemblyai、vosk（本地离线）或 fixture
+ASR_CACHE_SIZE = 128  # 识别结果缓存条数
 
 # 配置 AssemblyAI API
-aai.settings.api_key = "0a91719634f847eebefd17e7b3005c72"
+if aai is not None:
+    aai.settings.api_key = "0a91719634f847eebefd17e7b3005c72"
 
 # 确保输出目录存在
 os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -31,27 +87,24 @@ navigation_file = os.path.join(OUTPUT_DIR, "navigation_converted.wav")
 security_file = os.path.join(OUTPUT_DIR, "security_converted.wav")
 
 # 初始化 pygame mixer
-mixer.init(frequency=SAMPLE_RATE, size=-16, channels=CHANNELS)
-
-# def compute_rms(audio_data):
-#     """计算音频数据的 RMS（均方根）值"""
-#     audio_array = np.frombuffer(audio_data, dtype=np.int16)
-#     if len(audio_array) == 0:
-#         print("警告：音频数据为空")
-#         return 0.0
-#     squared_mean = np.mean(audio_array**2)
-#     if not np.isfinite(squared_mean):
-#         print("警告：RMS 计算结果无效，squared_mean =", squared_mean)
-#         return 0.0
-#     rms = np.sqrt(squared_mean) / 32768.0  # 归一化到 0-1
-#     return rms
+mixer.init(frequency=SAMPLE_RATE, size=-16, channels=CHANNELS, buffer=MIXER_BUFFER)
+
+# 提示音在启动时解码到内存，按优先级在保留声道上播放
+prompts = PromptManager(mixer, output_latency=MIXER_BUFFER / SAMPLE_RATE)
+prompts.register(music_file, PRIORITY_MUSIC)
+prompts.register(navigation_file, PRIORITY_PROMPT)
+prompts.register(security_file, PRIORITY_SAFETY)
+prompts.preload()
+
+
 def compute_rms(audio_data):
     """计算音频数据的 RMS（均方根）值"""
     audio_array = np.frombuffer(audio_data, dtype=np.int16)
     if len(audio_array) == 0:
         print("警告：音频数据为空")
         return 0.0
-    squared_mean = np.mean(audio_array**2)
+    # 先转为浮点再平方，int16 直接平方会溢出
+    squared_mean = np.mean(audio_array.astype(np.float64) ** 2)
     if not np.isfinite(squared_mean):
         print("警告：RMS 计算结果无效，squared_mean =", squared_mean)
         return 0.0
@@ -64,41 +117,70 @@ def compute_rms(audio_data):
     return rms
 
 
-def transcribe_audio(audio_path):
-    """使用 AssemblyAI 转录音频"""
-    #print(f"[DEBUG] 调用transcribe_audio, audio_path={audio_path}")
-    config = aai.TranscriptionConfig(language_code="zh")
-    transcriber = aai.Transcriber(config=config)
-    transcript = transcriber.transcribe(audio_path)
-    #print(f"[DEBUG] transcript.status={transcript.status}")
-    if transcript.status == "completed":
-        #print(f"[DEBUG] transcript.text={transcript.text}")
-        return transcript.text
-    #print(f"转录状态: {transcript.status}")
-    return None
-
-def play_audio(file_path):
-    def _play():
-        try:
-            mixer.music.stop()  # 先停掉之前的
-            if os.path.exists(file_path):
-                mixer.music.load(file_path)
-                mixer.music.play()
-                print(f"播放: {file_path}")
-            else:
-                print(f"错误: 文件 {file_path} 不存在")
-        except Exception as e:
-            print(f"播放失败: {e}")
-    threading.Thread(target=_play, daemon=True).start()
+# 当前使用的语音识别后端（带结果缓存），首次识别时创建
+_asr_backend = None
 
-def stop_audio():
-    def _stop():
-        try:
-            mixer.music.stop()
-            print("停止播放")
-        except Exception as e:
-            print(f"停止播放失败: {e}")
-    threading.Thread(target=_stop, daemon=True).start()
+
+def get_asr_backend():
+    """返回当前的语音识别后端，默认按 ASR_BACKEND 创建"""
+    global _asr_backend
+    if _asr_backend is None:
+        _asr_backend = CachedASRBackend(create_asr_backend(ASR_BACKEND), maxsize=ASR_CACHE_SIZE)
+    return _asr_backend
+
+
+def set_asr_backend(backend, cache=True):
+    """替换语音识别后端（例如无网络基准测试时使用本地或 fixture 后端）"""
+    global _asr_backend
+    _asr_backend = CachedASRBackend(backend, maxsize=ASR_CACHE_SIZE) if cache else backend
+
+
+def transcribe_pcm(pcm):
+    """用当前后端识别一段 16-bit 单声道 PCM"""
+    return get_asr_backend().transcribe(pcm, SAMPLE_RATE)
+
+
+# 后台识别调度器，首次提交时创建
+_transcription_worker = None
+
+
+def get_transcription_worker():
+    """返回后台识别调度器，识别期间采集线程继续录音"""
+    global _transcription_worker
+    if _transcription_worker is None:
+        _transcription_worker = TranscriptionWorker(transcribe_pcm, max_age=COMMAND_MAX_AGE)
+    return _transcription_worker
+
+
+def stop_transcription_worker():
+    """取消未完成的识别并结束后台线程"""
+    global _transcription_worker
+    if _transcription_worker is not None:
+        _transcription_worker.shutdown()
+        _transcription_worker = None
+
+
+def play_audio(file_path, priority=None, trigger_time=None):
+    """
+    播放预加载的提示音，立即返回。
+
+    参数：
+        file_path (str): 提示音文件
+        priority: PRIORITY_SAFETY / PRIORITY_PROMPT / PRIORITY_MUSIC，None 时使用登记的优先级
+        trigger_time (float): 触发时刻（time.time()），用于统计触发到播放的延迟
+    """
+    try:
+        prompts.play(file_path, priority=priority, trigger_time=trigger_time)
+    except Exception as e:
+        print(f"播放失败: {e}")
+
+def stop_audio(priority=PRIORITY_MUSIC):
+    """停止某个优先级声道上的播放，默认停止音乐"""
+    try:
+        prompts.stop(priority)
+        print("停止播放")
+    except Exception as e:
+        print(f"停止播放失败: {e}")
 
 # 指令处理函数
 def handle_open_music():
@@ -132,15 +214,14 @@ command_handlers = {
     "打开导航": handle_open_navigation,
     "关闭音乐": handle_close_music
 }
-# trigger_keywords = {
-#     "开始录音",
-#     "開始錄音",
-#     "开始录入",
-#     "开始录音吧",
-#     "请开始录音",
-#     "录音开始",
-#     "我要开始录音"
-# }
+
+# 标准指令对应的权限标签（system/user_manager.ROLES_PERMISSIONS），未列出的指令不做权限检查
+command_actions = {
+    "打开音乐": "PLAY_MUSIC",
+    "已经注意道路": "CONFIRM_ACTION",
+    "打开导航": "START_NAVIGATION",
+    "关闭音乐": "STOP_MUSIC",
+}
 # 触发词集合，包含简体和繁体变体
 trigger_keywords = {
     "小贝", "小貝",         # 基础简繁形式
@@ -158,60 +239,145 @@ trigger_keywords = {
 }
 
 
+def build_command_matcher(user_commands=()):
+    """由内置指令、标准化映射和用户常用语音指令建立模糊匹配索引"""
+    matcher = CommandMatcher(command_normalization)
+    matcher.update(list(command_handlers))
+    matcher.update(user_commands)
+    return matcher
+
+
+# 指令与触发词的模糊匹配索引（繁简、同音、前后缀都能匹配）
+command_matcher = build_command_matcher()
+trigger_matcher = CommandMatcher({keyword: "小贝" for keyword in trigger_keywords}, min_confidence=0.8)
+
+
+def set_user_commands(phrases):
+    """切换用户时载入其常用语音指令（UserProfile 中的 '常用语音指令'）"""
+    global command_matcher
+    command_matcher = build_command_matcher(phrases or ())
+
+
+# 常驻音频采集服务，首次录音时打开输入设备，之后一直复用
+_capture_service = None
+# PyAudio 兼容对象的工厂，None 表示使用真实麦克风
+_audio_interface_factory = None
+
+
+def get_capture_service():
+    """返回已启动的常驻音频采集服务"""
+    global _capture_service
+    if _capture_service is None:
+        _capture_service = AudioCaptureService(rate=SAMPLE_RATE, channels=MIC_ARRAY_CHANNELS, chunk=CHUNK,
+                                               audio_interface_factory=_audio_interface_factory)
+    return _capture_service.start()
+
+
+def set_audio_interface_factory(factory):
+    """替换音频输入（例如回放测试中的 VirtualPyAudio），下次录音时生效"""
+    global _audio_interface_factory
+    stop_capture_service()
+    _audio_interface_factory = factory
+
+
+def stop_capture_service():
+    """关闭输入设备"""
+    global _capture_service
+    if _capture_service is not None:
+        _capture_service.stop()
+        _capture_service = None
+
+
+# 自适应 VAD 在各段录音之间共享，噪声基底持续跟踪车内噪声
+_vad = AdaptiveVAD(rate=SAMPLE_RATE, min_energy=RMS_THRESHOLD, hangover=VAD_HANGOVER)
+
+
+# 语音段缓冲区按最长的指令录音一次分配，触发词和指令共用，识别完成后归还
+_utterance_pool = UtteranceBufferPool(utterance_samples(max(TRIGGER_MAX_DURATION, COMMAND_MAX_DURATION),
+                                                        SAMPLE_RATE, CHUNK),
+                                      size=UTTERANCE_BUFFERS)
+
+
+def record_utterance(max_duration, on_audio=None):
+    """
+    从常驻采集服务中截取下一段语音，返回 Utterance；停止监听时返回 None。
+    utterance.pcm 是预分配缓冲区的 memoryview，识别完成后需调用 utterance.release()。
+    on_audio 在录音过程中逐块收到属于该语音段的采样（用于流式识别）。
+    """
+    segmenter = UtteranceSegmenter(_vad, SAMPLE_RATE, CHUNK, silence_duration=SILENCE_DURATION,
+                                   max_duration=max_duration, on_audio=on_audio, buffer_pool=_utterance_pool)
+    utterance = get_capture_service().next_utterance(segmenter, should_continue=lambda: is_listening)
+    if utterance is None:
+        # 停止监听时可能正录到一半，归还缓冲区
+        segmenter.reset()
+    return utterance
+
+
+def save_debug_audio(path, pcm):
+    """调试模式下把语音段写入 WAV 文件，正常运行时不写盘"""
+    if not DEBUG_AUDIO:
+        return
+    try:
+        with open(path, 'wb') as f:
+            f.write(pcm_to_wav(pcm, SAMPLE_RATE, CHANNELS).getbuffer())
+    except OSError as e:
+        print(f"保存调试录音失败 {path}: {e}")
+
+
+# 本地唤醒词检测器，None 表示尚未加载，False 表示没有模板
+_wakeword_detector = None
+
+
+def get_wakeword_detector():
+    """加载本地唤醒词检测器；没有录制模板时返回 None，退回云端转录匹配"""
+    global _wakeword_detector
+    if _wakeword_detector is None:
+        try:
+            _wakeword_detector = WakeWordDetector.from_directory(WAKEWORD_TEMPLATE_DIR)
+        except (OSError, ValueError) as e:
+            print(f"本地唤醒词检测不可用，使用云端识别: {e}")
+            _wakeword_detector = False
+    return _wakeword_detector or None
+
+
+def set_wakeword_detector(detector):
+    """替换本地唤醒词检测器，None 表示不使用本地检测"""
+    global _wakeword_detector
+    _wakeword_detector = detector if detector is not None else False
+
+
 def record_trigger():
     """监听触发词 '小贝'"""
-    audio = pyaudio.PyAudio()
-    stream = audio.open(format=pyaudio.paInt16,
-                        channels=CHANNELS,
-                        rate=SAMPLE_RATE,
-                        input=True,
-                        frames_per_buffer=CHUNK)
-
     print("监听中，请说 '小贝' 触发录音...")
-    frames = []
-    silence_counter = 0
-    recording = False
-    max_trigger_duration = 3
-
-    while True:
-        data = stream.read(CHUNK, exception_on_overflow=False)
-        rms = compute_rms(data)
-
-        if rms > RMS_THRESHOLD:
-            recording = True
-            frames.append(data)
-            silence_counter = 0
-        elif recording:
-            silence_counter += CHUNK / SAMPLE_RATE
-            frames.append(data)
-            if silence_counter > SILENCE_DURATION:
-                break
-
-        if recording and len(frames) * CHUNK / SAMPLE_RATE > max_trigger_duration:
-            break
-
-    stream.stop_stream()
-    stream.close()
-    audio.terminate()
-
-    if not frames:
+    utterance = record_utterance(TRIGGER_MAX_DURATION)
+
+    if not utterance:
         print("未检测到声音")
         return False
 
-    with wave.open(TRIGGER_FILE, 'wb') as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(SAMPLE_WIDTH)
-        wf.setframerate(SAMPLE_RATE)
-        wf.writeframes(b''.join(frames))
+    try:
+        save_debug_audio(TRIGGER_FILE, utterance.pcm)
+        return detect_trigger(utterance.pcm)
+    finally:
+        utterance.release()
 
 
+def detect_trigger(pcm):
+    """判断一段语音是否为触发词"""
+    detector = get_wakeword_detector()
+    if detector is not None:
+        # 本地模板匹配，只有确认唤醒后才使用云端识别指令
+        detected, distance = detector.detect(pcm)
+        if detected:
+            print(f"检测到触发词 '小贝'（本地匹配距离 {distance:.2f}）")
+        return detected
 
-    text = transcribe_audio(TRIGGER_FILE)
+    text = transcribe_pcm(pcm)
     if text:
-        for keyword in trigger_keywords:
-            if keyword in text:
-                print(f"检测到触发词 '{keyword}'")
-                return True
+        match = trigger_matcher.match(text)
+        if match:
+            print(f"检测到触发词 '{match.phrase}'（置信度 {match.confidence:.2f}）")
+            return True
         print(f"未检测到触发词，识别结果: {text}")
         return False
     else:
@@ -219,153 +385,198 @@ def record_trigger():
         return False
 
 
+# 指令去重：同一指令在 INTENT_DEBOUNCE 秒内只执行一次（流式提前触发后，最终结果不会再次触发）
+_intent_debouncer = IntentDebouncer(window=INTENT_DEBOUNCE)
 
-# def record_command():
-#     """捕获指令音频，动态时长"""
-#     audio = pyaudio.PyAudio()
-#     stream = audio.open(format=pyaudio.paInt16,
-#                         channels=CHANNELS,
-#                         rate=SAMPLE_RATE,
-#                         input=True,
-#                         frames_per_buffer=CHUNK)
-
-#     print("请说出指令...")
-#     frames = []
-#     silence_counter = 0
-#     recording = False
-#     max_duration = 10
-
-#     while True:
-#         data = stream.read(CHUNK, exception_on_overflow=False)
-#         rms = compute_rms(data)
-
-#         if rms > RMS_THRESHOLD:
-#             recording = True
-#             frames.append(data)
-#             silence_counter = 0
-#         elif recording:
-#             silence_counter += CHUNK / SAMPLE_RATE
-#             frames.append(data)
-#             if silence_counter > SILENCE_DURATION:
-#                 break
-
-#         if len(frames) * CHUNK / SAMPLE_RATE > max_duration:
-#             break
-
-#     stream.stop_stream()
-#     stream.close()
-#     audio.terminate()
-
-#     if not frames:
-#         print("未录制到有效指令")
-#         return None
-
-#     with wave.open(COMMAND_FILE, 'wb') as wf:
-#         wf.setnchannels(CHANNELS)
-#         wf.setsampwidth(SAMPLE_WIDTH)
-#         wf.setframerate(SAMPLE_RATE)
-#         wf.writeframes(b''.join(frames))
-
-#     command_text = transcribe_audio(COMMAND_FILE)
-#     print(f"[DEBUG] transcribe_audio返回: {command_text}")
-#     if command_text:
-#         print(f"[DEBUG] 识别到的指令: {command_text}")
-#         command = command_text.strip()
-#         handler = command_handlers.get(command)
-#         if handler:
-#             print(f"[DEBUG] 匹配到指令处理函数: {handler}")
-#             handler()
-#         else:
-#             print(f"[DEBUG] 未知指令: {command_text}")
-#         return command_text
-#     else:
-#         print("[DEBUG] 未成功识别指令")
-#         return None
 
-def record_command():
-    """捕获指令音频，动态时长"""
-    audio = pyaudio.PyAudio()
-    stream = audio.open(format=pyaudio.paInt16,
-                        channels=CHANNELS,
-                        rate=SAMPLE_RATE,
-                        input=True,
-                        frames_per_buffer=CHUNK)
+def execute_command(command):
+    """执行标准指令对应的处理函数"""
+    handler = command_handlers.get(command)
+    if handler:
+        print(f"[DEBUG] 匹配到指令处理函数: {handler}")
+        handler()
+    else:
+        print(f"[DEBUG] 未知指令: {command}")
+
+
+def set_permission_checker(checker):
+    """替换权限检查函数 checker(user_id, action_tag) -> bool，None 表示不检查"""
+    global check_permission
+    check_permission = checker
 
-    print("请说出指令...")
-    frames = []
-    silence_counter = 0
-    recording = False
-    max_duration = 10
-
-    while True:
-        data = stream.read(CHUNK, exception_on_overflow=False)
-        rms = compute_rms(data)
-
-        if rms > RMS_THRESHOLD:
-            recording = True
-            frames.append(data)
-            silence_counter = 0
-        elif recording:
-            silence_counter += CHUNK / SAMPLE_RATE
-            frames.append(data)
-            if silence_counter > SILENCE_DURATION:
-                break
-
-        if len(frames) * CHUNK / SAMPLE_RATE > max_duration:
-            break
-
-    stream.stop_stream()
-    stream.close()
-    audio.terminate()
-
-    if not frames:
-        print("未录制到有效指令")
-        return None
 
-    with wave.open(COMMAND_FILE, 'wb') as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(SAMPLE_WIDTH)
-        wf.setframerate(SAMPLE_RATE)
-        wf.writeframes(b''.join(frames))
+def is_command_permitted(command, user_id):
+    """user_id 为 None（调用方不区分乘员）或没有权限模块时一律允许"""
+    action = command_actions.get(command)
+    if user_id is None or action is None or check_permission is None:
+        return True
+    return check_permission(user_id, action)
 
-        command_text = transcribe_audio(COMMAND_FILE)
-    print(f"[DEBUG] transcribe_audio返回: {command_text}")
+
+def handle_command_text(command_text, seat=None, user_id=None):
+    """
+    标准化识别出的指令并执行对应的处理函数，返回标准化后的指令。
+    多座位模式下 seat / user_id 标明说话的座位和乘员，按乘员角色检查权限。
+    """
+    print(f"[DEBUG] 识别结果: {command_text}")
     if command_text:
         print(f"[DEBUG] 识别到的指令: {command_text}")
         command = command_text.strip()
 
-        # 指令标准化处理
-        normalized_command = command_normalization.get(command, command)
-        print(f"[DEBUG] 标准化指令: {normalized_command}")
-
-        handler = command_handlers.get(normalized_command)
-        if handler:
-            print(f"[DEBUG] 匹配到指令处理函数: {handler}")
-            handler()
+        # 指令标准化处理：模糊匹配到标准指令，匹配不到时保留原文
+        match = command_matcher.match(command)
+        normalized_command = match.command if match else command
+        if match:
+            print(f"[DEBUG] 标准化指令: {normalized_command}（置信度 {match.confidence:.2f}）")
+        else:
+            print(f"[DEBUG] 标准化指令: {normalized_command}")
+
+        if seat is not None:
+            print(f"[DEBUG] 指令来自座位 {seat}（用户 {user_id}）")
+        if not is_command_permitted(normalized_command, user_id):
+            print(f"[DEBUG] 用户 {user_id} 无权限执行指令: {normalized_command}")
+            return None
+        if _intent_debouncer.allow(normalized_command):
+            execute_command(normalized_command)
         else:
-            print(f"[DEBUG] 未知指令: {normalized_command}")
+            print(f"[DEBUG] 忽略重复指令: {normalized_command}")
         return normalized_command
 
 
-# def record_audio():
-#     """主函数：监听触发词并录制指令"""
-#     while True:
-#         print("[DEBUG] 等待触发词...")
-#         if record_trigger():
-#             print("[DEBUG] 触发词检测到，开始录制指令")
-#             command_text = record_command()
-#             print(f"[DEBUG] record_command返回: {command_text}")
-#             if command_text:
-#                 return command_text
-#         else:
-#             print("[DEBUG] 未检测到触发词，继续监听...")
-#             time.sleep(1)
+def record_command():
+    """捕获指令音频，动态时长"""
+    print("请说出指令...")
+    utterance = record_utterance(COMMAND_MAX_DURATION)
+
+    if not utterance:
+        print("未录制到有效指令")
+        return None
+
+    try:
+        save_debug_audio(COMMAND_FILE, utterance.pcm)
+        command_text = transcribe_pcm(utterance.pcm)
+    finally:
+        utterance.release()
+    return handle_command_text(command_text, user_id=_single_mic_user())
+
 
 # 状态变量
 import time
 is_listening = True
 has_started = False
 
+def _reset_to_listening(callback):
+    if is_listening:  # 避免在已停止时调用
+        callback("监听指令...")
+
+
+def _on_command_transcribed(future, callback, seat=None, user_id=None):
+    """后台识别完成后执行指令，并把结果回传到 UI；多座位模式下带上座位和乘员"""
+    if future.cancelled():
+        return
+    try:
+        command_text = future.result()
+    except CancelledError:
+        print("[DEBUG] 丢弃过期的识别结果")
+        return
+    except Exception as e:
+        print(f"[DEBUG] 识别出错: {e}")
+        command_text = None
+
+    command = handle_command_text(command_text, seat=seat, user_id=user_id)
+    message = f"{command}" if command else ("指令未执行" if command_text else "识别失败...")
+    callback(f"[{seat}] {message}" if seat is not None else message)
+    threading.Timer(2.0, _reset_to_listening, args=(callback,)).start()
+
+
+def _on_streaming_intent(match, text, early, callback, user_id=None):
+    """流式识别匹配到指令时立即执行，不等句尾静音；与整句识别一样先检查权限"""
+    stage = "部分" if early else "最终"
+    print(f"[DEBUG] {stage}识别结果 '{text}' 匹配指令: {match.command}（置信度 {match.confidence:.2f}）")
+    if is_command_permitted(match.command, user_id):
+        execute_command(match.command)
+        callback(f"{match.command}")
+    else:
+        print(f"[DEBUG] 用户 {user_id} 无权限执行指令: {match.command}")
+        callback("指令未执行")
+    threading.Timer(2.0, _reset_to_listening, args=(callback,)).start()
+
+
+def record_streaming_command(recognizer, callback):
+    """录制一条指令，录音过程中逐块流式识别，指令明确后立即执行"""
+    print("请说出指令...")
+    recognizer.begin()
+    utterance = record_utterance(COMMAND_MAX_DURATION, on_audio=recognizer.feed)
+    text, fired = recognizer.end()
+    if not utterance:
+        return
+    save_debug_audio(COMMAND_FILE, utterance.pcm)
+    utterance.release()
+    if fired is not None:
+        return
+    # 没有匹配到任何指令：回传原文或识别失败
+    callback(f"{text}" if text else "识别失败...")
+    threading.Timer(2.0, _reset_to_listening, args=(callback,)).start()
+
+
+# 各座位的乘员：界面把当前登录用户登记到驾驶位，其他座位由人脸识别调用 assign_seat 登记，
+# 未登记的座位按访客权限处理
+seat_occupancy = SeatOccupancy(default_user=DEFAULT_USER_ID)
+
+
+def _sync_system_role(user_id, role):
+    """确保系统管理模块中有该用户且角色为 role，权限检查按系统中的角色进行"""
+    if system_users is None:
+        return
+    try:
+        system_users.add_user(user_id, user_id, role)
+    except ValueError: # 用户已存在
+        if system_users.get_user_role(user_id) != role:
+            system_users.change_user_role(user_id, role)
+
+
+def assign_seat(seat, user_id, role=None):
+    """
+    登记座位（如 "driver"）上的乘员 user_id，None 表示座位空出。
+    给出 role（系统角色，如 "driver"、"passenger"）时同步到系统管理模块的用户配置。
+    """
+    if user_id is not None and role is not None:
+        _sync_system_role(user_id, role)
+    seat_occupancy.assign(seat, user_id)
+
+
+def _single_mic_user():
+    """单麦克风模式下说话的乘员：按驾驶位登记的乘员检查权限"""
+    return seat_occupancy.user_for(SEATS[0].name)
+
+
+def _submit_seat_command(seat, utterance, callback):
+    """提交某个座位的指令语音段；每个座位一条识别队列，几个人同时说话时并行识别"""
+    user_id = seat_occupancy.user_for(seat.name)
+    save_debug_audio(COMMAND_FILE, utterance.pcm)
+    future = get_transcription_worker().submit(utterance.pcm, kind=f"command:{seat.name}")
+    future.add_done_callback(lambda f: _on_command_transcribed(f, callback, seat.name, user_id))
+    future.add_done_callback(lambda f: utterance.release())
+
+
+def record_multiseat_loop(callback, seats=SEATS):
+    """多声道麦克风阵列：每个座位独立做 VAD、唤醒词检测和指令识别，阻塞直到停止监听"""
+    service = get_capture_service()
+    listeners = [
+        SeatListener(seat, AdaptiveVAD(rate=SAMPLE_RATE, min_energy=RMS_THRESHOLD, hangover=VAD_HANGOVER),
+                     detect_trigger,
+                     on_command=lambda seat, utterance: _submit_seat_command(seat, utterance, callback),
+                     rate=SAMPLE_RATE, chunk=CHUNK, silence_duration=SILENCE_DURATION,
+                     trigger_max_duration=TRIGGER_MAX_DURATION, command_max_duration=COMMAND_MAX_DURATION,
+                     buffer_pool=UtteranceBufferPool(utterance_samples(COMMAND_MAX_DURATION, SAMPLE_RATE, CHUNK),
+                                                     size=UTTERANCE_BUFFERS),
+                     on_wake=lambda seat: callback(f"[{seat.name}] 监听指令..."))
+        for seat in seats if seat.channel < service.channels
+    ]
+    callback("等待触发词...")
+    MultiSeatCapture(service, listeners, crosstalk_ratio=CROSSTALK_RATIO).run(lambda: is_listening)
+
+
 def record_audio_loop(callback=None):
     """持续监听触发词与指令，使用 callback 实时回传文本到 UI"""
     global is_listening, has_started
@@ -373,6 +584,18 @@ def record_audio_loop(callback=None):
         if callback is None:
             callback = print  # 默认用print输出
         callback("开始监听...")
+        if MIC_ARRAY_CHANNELS > 1:
+            record_multiseat_loop(callback)
+            return
+        # 后端支持流式识别时，部分结果明确匹配到指令即可提前执行
+        recognizer = None
+        if get_asr_backend().streaming:
+            recognizer = StreamingCommandRecognizer(
+                get_asr_backend(), lambda: command_matcher,
+                on_intent=lambda match, text, early: _on_streaming_intent(match, text, early, callback,
+                                                                          user_id=_single_mic_user()),
+                rate=SAMPLE_RATE, min_confidence=EARLY_INTENT_CONFIDENCE, min_margin=EARLY_INTENT_MARGIN,
+                debouncer=_intent_debouncer)
         while is_listening:
             if not has_started:
                 callback("等待触发词...")
@@ -382,21 +605,20 @@ def record_audio_loop(callback=None):
                 else:
                     time.sleep(1)
                     continue
+            elif recognizer is not None:
+                record_streaming_command(recognizer, callback)
             else:
-                command_text = record_command()
-                if command_text:
-                    callback(f"{command_text}")
-                    def reset_to_listening():
-                        if is_listening:  # 避免在已停止时调用
-                            callback("监听指令...")
-                    threading.Timer(2.0, reset_to_listening).start()
-                else:
-                    callback("识别失败...")
-                def reset_to_listening():
-                    if is_listening:
-                        callback("监听指令...")
-                threading.Timer(2.0, reset_to_listening).start()
-                time.sleep(0.1)  # 稍微等待防止CPU过载
+                print("请说出指令...")
+                utterance = record_utterance(COMMAND_MAX_DURATION)
+                if not utterance:
+                    continue
+                save_debug_audio(COMMAND_FILE, utterance.pcm)
+                # 识别在后台进行，采集继续，紧接着说出的下一条指令不会丢失；
+                # 识别结束（包括被取消）后缓冲区才归还
+                future = get_transcription_worker().submit(utterance.pcm, kind="command")
+                user_id = _single_mic_user()
+                future.add_done_callback(lambda f, user_id=user_id: _on_command_transcribed(f, callback, user_id=user_id))
+                future.add_done_callback(lambda f, utterance=utterance: utterance.release())
     except KeyboardInterrupt:
         callback(" 终止监听")
     except Exception as e:
@@ -404,6 +626,8 @@ def record_audio_loop(callback=None):
     finally:
         is_listening = False
         has_started = False
+        stop_capture_service()
+        stop_transcription_worker()
         callback(" 停止监听")
 
 if __name__ == "__main__":
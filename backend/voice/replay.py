@@ -0,0 +1,473 @@
+"""
+语音模块回放基准测试。
+
+用 WAV 录音代替麦克风：VirtualPyAudio 实现 PyAudio 的 open/terminate 接口，
+按采集块大小以回调方式把录音送入 AudioCaptureService，之后的 VAD、唤醒词、语音识别和指令处理
+都走 record.py 中与实车相同的代码路径。不需要声卡，可以在 Linux CI 上运行。
+
+用法（在 voice 目录下）：
+    python replay.py -i recordings/session1.wav recordings/session2.wav -s transcripts.json
+    python replay.py -i recordings/*.wav --asr vosk --speed 4 --json replay.json --max-dropped 0
+
+transcripts.json 按语音段出现的顺序列出识别结果，例如 ["小贝", "打开音乐", "小贝", "关闭音乐"]，
+回放时由 ScriptedASRBackend 依次返回；也可以用 --asr vosk 使用本地识别模型。
+-t 给出唤醒词模板目录时使用本地唤醒词检测，否则触发词也经过语音识别。
+
+输出每个阶段的延迟直方图、每秒音频消耗的 CPU 时间以及丢弃的音频块数：
+    capture          PortAudio 回调（写入环形缓冲区）
+    vad              每块音频的语音活动检测
+    wakeword         本地唤醒词检测
+    asr              整段识别；asr_partial 为流式识别的逐块输入
+    handler          指令处理函数
+    command_latency  指令语音段结束到处理函数开始执行（流式识别提前触发的记为 0）
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+# 没有声卡时 pygame 使用哑音频驱动，必须在导入 record 之前设置
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+try:
+    from voice import record
+    from voice.capture import PA_INPUT_OVERFLOW, PA_INT16
+    from voice.wakeword import WakeWordDetector, load_wav
+    from voice.asr import create_asr_backend
+except ImportError:
+    import record
+    from capture import PA_INPUT_OVERFLOW, PA_INT16
+    from wakeword import WakeWordDetector, load_wav
+    from asr import create_asr_backend
+
+# 直方图桶的上界（毫秒）
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+STAGES = ("capture", "vad", "wakeword", "asr_partial", "asr", "handler", "command_latency")
+
+
+class StageStats:
+    """按阶段收集耗时（秒），线程安全"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def timed(self, stage, func):
+        """返回记录 func 每次调用耗时的包装函数"""
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return wrapper
+
+    def histogram(self, stage):
+        """返回 [(桶标签, 次数)]，最后一个桶是超过最大上界的部分"""
+        values = np.array(self.samples.get(stage, ())) * 1000.0
+        edges = (0.0,) + HISTOGRAM_BUCKETS_MS + (np.inf,)
+        counts, _ = np.histogram(values, bins=edges)
+        labels = [f"<{upper}ms" for upper in HISTOGRAM_BUCKETS_MS] + [f">={HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        return list(zip(labels, counts.tolist()))
+
+    def summary(self):
+        """返回 {阶段: {count, mean_ms, p50_ms, p95_ms, max_ms, histogram}}"""
+        result = {}
+        for stage in STAGES:
+            values = np.array(self.samples.get(stage, ())) * 1000.0
+            if len(values) == 0:
+                continue
+            result[stage] = {
+                "count": int(len(values)),
+                "mean_ms": float(values.mean()),
+                "p50_ms": float(np.percentile(values, 50)),
+                "p95_ms": float(np.percentile(values, 95)),
+                "max_ms": float(values.max()),
+                "histogram": dict(self.histogram(stage)),
+            }
+        return result
+
+
+class VirtualStream:
+    """
+    PyAudio 输入流的替身：start_stream() 后由后台线程按音频时长节奏（除以 speed）
+    逐块调用 stream_callback，录音结束后 finished 置位。
+    回调落后超过一块时，与 PortAudio 一样在 status 中报告输入溢出。
+    """
+
+    def __init__(self, samples, rate, channels, frames_per_buffer, stream_callback, speed, stats):
+        self.samples = samples
+        self.rate = rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.stream_callback = stream_callback
+        self.speed = speed
+        self.stats = stats
+        self.chunks = 0
+        self.late_chunks = 0
+        self.finished = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._position = 0
+
+    def start_stream(self):
+        if self.stream_callback is not None and self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _next_chunk(self):
+        chunk = self.samples[self._position:self._position + self.frames_per_buffer]
+        self._position += self.frames_per_buffer
+        if len(chunk) < self.frames_per_buffer:
+            padding = [(0, self.frames_per_buffer - len(chunk))] + [(0, 0)] * (chunk.ndim - 1)
+            chunk = np.pad(chunk, padding)
+        if chunk.ndim == 2:
+            # 多声道录音 (帧数, 声道数) 按行展开即为交错格式
+            return chunk.reshape(-1)
+        return np.repeat(chunk, self.channels) if self.channels > 1 else chunk
+
+    def _run(self):
+        period = self.frames_per_buffer / self.rate / self.speed
+        deadline = time.perf_counter()
+        while self._position < len(self.samples) and not self._stopped.is_set():
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            status = 0
+            if delay < -period:
+                # 回调线程被拖慢超过一块，真实设备上这一块会溢出
+                status = PA_INPUT_OVERFLOW
+                self.late_chunks += 1
+            data = self._next_chunk().tobytes()
+            start = time.perf_counter()
+            self.stream_callback(data, self.frames_per_buffer, {}, status)
+            self.stats.add("capture", time.perf_counter() - start)
+            self.chunks += 1
+        self.finished.set()
+
+    def read(self, num_frames, exception_on_overflow=True):
+        """阻塞模式读取（不使用回调时）"""
+        if self._position >= len(self.samples):
+            self.finished.set()
+        return self._next_chunk()[:num_frames * self.channels].tobytes()
+
+    def is_active(self):
+        return self._thread is not None and not self.finished.is_set()
+
+    def stop_stream(self):
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def close(self):
+        self.stop_stream()
+
+
+class VirtualPyAudio:
+    """PyAudio 的替身，open() 返回回放给定录音的 VirtualStream"""
+
+    def __init__(self, samples, rate, speed=1.0, stats=None):
+        """
+        参数：
+            samples: int16 单声道采样（每个声道播放同样的内容），或 (帧数, 声道数) 的多声道采样
+            rate (int): 采样率，必须与 open() 请求的一致
+            speed (float): 回放速度倍数，1.0 为实时
+            stats (StageStats): 记录回调耗时
+        """
+        if speed <= 0:
+            raise ValueError("speed 必须大于 0")
+        self.samples = np.asarray(samples, dtype=np.int16)
+        self.rate = rate
+        self.speed = speed
+        self.stats = stats or StageStats()
+        self.stream = None
+        self.opened = threading.Event()
+
+    def open(self, format=PA_INT16, channels=1, rate=None, input=True, frames_per_buffer=1024,
+             stream_callback=None, input_device_index=None, **kwargs):
+        if format != PA_INT16:
+            raise ValueError("虚拟音频源只支持 16-bit PCM")
+        if rate is not None and rate != self.rate:
+            raise ValueError(f"采样率不一致：录音 {self.rate} Hz，请求 {rate} Hz")
+        if self.samples.ndim == 2 and self.samples.shape[1] != channels:
+            raise ValueError(f"声道数不一致：录音 {self.samples.shape[1]}，请求 {channels}")
+        self.stream = VirtualStream(self.samples, self.rate, channels, frames_per_buffer,
+                                    stream_callback, self.speed, self.stats)
+        self.opened.set()
+        return self.stream
+
+    def get_sample_size(self, format):
+        return 2
+
+    def terminate(self):
+        pass
+
+
+class ScriptedASRBackend:
+    """按调用顺序依次返回给定的识别结果，用完后返回 None；delay 模拟识别耗时"""
+    name = "scripted"
+    streaming = False
+
+    def __init__(self, transcripts, delay=0.0):
+        self.transcripts = list(transcripts)
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def transcribe(self, pcm, rate):
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.calls += 1
+            return self.transcripts.pop(0) if self.transcripts else None
+
+
+class _TimedBackend:
+    """记录识别耗时的后端包装"""
+
+    def __init__(self, backend, stats):
+        self.backend = backend
+        self.name = backend.name
+        self.streaming = getattr(backend, "streaming", False)
+        self.transcribe = stats.timed("asr", backend.transcribe)
+        self._stats = stats
+
+    def start_stream(self, rate):
+        stream = self.backend.start_stream(rate)
+        stream.accept = self._stats.timed("asr_partial", stream.accept)
+        stream.finish = self._stats.timed("asr", stream.finish)
+        return stream
+
+
+class _TimedVAD:
+    def __init__(self, vad, stats):
+        self.vad = vad
+        self.is_speech = stats.timed("vad", vad.is_speech)
+
+
+class _TimedDetector:
+    def __init__(self, detector, stats):
+        self.detector = detector
+        self.detect = stats.timed("wakeword", detector.detect)
+
+
+class _CommandLatency:
+    """
+    测量指令语音段结束到处理函数开始执行的时间。
+    语音段结束时刻按 PCM 对象记录，随 PCM 进入后台识别线程；
+    流式识别在语音段结束之前触发的指令记为提前触发。
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.early = 0
+        self._closed_at = {}
+        self._local = threading.local()
+
+    def wrap_record_utterance(self, func):
+        def wrapper(max_duration, on_audio=None):
+            self._local.closed_at = None
+            self._local.recording = True
+            try:
+                utterance = func(max_duration, on_audio=on_audio)
+            finally:
+                self._local.recording = False
+            if utterance:
+                self._local.closed_at = self._closed_at[id(utterance.pcm)] = time.perf_counter()
+            return utterance
+        return wrapper
+
+    def wrap_transcribe(self, func):
+        def wrapper(pcm):
+            self._local.closed_at = self._closed_at.pop(id(pcm), None)
+            return func(pcm)
+        return wrapper
+
+    def wrap_handler(self, func):
+        def wrapper(command):
+            if getattr(self._local, "recording", False):
+                self.early += 1
+                self.stats.add("command_latency", 0.0)
+            elif getattr(self._local, "closed_at", None) is not None:
+                self.stats.add("command_latency", time.perf_counter() - self._local.closed_at)
+            return func(command)
+        return self.stats.timed("handler", wrapper)
+
+
+@contextlib.contextmanager
+def _patched(module, **replacements):
+    originals = {name: getattr(module, name) for name in replacements}
+    for name, value in replacements.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in originals.items():
+            setattr(module, name, value)
+
+
+def load_recordings(paths, rate=record.SAMPLE_RATE, gap=1.0):
+    """读取多段录音并拼接，段间和末尾插入 gap 秒静音，保证每段最后一句话能被分段结束"""
+    silence = np.zeros(int(gap * rate), dtype=np.int16)
+    parts = []
+    for path in paths:
+        parts.extend([load_wav(path, rate), silence])
+    return np.concatenate(parts) if parts else silence
+
+
+def run_replay(samples, backend, detector=None, speed=1.0, rate=record.SAMPLE_RATE, timeout=30.0):
+    """
+    通过 record.record_audio_loop 回放一段录音，返回统计结果字典。
+
+    参数：
+        samples: int16 单声道采样
+        backend: 语音识别后端
+        detector: 本地唤醒词检测器，None 表示触发词也经过语音识别
+        speed (float): 回放速度倍数
+        timeout (float): 录音放完后等待识别和指令处理完成的最长时间（秒）
+    """
+    stats = StageStats()
+    latency = _CommandLatency(stats)
+    audio = VirtualPyAudio(samples, rate, speed=speed, stats=stats)
+    messages = []
+
+    record.set_audio_interface_factory(lambda: audio)
+    record.set_asr_backend(_TimedBackend(backend, stats))
+    record.set_wakeword_detector(_TimedDetector(detector, stats) if detector is not None else None)
+    record.stop_transcription_worker()
+    record.is_listening = True
+    record.has_started = False
+    extra_allocations = record._utterance_pool.extra_allocations
+
+    with _patched(record,
+                  _vad=_TimedVAD(record._vad, stats),
+                  record_utterance=latency.wrap_record_utterance(record.record_utterance),
+                  transcribe_pcm=latency.wrap_transcribe(record.transcribe_pcm),
+                  execute_command=latency.wrap_handler(record.execute_command)):
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        loop = threading.Thread(target=record.record_audio_loop, args=(messages.append,), daemon=True)
+        loop.start()
+
+        audio.opened.wait(timeout)
+        service = record._capture_service
+        audio.stream.finished.wait(len(samples) / rate / speed + timeout)
+        # 等待缓冲区中的音频处理完、后台识别和指令执行结束
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            worker = record._transcription_worker
+            if len(service.ring) == 0 and (worker is None or worker.pending() == 0):
+                break
+            time.sleep(0.05)
+        dropped = service.ring.dropped
+        overflows = service.overflows
+
+        record.is_listening = False
+        loop.join(timeout)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+    record.set_audio_interface_factory(None)
+    audio_seconds = len(samples) / rate
+    return {
+        "audio_seconds": audio_seconds,
+        "speed": speed,
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+        "cpu_per_audio_second": cpu / audio_seconds if audio_seconds else 0.0,
+        "chunks": audio.stream.chunks,
+        "dropped_chunks": dropped,
+        "input_overflows": overflows,
+        "buffer_extra_allocations": record._utterance_pool.extra_allocations - extra_allocations,
+        "early_intents": latency.early,
+        "stages": stats.summary(),
+        "messages": messages,
+    }
+
+
+def format_report(result):
+    lines = [
+        f"音频时长 {result['audio_seconds']:.1f} s，回放速度 {result['speed']:g}x，"
+        f"用时 {result['wall_seconds']:.1f} s",
+        f"CPU 时间 {result['cpu_seconds']:.3f} s，每秒音频 {result['cpu_per_audio_second'] * 1000:.1f} ms",
+        f"音频块 {result['chunks']}，丢弃 {result['dropped_chunks']}，输入溢出 {result['input_overflows']}，"
+        f"流式提前触发 {result['early_intents']}",
+        f"语音段缓冲区额外分配 {result['buffer_extra_allocations']}",
+    ]
+    for stage, summary in result["stages"].items():
+        lines.append("")
+        lines.append(f"{stage}: {summary['count']} 次，平均 {summary['mean_ms']:.2f} ms，"
+                     f"P50 {summary['p50_ms']:.2f} ms，P95 {summary['p95_ms']:.2f} ms，"
+                     f"最大 {summary['max_ms']:.2f} ms")
+        peak = max(summary["histogram"].values())
+        for label, count in summary["histogram"].items():
+            if count:
+                lines.append(f"    {label:>9} {count:6d} {'#' * max(1, round(40 * count / peak))}")
+    return "\n".join(lines)
+
+
+# 参数解析器
+ap = argparse.ArgumentParser(description="语音模块回放基准测试")
+ap.add_argument("-i", "--input", nargs="+", required=True,
+                help="WAV recordings to replay, in order")
+ap.add_argument("-s", "--script", default=None,
+                help="JSON list of transcripts returned in order by the scripted ASR backend")
+ap.add_argument("--asr", default="scripted",
+                help="ASR backend: scripted (default), vosk, fixture or assemblyai")
+ap.add_argument("--asr-delay", type=float, default=0.0,
+                help="simulated recognition time of the scripted backend in seconds")
+ap.add_argument("-t", "--templates", default=None,
+                help="directory of wake word template WAVs, enables local wake word detection")
+ap.add_argument("--speed", type=float, default=1.0,
+                help="replay speed relative to real time")
+ap.add_argument("--gap", type=float, default=1.0,
+                help="seconds of silence inserted after each recording")
+ap.add_argument("--json", default=None,
+                help="write the results to this JSON file")
+ap.add_argument("--max-dropped", type=int, default=None,
+                help="exit with status 1 if more chunks than this were dropped")
+ap.add_argument("-v", "--verbose", action="store_true",
+                help="show the voice module's own output")
+
+
+def main():
+    arguments = vars(ap.parse_args())
+    if arguments["asr"] == "scripted":
+        transcripts = []
+        if arguments["script"]:
+            with open(arguments["script"], encoding="utf-8") as f:
+                transcripts = json.load(f)
+        backend = ScriptedASRBackend(transcripts, delay=arguments["asr_delay"])
+    else:
+        backend = create_asr_backend(arguments["asr"])
+    detector = None
+    if arguments["templates"]:
+        detector = WakeWordDetector.from_directory(arguments["templates"], rate=record.SAMPLE_RATE)
+
+    samples = load_recordings(arguments["input"], gap=arguments["gap"])
+    output = contextlib.nullcontext() if arguments["verbose"] else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        result = run_replay(samples, backend, detector=detector, speed=arguments["speed"])
+
+    print(format_report(result))
+    if arguments["json"]:
+        with open(arguments["json"], "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if arguments["max_dropped"] is not None and result["dropped_chunks"] > arguments["max_dropped"]:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
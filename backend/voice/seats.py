@@ -0,0 +1,191 @@
+"""
+多麦克风 / 多座位语音采集。
+
+麦克风阵列以一路交错的多声道流输入，每个声道对应一个座位（驾驶员、副驾驶……）。
+采集线程从环形缓冲区读出交错的块，用 NumPy 拆成各声道的视图分发给各座位的 SeatListener；
+每个座位在自己的线程里做 VAD、分段和唤醒词检测，指令识别走各自的 TranscriptionWorker 队列，
+几个人同时说话时互不等待。识别出的指令带上座位和该座位乘员的 user_id，由调用方按乘员角色检查权限。
+"""
+import queue
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    from voice.capture import UtteranceBufferPool, UtteranceSegmenter, utterance_samples
+except ImportError:
+    from capture import UtteranceBufferPool, UtteranceSegmenter, utterance_samples
+
+# 座位名称及其在麦克风阵列中的声道号
+Seat = namedtuple('Seat', ['name', 'channel'])
+
+
+def deinterleave(samples, channels):
+    """把交错的 int16 采样拆成 (channels, 帧数) 的视图，不复制数据"""
+    return np.asarray(samples).reshape(-1, channels).T
+
+
+def channel_energies(frames):
+    """各声道的均方能量，frames 形状为 (channels, 帧数)"""
+    return np.mean(np.square(frames, dtype=np.float64), axis=1)
+
+
+class SeatOccupancy:
+    """座位 → 乘员 user_id 的映射（由人脸识别或界面登记），未登记的座位返回 default_user"""
+
+    def __init__(self, default_user=None):
+        self.default_user = default_user
+        self._occupants = {}
+        self._lock = threading.Lock()
+
+    def assign(self, seat, user_id):
+        """登记座位上的乘员，user_id 为 None 表示座位空出"""
+        with self._lock:
+            if user_id is None:
+                self._occupants.pop(seat, None)
+            else:
+                self._occupants[seat] = user_id
+
+    def user_for(self, seat):
+        with self._lock:
+            return self._occupants.get(seat, self.default_user)
+
+
+class _GatedVAD:
+    """串音门限：本块中该声道不是主要声源时，即使 VAD 判为语音也视为静音"""
+
+    def __init__(self, vad):
+        self.vad = vad
+        self.dominant = True
+
+    def is_speech(self, samples):
+        # 即使被门限屏蔽也要送入 VAD，保持噪声基底和拖尾的跟踪
+        speech = self.vad.is_speech(samples)
+        return speech and self.dominant
+
+
+class SeatListener:
+    """
+    单个座位的监听线程：先等唤醒词，唤醒后该座位的每段语音都作为指令交给 on_command。
+
+    参数：
+        seat (Seat): 座位
+        vad: 该座位独立的 VAD（噪声基底各自跟踪）
+        detect_trigger: 判断一段 PCM 是否为唤醒词的函数
+        on_command: 指令语音段回调 on_command(seat, utterance)，
+            调用方负责在识别结束后 utterance.release()
+        buffer_pool (UtteranceBufferPool): 该座位的语音段缓冲池
+        queue_size (int): 待处理块的上限，座位线程落后时丢弃最旧的块而不是阻塞其他座位
+    """
+
+    def __init__(self, seat, vad, detect_trigger, on_command, rate, chunk, silence_duration,
+                 trigger_max_duration, command_max_duration, buffer_pool=None, queue_size=64,
+                 on_wake=None):
+        self.seat = seat
+        self.detect_trigger = detect_trigger
+        self.on_command = on_command
+        self.on_wake = on_wake
+        self.rate = rate
+        self.chunk = chunk
+        self.silence_duration = silence_duration
+        self.trigger_max_duration = trigger_max_duration
+        self.command_max_duration = command_max_duration
+        self.vad = _GatedVAD(vad)
+        self.buffer_pool = buffer_pool or UtteranceBufferPool(
+            utterance_samples(max(trigger_max_duration, command_max_duration), rate, chunk))
+        self.awake = False
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._segmenter = None
+        self._thread = None
+
+    def start(self):
+        self._segmenter = self._new_segmenter()
+        self._thread = threading.Thread(target=self._run, name=f"seat-{self.seat.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def _new_segmenter(self):
+        max_duration = self.command_max_duration if self.awake else self.trigger_max_duration
+        return UtteranceSegmenter(self.vad, self.rate, self.chunk, silence_duration=self.silence_duration,
+                                  max_duration=max_duration, buffer_pool=self.buffer_pool)
+
+    def feed(self, samples, dominant=True):
+        """采集线程调用：送入该座位的一块采样，不阻塞"""
+        try:
+            self._queue.put_nowait((samples, dominant))
+        except queue.Full:
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            self._queue.put_nowait((samples, dominant))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            samples, self.vad.dominant = item
+            utterance = self._segmenter.push(samples)
+            if utterance is not None:
+                self._handle(utterance)
+
+    def _handle(self, utterance):
+        if self.awake:
+            self.on_command(self.seat, utterance)
+            return
+        try:
+            detected = self.detect_trigger(utterance.pcm)
+        finally:
+            utterance.release()
+        if detected:
+            self.awake = True
+            self._segmenter = self._new_segmenter()
+            if self.on_wake is not None:
+                self.on_wake(self.seat)
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._segmenter is not None:
+            self._segmenter.reset()
+
+
+class MultiSeatCapture:
+    """
+    从多声道采集服务读取交错的块，拆分后分发给各座位的 SeatListener。
+    某一块中能量低于最响声道 crosstalk_ratio 倍的声道视为串音（别的座位的声音漏进来），
+    不会触发该座位的语音段；两个人同时说话时各自声道都是主要声源，互不影响。
+    """
+
+    def __init__(self, capture_service, listeners, crosstalk_ratio=0.25):
+        self.capture_service = capture_service
+        self.listeners = list(listeners)
+        self.crosstalk_ratio = crosstalk_ratio
+        self._channels = np.array([listener.seat.channel for listener in self.listeners])
+
+    def dispatch(self, chunk):
+        """拆分一块交错采样并送入各座位"""
+        frames = deinterleave(chunk, self.capture_service.channels)[self._channels]
+        energies = channel_energies(frames)
+        dominant = energies >= energies.max() * self.crosstalk_ratio
+        for listener, samples, is_dominant in zip(self.listeners, frames, dominant):
+            listener.feed(samples, bool(is_dominant))
+
+    def run(self, should_continue):
+        """采集循环，should_continue 返回 False 时结束"""
+        for listener in self.listeners:
+            listener.start()
+        try:
+            while self.capture_service.running and should_continue():
+                chunk = self.capture_service.read_chunk(timeout=0.1)
+                if chunk is not None:
+                    self.dispatch(chunk)
+        finally:
+            for listener in self.listeners:
+                listener.stop()
@@ -0,0 +1,96 @@
+import threading
+import time
+
+
+class IntentDebouncer:
+    """同一指令在 window 秒内只触发一次"""
+    def __init__(self, window=2.0):
+        self.window = window
+        self._last_fired = {}
+        self._lock = threading.Lock()
+
+    def allow(self, command, now=None):
+        """允许触发时记录触发时间并返回 True"""
+        now = time.time() if now is None else now
+        with self._lock:
+            last = self._last_fired.get(command)
+            if last is not None and now - last < self.window:
+                return False
+            self._last_fired[command] = now
+            return True
+
+
+class StreamingCommandRecognizer:
+    """
+    流式指令识别：语音还在输入时就把音频逐块送入流式识别会话，
+    部分识别结果一旦明确匹配到某条标准指令（置信度高且与次优指令拉开差距）立即触发，
+    不必等待句尾静音和完整识别。每段语音最多触发一次，跨语音段由 IntentDebouncer 去重。
+    """
+    def __init__(self, backend, matcher, on_intent, rate=16000, min_confidence=0.85, min_margin=0.3,
+                 debouncer=None):
+        """
+        参数：
+            backend: streaming 为 True 的语音识别后端
+            matcher: 返回 CommandMatch 的指令匹配器（或返回它的无参函数，便于切换用户后取到新索引）
+            on_intent: 触发回调 on_intent(match, text, early)，early 表示由部分结果提前触发
+            min_confidence (float): 部分结果提前触发所需的最低置信度
+            min_margin (float): 部分结果提前触发所需的与次优指令的置信度差
+            debouncer (IntentDebouncer): 跨语音段的去重器
+        """
+        self.backend = backend
+        self.matcher = matcher
+        self.on_intent = on_intent
+        self.rate = rate
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self.debouncer = debouncer or IntentDebouncer()
+        self._session = None
+        self._fired = None
+        self.last_partial = None
+
+    def _match(self, text):
+        matcher = self.matcher() if callable(self.matcher) else self.matcher
+        return matcher.match(text)
+
+    def begin(self):
+        """开始新的一段语音"""
+        self._session = self.backend.start_stream(self.rate)
+        self._fired = None
+        self.last_partial = None
+
+    def feed(self, samples):
+        """送入一块采样（int16 数组或 PCM 字节），必要时提前触发指令"""
+        if self._session is None:
+            self.begin()
+        # int16 数组以字节视图送入，不复制
+        pcm = memoryview(samples).cast('B') if hasattr(samples, 'tobytes') else samples
+        partial = self._session.accept(pcm)
+        if not partial or partial == self.last_partial:
+            return
+        self.last_partial = partial
+        if self._fired is not None:
+            return
+        match = self._match(partial)
+        if match and match.confidence >= self.min_confidence and match.margin >= self.min_margin:
+            self._fire(match, partial, early=True)
+
+    def end(self):
+        """
+        语音段结束：取得最终识别结果。尚未提前触发时按最终结果匹配并触发。
+        返回 (最终文本, 触发的 CommandMatch 或 None)。
+        """
+        if self._session is None:
+            return None, None
+        text = self._session.finish()
+        self._session = None
+        if self._fired is None and text:
+            match = self._match(text)
+            if match:
+                self._fire(match, text, early=False)
+        fired, self._fired = self._fired, None
+        return text, fired
+
+    def _fire(self, match, text, early):
+        self._fired = match
+        if self.debouncer.allow(match.command):
+            self.on_intent(match, text, early)
@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+
+
+class TranscriptionWorker:
+    """
+    异步语音识别调度器。
+    采集线程把语音段交给 submit() 后立即返回 Future，继续录音；识别在后台线程中进行。
+    每种语音段（如 "trigger"、"command"）有独立的队列和线程，同类结果按提交顺序完成。
+
+    新语音段到达时，同类中过期的识别会被取消：
+        supersede=True 时取消所有更早的同类识别（例如只关心最新一次唤醒尝试）；
+        否则只取消已等待超过 max_age 秒的识别，连续说出的多条指令都会被执行。
+    尚未开始的识别直接取消；已经在进行的远端识别无法中断，完成后结果被丢弃，
+    Future 以 CancelledError 结束。
+    """
+    def __init__(self, transcribe, max_age=5.0):
+        """
+        参数：
+            transcribe: 识别函数，接收 PCM，返回文本或 None
+            max_age (float): 识别结果过期前允许等待的最长时间（秒）
+        """
+        self.transcribe = transcribe
+        self.max_age = max_age
+        self._lanes = {}
+        self._pending = {}
+        self._stale = set()
+        self._lock = threading.Lock()
+
+    def submit(self, pcm, kind="command", supersede=False):
+        """提交一段语音，返回识别文本的 Future"""
+        future = Future()
+        now = time.time()
+        with self._lock:
+            pending = [(f, t) for f, t in self._pending.get(kind, []) if not f.done()]
+            for older, submitted_at in pending:
+                if supersede or now - submitted_at > self.max_age:
+                    self._cancel(older)
+            pending = [(f, t) for f, t in pending if not f.done()]
+            pending.append((future, now))
+            self._pending[kind] = pending
+            lane = self._lanes.get(kind)
+            if lane is None:
+                lane = self._lanes[kind] = queue.Queue()
+                threading.Thread(target=self._run, args=(lane,), daemon=True).start()
+        lane.put((future, pcm))
+        return future
+
+    def _cancel(self, future):
+        # 还在排队的直接取消，正在识别的标记为过期
+        if not future.cancel():
+            self._stale.add(future)
+
+    def _run(self, lane):
+        while True:
+            item = lane.get()
+            if item is None:
+                break
+            future, pcm = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                text = self.transcribe(pcm)
+            except Exception as e:
+                with self._lock:
+                    self._stale.discard(future)
+                future.set_exception(e)
+                continue
+            with self._lock:
+                stale = future in self._stale
+                self._stale.discard(future)
+            if stale:
+                future.set_exception(CancelledError())
+            else:
+                future.set_result(text)
+
+    def pending(self, kind=None):
+        """尚未完成的识别数量，kind 为 None 时统计所有类型"""
+        with self._lock:
+            kinds = self._pending if kind is None else {kind: self._pending.get(kind, [])}
+            return sum(1 for pending in kinds.values() for future, _ in pending if not future.done())
+
+    def cancel_all(self):
+        """取消所有未完成的识别"""
+        with self._lock:
+            for pending in self._pending.values():
+                for future, _ in pending:
+                    if not future.done():
+                        self._cancel(future)
+            self._pending.clear()
+
+    def shutdown(self):
+        """取消未完成的识别并结束后台线程"""
+        self.cancel_all()
+        with self._lock:
+            lanes, self._lanes = list(self._lanes.values()), {}
+        for lane in lanes:
+            lane.put(None)
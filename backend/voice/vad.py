@@ -0,0 +1,108 @@
+"""
+语音活动检测（VAD）。
+
+用 stride tricks 把一整块音频一次切成多帧，向量化计算每帧的能量、过零率和谱平坦度；
+噪声基底随车速、发动机噪声自适应变化；拖尾（hangover）保证句中短暂停顿不会把一句话切断，
+因此句尾只需很短的静音就能结束录音，不再需要固定的 4 秒静音。
+"""
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+def frame_view(samples, frame_size, hop=None):
+    """不复制数据地把一维采样切成 (帧数, frame_size) 的视图，末尾不足一帧的部分丢弃"""
+    samples = np.ascontiguousarray(samples)
+    hop = hop or frame_size
+    count = max(0, (len(samples) - frame_size) // hop + 1)
+    stride = samples.strides[0]
+    return as_strided(samples, shape=(count, frame_size), strides=(hop * stride, stride), writeable=False)
+
+
+def frame_features(frames):
+    """
+    返回每帧的 (RMS 能量, 过零率, 谱平坦度)，均为长度为帧数的数组。
+
+    参数：
+        frames (numpy.ndarray): (帧数, 帧长) 的 int16 采样
+    """
+    # 先转为浮点再平方，避免 int16 溢出
+    signal = frames.astype(np.float64) / 32768.0
+    energy = np.sqrt(np.mean(signal * signal, axis=1))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / max(1, frames.shape[1] - 1)
+    power = np.abs(np.fft.rfft(signal, axis=1)) ** 2 + 1e-12
+    flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+    return energy, zcr, flatness
+
+
+class AdaptiveVAD:
+    """
+    自适应噪声基底 + 拖尾的语音活动检测，可直接替换 capture.EnergyVAD。
+    一帧被判为语音需同时满足：
+        能量高于噪声基底 snr_ratio 倍，且高于绝对下限 min_energy；
+        谱平坦度低于 max_flatness（浊音），或过零率高于 min_fricative_zcr（清辅音）。
+    """
+    def __init__(self, rate=16000, frame_size=256, min_energy=0.0010, snr_ratio=3.0,
+                 max_flatness=0.4, min_fricative_zcr=0.3, hangover=0.3,
+                 floor_rise=0.02, floor_fall=0.3, floor_rise_in_speech=0.01):
+        """
+        参数：
+            rate (int): 采样率
+            frame_size (int): 分析帧长（采样点数）
+            min_energy (float): 语音的绝对能量下限（归一化 RMS）
+            snr_ratio (float): 语音能量相对噪声基底的最小倍数
+            max_flatness (float): 浊音帧的谱平坦度上限
+            min_fricative_zcr (float): 清辅音帧的过零率下限
+            hangover (float): 最后一个语音帧之后仍判为语音的时长（秒）
+            floor_rise / floor_fall (float): 噪声基底上升 / 下降的平滑系数，上升慢、下降快
+            floor_rise_in_speech (float): 语音期间噪声基底的上升系数，
+                使持续变大的背景噪声（如加速）最终被吸收进基底
+        """
+        self.rate = rate
+        self.frame_size = frame_size
+        self.min_energy = min_energy
+        self.snr_ratio = snr_ratio
+        self.max_flatness = max_flatness
+        self.min_fricative_zcr = min_fricative_zcr
+        self.hangover_frames = int(round(hangover * rate / frame_size))
+        self.floor_rise = floor_rise
+        self.floor_fall = floor_fall
+        self.floor_rise_in_speech = floor_rise_in_speech
+        self.reset()
+
+    def reset(self):
+        self.noise_floor = None
+        self._hangover_left = 0
+
+    def process(self, samples):
+        """
+        对任意长度的一块采样逐帧判决，返回每帧是否为语音（含拖尾）的布尔数组。
+        特征一次性向量化计算，只有噪声基底和拖尾的递推按帧进行。
+        """
+        frames = frame_view(samples, self.frame_size)
+        if len(frames) == 0:
+            return np.zeros(0, dtype=bool)
+        energy, zcr, flatness = frame_features(frames)
+        spectral = (flatness < self.max_flatness) | (zcr > self.min_fricative_zcr)
+        loud = energy > self.min_energy
+
+        decisions = np.empty(len(frames), dtype=bool)
+        floor = self.noise_floor if self.noise_floor is not None else max(energy[0], 1e-6)
+        for i in range(len(frames)):
+            raw_speech = loud[i] and spectral[i] and energy[i] > floor * self.snr_ratio
+            if raw_speech:
+                self._hangover_left = self.hangover_frames
+                decisions[i] = True
+                if energy[i] > floor:
+                    floor += self.floor_rise_in_speech * (energy[i] - floor)
+            else:
+                decisions[i] = self._hangover_left > 0
+                self._hangover_left = max(0, self._hangover_left - 1)
+                rate = self.floor_rise if energy[i] > floor else self.floor_fall
+                floor += rate * (energy[i] - floor)
+        self.noise_floor = floor
+        return decisions
+
+    def is_speech(self, samples):
+        """一块采样中只要有一帧为语音即返回 True，与 EnergyVAD 接口相同"""
+        return bool(self.process(samples).any())
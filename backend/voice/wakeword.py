@@ -0,0 +1,172 @@
+"""
+本地离线唤醒词检测（"小贝"）。
+
+用 NumPy 计算 MFCC 特征，再与录制的唤醒词样本做子序列 DTW 模板匹配，
+只有确认的唤醒事件才交给云端识别指令，车内噪声不再每次都触发一次云端转录。
+"""
+import glob
+import os
+import wave
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 0.025  # 分帧窗长（秒）
+FRAME_STEP = 0.010    # 帧移（秒）
+NUM_MEL_BANDS = 40
+NUM_MFCC = 13
+VOICED_RANGE = np.log(1e3)  # 有声帧相对最大帧能量的范围（30 dB，以自然对数功率表示）
+MAX_UTTERANCE_SECONDS = 3.0  # 超过该时长的语音段只取开头部分，限制每次检测的计算量
+
+
+def load_wav(path, rate=SAMPLE_RATE):
+    """读取 16-bit WAV 为 int16 单声道数组，采样率不同时线性插值重采样"""
+    with wave.open(path, 'rb') as wf:
+        channels = wf.getnchannels()
+        file_rate = wf.getframerate()
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"只支持 16-bit PCM：{path}")
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    if file_rate != rate and len(samples) > 0:
+        positions = np.arange(0, len(samples), file_rate / rate)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+    return samples
+
+
+def _mel_filterbank(rate, n_fft, num_bands):
+    """三角形 mel 滤波器组，形状 (num_bands, n_fft // 2 + 1)"""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+    mel_points = np.linspace(hz_to_mel(0.0), hz_to_mel(rate / 2.0), num_bands + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mel_points) / rate).astype(int)
+    filterbank = np.zeros((num_bands, n_fft // 2 + 1))
+    for band in range(num_bands):
+        left, center, right = bins[band], bins[band + 1], bins[band + 2]
+        if center > left:
+            filterbank[band, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            filterbank[band, center:right] = (right - np.arange(center, right)) / (right - center)
+    return filterbank
+
+
+def _dct_matrix(num_coefficients, num_bands):
+    """正交 DCT-II 矩阵，形状 (num_coefficients, num_bands)"""
+    n = np.arange(num_bands)
+    k = np.arange(num_coefficients)[:, None]
+    matrix = np.cos(np.pi * k * (2 * n + 1) / (2 * num_bands)) * np.sqrt(2.0 / num_bands)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+class FeatureExtractor:
+    """分帧、加窗、FFT、mel 滤波和 DCT 全部向量化，滤波器组和 DCT 矩阵只计算一次"""
+    def __init__(self, rate=SAMPLE_RATE, num_mel_bands=NUM_MEL_BANDS, num_mfcc=NUM_MFCC):
+        self.rate = rate
+        self.frame_length = int(round(FRAME_LENGTH * rate))
+        self.frame_step = int(round(FRAME_STEP * rate))
+        self.n_fft = 1 << (self.frame_length - 1).bit_length()
+        self.window = np.hamming(self.frame_length)
+        self.filterbank = _mel_filterbank(rate, self.n_fft, num_mel_bands)
+        self.dct = _dct_matrix(num_mfcc, num_mel_bands)
+
+    def log_mel(self, samples):
+        """返回 (帧数, num_mel_bands) 的对数 mel 能量"""
+        signal = np.asarray(samples, dtype=np.float64) / 32768.0
+        if len(signal) < self.frame_length:
+            signal = np.pad(signal, (0, self.frame_length - len(signal)))
+        # 预加重
+        signal = np.append(signal[0], signal[1:] - 0.97 * signal[:-1])
+        frames = sliding_window_view(signal, self.frame_length)[::self.frame_step]
+        spectrum = np.abs(np.fft.rfft(frames * self.window, n=self.n_fft)) ** 2 / self.n_fft
+        return np.log(spectrum @ self.filterbank.T + 1e-10)
+
+    def mfcc(self, samples):
+        """
+        返回倒谱均值归一化后的 (帧数, num_mfcc) MFCC 特征。
+        均值只在有声帧（能量在最大帧能量 30 dB 以内）上计算，前后静音的长短不影响特征。
+        """
+        log_mel = self.log_mel(samples)
+        features = log_mel @ self.dct.T
+        frame_energy = np.logaddexp.reduce(log_mel, axis=1)
+        voiced = frame_energy >= frame_energy.max() - VOICED_RANGE
+        return features - features[voiced].mean(axis=0)
+
+
+def subsequence_dtw(template, query):
+    """
+    子序列 DTW：模板可以匹配查询序列中的任意一段（例如"嘿，小贝"中的"小贝"）。
+    步进模式 (1,0)、(1,1)、(1,2) 使每一行只依赖上一行，整行可以一次向量化计算。
+    返回按模板帧数归一化的最小累计距离。
+
+    参数：
+        template (numpy.ndarray): (n, d) 模板特征
+        query (numpy.ndarray): (m, d) 待检测语音特征
+    """
+    # 欧氏距离矩阵 (n, m)
+    cost = np.sqrt(np.maximum(
+        (template ** 2).sum(axis=1)[:, None] + (query ** 2).sum(axis=1)[None, :] - 2.0 * template @ query.T, 0.0))
+    accumulated = cost[0].copy()
+    previous = np.empty_like(accumulated)
+    for row in cost[1:]:
+        previous[:] = accumulated
+        accumulated[1:] = np.minimum(previous[1:], previous[:-1])
+        accumulated[2:] = np.minimum(accumulated[2:], previous[:-2])
+        accumulated += row
+    return float(accumulated.min()) / len(template)
+
+
+class WakeWordDetector:
+    """
+    基于模板匹配的唤醒词检测器。
+    templates 为录制的唤醒词样本；threshold 为 None 时用模板之间的留一法距离自动确定。
+    """
+    def __init__(self, templates, threshold=None, rate=SAMPLE_RATE, max_seconds=MAX_UTTERANCE_SECONDS):
+        if not templates:
+            raise ValueError("至少需要一个唤醒词模板")
+        self.rate = rate
+        self.max_samples = int(max_seconds * rate)
+        self.features = FeatureExtractor(rate)
+        self.templates = [self.features.mfcc(samples) for samples in templates]
+        self.threshold = threshold if threshold is not None else self.calibrate_threshold()
+
+    @classmethod
+    def from_directory(cls, directory, threshold=None, rate=SAMPLE_RATE):
+        """从目录中的 *.wav 唤醒词样本创建检测器"""
+        paths = sorted(glob.glob(os.path.join(directory, '*.wav')))
+        return cls([load_wav(path, rate) for path in paths], threshold=threshold, rate=rate)
+
+    def calibrate_threshold(self, margin=1.2):
+        """用每个模板与其余模板的最小距离估计类内距离，取最大值再乘以 margin"""
+        if len(self.templates) < 2:
+            return float('inf')
+        distances = []
+        for i, template in enumerate(self.templates):
+            others = [subsequence_dtw(other, template) for j, other in enumerate(self.templates) if j != i]
+            distances.append(min(others))
+        return max(distances) * margin
+
+    def score(self, samples):
+        """返回语音段与所有模板的最小 DTW 距离，越小越像唤醒词"""
+        samples = np.asarray(samples)[:self.max_samples]
+        query = self.features.mfcc(samples)
+        return min(subsequence_dtw(template, query) for template in self.templates)
+
+    def detect(self, audio):
+        """
+        判断语音段是否包含唤醒词，返回 (是否唤醒, 距离)。
+
+        参数：
+            audio: int16 采样数组或 16-bit PCM 字节
+        """
+        if isinstance(audio, (bytes, bytearray, memoryview)):
+            audio = np.frombuffer(audio, dtype=np.int16)
+        distance = self.score(audio)
+        return distance <= self.threshold, distance
@@ -0,0 +1,74 @@
+"""
+本地唤醒词检测基准测试。
+
+用法（在 voice 目录下）：
+    python wakeword_benchmark.py -t temp/wakeword -p recordings/xiaobei -n recordings/cabin_noise
+
+positives 目录中是包含"小贝"的录音，negatives 目录中是车内噪声、其他对话等录音，
+输出误唤醒率、漏唤醒率以及每段录音的检测耗时。
+"""
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+
+from wakeword import SAMPLE_RATE, WakeWordDetector, load_wav
+
+# 参数解析器
+ap = argparse.ArgumentParser(description="本地唤醒词检测基准测试")
+ap.add_argument("-t", "--templates", required=True,
+                help="directory of wake word template WAVs")
+ap.add_argument("-p", "--positives", required=True,
+                help="directory of WAVs that contain the wake word")
+ap.add_argument("-n", "--negatives", required=True,
+                help="directory of WAVs that do not contain the wake word")
+ap.add_argument("--threshold", type=float, default=None,
+                help="DTW distance threshold, calibrated from the templates by default")
+
+
+def run_clips(detector, directory):
+    """对目录中每段录音运行检测，返回 (是否唤醒, 距离, 耗时秒, 音频时长秒) 列表"""
+    results = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.wav'))):
+        samples = load_wav(path, detector.rate)
+        start = time.perf_counter()
+        detected, distance = detector.detect(samples)
+        elapsed = time.perf_counter() - start
+        results.append((detected, distance, elapsed, len(samples) / detector.rate))
+    return results
+
+
+def summarize_latency(results):
+    latencies = np.array([elapsed for _, _, elapsed, _ in results]) * 1000.0
+    audio_seconds = sum(duration for _, _, _, duration in results)
+    return (f"平均 {latencies.mean():.1f} ms，P50 {np.percentile(latencies, 50):.1f} ms，"
+            f"P95 {np.percentile(latencies, 95):.1f} ms，最大 {latencies.max():.1f} ms，"
+            f"实时率 {latencies.sum() / 1000.0 / audio_seconds:.3f}")
+
+
+def main():
+    arguments = vars(ap.parse_args())
+    detector = WakeWordDetector.from_directory(arguments["templates"], threshold=arguments["threshold"],
+                                               rate=SAMPLE_RATE)
+    positives = run_clips(detector, arguments["positives"])
+    negatives = run_clips(detector, arguments["negatives"])
+    if not positives or not negatives:
+        raise SystemExit("positives 和 negatives 目录中都需要至少一个 WAV 文件")
+
+    false_rejects = sum(1 for detected, _, _, _ in positives if not detected)
+    false_accepts = sum(1 for detected, _, _, _ in negatives if detected)
+    negative_hours = sum(duration for _, _, _, duration in negatives) / 3600.0
+
+    print(f"模板数: {len(detector.templates)}，阈值: {detector.threshold:.3f}")
+    print(f"漏唤醒率 (FRR): {false_rejects}/{len(positives)} = {false_rejects / len(positives):.2%}")
+    print(f"误唤醒率 (FAR): {false_accepts}/{len(negatives)} = {false_accepts / len(negatives):.2%}"
+          f"（每小时 {false_accepts / negative_hours:.1f} 次）")
+    print(f"正样本距离: {np.median([d for _, d, _, _ in positives]):.3f}（中位数），"
+          f"负样本距离: {np.median([d for _, d, _, _ in negatives]):.3f}（中位数）")
+    print(f"检测耗时: {summarize_latency(positives + negatives)}")
+
+
+if __name__ == '__main__':
+    main()
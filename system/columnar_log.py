@@ -0,0 +1,192 @@
+# columnar_log.py
+
+import os
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError: # 可选依赖：未安装时只写 CSV
+    pa = None
+
+# 取值种类很少的列按字典编码存储，读入 pandas 后是 Categorical
+CATEGORICAL_COLUMNS = ("user_id", "user_role", "event_type", "recognized_intent", "input_modalities")
+PART_SUFFIX = ".parquet"
+_IN_PROGRESS_SUFFIX = ".inprogress" # 正在写入的分片没有 footer，读取时跳过
+
+
+def columnar_available() -> bool:
+    return pa is not None
+
+
+def log_schema(columns: list):
+    """交互日志的 Arrow schema：timestamp 为毫秒时间戳，低基数列字典编码，其余为字符串。"""
+    fields = []
+    for column in columns:
+        if column == "timestamp":
+            fields.append(pa.field(column, pa.timestamp("ms")))
+        elif column in CATEGORICAL_COLUMNS:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ParquetLogSink:
+    """
+    交互日志的 Parquet 输出，与 CSV 并行写入，由 InteractionLogWriter 的后台线程调用（非线程安全）。
+
+    行先在内存中积累，满 row_group_size 行写成一个 row group。一个分片（part-<开始时间>.parquet）
+    在跨天或 close() 时才写 footer 并对读取方可见，写入过程中带 .inprogress 后缀，
+    因此每天（每次运行）只产生一个分片，不会因为频繁 flush 产生大量小文件。
+    尚未进入已完成分片的记录仍在 CSV 中，分析时由 CSV 补齐（见 part_intervals）。
+    空字符串按缺失值 (null) 存储，与 pd.read_csv 读 CSV 的结果一致。
+    """
+
+    def __init__(self, directory: str, columns: list, row_group_size: int = 10000):
+        if pa is None:
+            raise RuntimeError("列式日志需要安装 pyarrow：pip install pyarrow")
+        self.directory = directory
+        self.columns = columns
+        self.row_group_size = row_group_size
+        self.schema = log_schema(columns)
+        self._timestamp_index = columns.index("timestamp") if "timestamp" in columns else None
+        self._rows = []
+        self._writer = None
+        self._part_path = None
+        self._part_day = None
+        self._closed = False
+        self._discard_unfinished_parts()
+
+    def _discard_unfinished_parts(self):
+        """上次异常退出时未写完的分片没有 footer，无法读取；其中的记录仍在 CSV 中。"""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(_IN_PROGRESS_SUFFIX):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def write_rows(self, rows: list):
+        if self._closed:
+            return # 关闭之后的记录只写 CSV，分析时从 CSV 补齐
+        self._rows.extend(rows)
+        if len(self._rows) >= self.row_group_size:
+            self._write_row_group()
+
+    def _to_table(self, rows: list):
+        arrays = []
+        for index, field in enumerate(self.schema):
+            values = [row[index] if index < len(row) and row[index] != "" else None for row in rows]
+            if field.name == "timestamp":
+                arrays.append(pa.array([_parse_timestamp(v) for v in values], pa.timestamp("ms")))
+            elif pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, pa.string()))
+        return pa.Table.from_arrays(arrays, schema=self.schema)
+
+    def _write_row_group(self):
+        rows, self._rows = self._rows, []
+        if not rows:
+            return
+        # 按日期拆开，保证每个分片只有一天的记录
+        for day, day_rows in self._split_by_day(rows):
+            if self._writer is not None and day != self._part_day:
+                self._close_part()
+            if self._writer is None:
+                self._open_part(day)
+            self._writer.write_table(self._to_table(day_rows), row_group_size=self.row_group_size)
+
+    def _split_by_day(self, rows: list):
+        if self._timestamp_index is None:
+            return [(None, rows)]
+        groups = []
+        for row in rows:
+            timestamp = _parse_timestamp(row[self._timestamp_index]) if self._timestamp_index < len(row) else None
+            day = timestamp.date() if timestamp else self._part_day
+            if groups and groups[-1][0] == day:
+                groups[-1][1].append(row)
+            else:
+                groups.append((day, [row]))
+        return groups
+
+    def _open_part(self, day):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"part-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{PART_SUFFIX}"
+        self._part_path = os.path.join(self.directory, name)
+        self._writer = pq.ParquetWriter(self._part_path + _IN_PROGRESS_SUFFIX, self.schema)
+        self._part_day = day
+
+    def _close_part(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        os.replace(self._part_path + _IN_PROGRESS_SUFFIX, self._part_path)
+        self._writer = None
+        self._part_path = None
+
+    def close(self):
+        """写出积累的行并关闭当前分片（程序退出时由 InteractionLogWriter.close 调用）。"""
+        if self._closed:
+            return
+        self._closed = True
+        self._write_row_group()
+        self._close_part()
+
+
+def part_paths(directory: str) -> list:
+    """目录中已完成的 Parquet 分片。"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(PART_SUFFIX))
+
+
+def part_intervals(directory: str, since: datetime = None, until: datetime = None) -> list:
+    """
+    已完成分片覆盖的时间范围 [(path, 最早时间, 最晚时间)]，取自 footer 中 timestamp 列的统计信息，
+    只返回与 [since, until] 重叠的分片。分片内的记录是连续写入的，这个范围内的记录都在分片中；
+    范围之外的记录（启用列式日志之前、当前未完成的分片、异常退出丢失的分片）只能从 CSV 读取。
+    """
+    intervals = []
+    for path in part_paths(directory):
+        metadata = pq.ParquetFile(path).metadata
+        index = metadata.schema.names.index("timestamp")
+        start = end = None
+        for i in range(metadata.num_row_groups):
+            statistics = metadata.row_group(i).column(index).statistics
+            if statistics is None or not statistics.has_min_max:
+                continue
+            start = statistics.min if start is None else min(start, statistics.min)
+            end = statistics.max if end is None else max(end, statistics.max)
+        if start is None:
+            continue
+        if (since is not None and end < since) or (until is not None and start > until):
+            continue
+        intervals.append((path, start, end))
+    return intervals
+
+
+def read_log_table(paths: list, columns: list = None, since: datetime = None, until: datetime = None):
+    """
+    读取 Parquet 分片，只读 columns 中的列；时间窗口作为过滤条件下推，
+    时间范围不重叠的 row group 根据 Parquet 统计信息直接跳过。
+    """
+    dataset = ds.dataset(paths, format="parquet")
+    condition = None
+    if since is not None:
+        condition = ds.field("timestamp") >= pa.scalar(since, pa.timestamp("ms"))
+    if until is not None:
+        upper = ds.field("timestamp") <= pa.scalar(until, pa.timestamp("ms"))
+        condition = upper if condition is None else condition & upper
+    return dataset.to_table(columns=columns, filter=condition)
@@ -60,6 +60,25 @@ LOG_COLUMNS = [
     "event_data"
 ]
 
+# 交互日志后台写入：队列中积累到 LOG_FLUSH_ROWS 行或距上次写盘超过 LOG_FLUSH_INTERVAL 秒时批量写入
+LOG_FLUSH_INTERVAL = 1.0
+LOG_FLUSH_ROWS = 100
+LOG_QUEUE_SIZE = 10000 # 队列上限，写盘跟不上时 log_interaction 最多阻塞 LOG_QUEUE_TIMEOUT 秒，之后丢弃该行并计数
+LOG_QUEUE_TIMEOUT = 0.1
+
+# 交互日志分段轮转：活动文件超过 LOG_ROTATE_MAX_BYTES 或跨天时封存为压缩分段，并记录到分段目录的 manifest.json
+LOG_ROTATE_MAX_BYTES = 10 * 1024 * 1024
+LOG_ROTATE_DAILY = True
+LOG_COMPRESSION = "gzip" # "gzip"、"zstd"（需要安装 zstandard）或 None
+
+# 可选的列式日志（需要 pyarrow）："parquet" 时交互记录同时写成 Parquet 分片（每天一个），None 只写 CSV。
+# 分析时已完成分片覆盖的时间段读 Parquet，启用之前的历史和当天尚未完成的分片仍从 CSV 读取
+LOG_COLUMNAR_FORMAT = None
+LOG_COLUMNAR_DIR = os.path.join(DATA_DIR, "interaction_log_parquet")
+LOG_COLUMNAR_ROW_GROUP = 10000
+
+# 启动时日志分析只读取最近 ANALYSIS_WINDOW_DAYS 天的分段，None 表示读取全部历史
+ANALYSIS_WINDOW_DAYS = 30
 
 # 日志分析报告输出路径 (可选，可以放在 logs 子目录下)
 ANALYSIS_REPORT_PATH = os.path.join(DATA_DIR, "reports", "analysis_report.txt")
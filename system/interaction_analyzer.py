@@ -6,8 +6,42 @@ from collections import defaultdict
 import json
 import ast # 引入 ast 模块用于解析 Python 字面量
 from . import config
+from .interaction_logger import log_segment_paths, columnar_log_enabled
+from .columnar_log import part_intervals, read_log_table
 from datetime import datetime
 
+# 分析用到的列，列式日志只读取这些列
+ANALYSIS_COLUMNS = ["timestamp", "user_id", "user_role", "recognized_intent", "input_modalities"]
+
+
+def _positive_counts(series: pd.Series) -> dict:
+    """value_counts 转为字典，去掉 Categorical 列中本组未出现的类别（计数为 0）"""
+    counts = series.value_counts()
+    return counts[counts > 0].to_dict()
+
+
+def _count_modalities(series: pd.Series) -> dict:
+    """统计 input_modalities（';' 分隔）中各模态的出现次数，每种组合只拆分一次"""
+    modality_counts = defaultdict(int)
+    counts = series.value_counts()
+    # 按组合首次出现的顺序累加，次数相同时最常用模态的取法与逐行统计一致
+    for modalities_str in series.dropna().unique():
+        count = counts[modalities_str]
+        # 确保处理的是字符串并忽略 'N/A'
+        if isinstance(modalities_str, str) and modalities_str.strip() != 'N/A':
+            for mod in modalities_str.split(';'):
+                modality_counts[mod.strip()] += count
+    return modality_counts
+
+
+def _fill_missing(df: pd.DataFrame, column: str, value: str):
+    """fillna，兼容 Categorical 列（填充值须先加入类别）"""
+    series = df[column]
+    if isinstance(series.dtype, pd.CategoricalDtype) and value not in series.cat.categories:
+        series = series.cat.add_categories([value])
+    df[column] = series.fillna(value)
+
+
 class InteractionAnalyzer:
     def __init__(self):
         self.log_path = config.INTERACTION_LOG_PATH
@@ -15,36 +49,15 @@ class InteractionAnalyzer:
         # 确保报告目录存在
         os.makedirs(os.path.dirname(self.report_path), exist_ok=True)
 
-    def run_analysis(self, user_manager_instance):
+    def run_analysis(self, user_manager_instance, since: datetime = None, until: datetime = None):
         """
         执行日志分析并生成报告，然后根据分析结果更新用户配置。
         Args:
             user_manager_instance: UserManager 的实例，用于加载和保存用户配置。
+            since, until: 只分析该时间窗口内的记录（None 表示不限），只读取与窗口重叠的日志分段。
         """
-        if not os.path.exists(self.log_path) or os.path.getsize(self.log_path) == 0:
-            print("日志文件不存在或为空，跳过分析。")
-            return
-
-        try:
-            # 读取CSV文件
-            # 使用 dtype=str 防止 pandas 自动推断 event_data 列的类型，确保它是字符串
-            df = pd.read_csv(self.log_path, dtype=str)
-            # 确保所有必要的列都存在，如果不存在则用默认值填充 NaN
-            for col in config.LOG_COLUMNS:
-                if col not in df.columns:
-                    df[col] = pd.NA # 使用 pandas 的 NA 表示缺失值
-
-            # 将 NaN 填充为空字符串，以便后续的字符串处理和解析不易出错
-            # 只对可能包含数据的列进行填充，特别是 event_data
-            df['event_data'] = df['event_data'].fillna('')
-            df['recognized_intent'] = df['recognized_intent'].fillna('N/A') #填充意图列，方便后续处理
-            df['input_modalities'] = df['input_modalities'].fillna('N/A') #填充模态列
-
-        except pd.errors.EmptyDataError:
-            print("日志文件为空，无法进行分析。")
-            return
-        except Exception as e:
-            print(f"读取日志文件时发生错误: {e}")
+        df = self._load_logs(since, until)
+        if df is None:
             return
 
         print("--- 开始加载并分析交互日志 ---")
@@ -61,6 +74,96 @@ class InteractionAnalyzer:
         print("--- 用户个性化配置更新完成 ---")
 
 
+    def _load_logs(self, since: datetime = None, until: datetime = None):
+        """
+        读取与时间窗口重叠的日志并合并为一个 DataFrame，只保留分析用到的列，没有可分析的记录时返回 None。
+        启用列式日志时，已完成的 Parquet 分片覆盖的时间段读 Parquet，其余时间段
+        （启用之前的历史、今天尚未写完的分片、异常退出丢失的分片）从 CSV 分段补齐。
+        """
+        intervals = []
+        if columnar_log_enabled():
+            try:
+                intervals = part_intervals(config.LOG_COLUMNAR_DIR, since, until)
+            except Exception as e:
+                print(f"读取列式日志时发生错误，改为读取 CSV: {e}")
+        covered = [(start, end) for _, start, end in intervals]
+
+        frames = []
+        csv_df = self._load_csv_logs(since, until, covered)
+        if csv_df is not None:
+            frames.append(csv_df)
+        if intervals:
+            columnar_df = self._load_columnar_logs([path for path, _, _ in intervals], since, until)
+            if columnar_df is None:
+                # Parquet 读取失败时已跳过的 CSV 分段也要读回来
+                frames = [f for f in [self._load_csv_logs(since, until)] if f is not None]
+            else:
+                frames.append(columnar_df)
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            print("时间窗口内没有交互记录，跳过分析。")
+            return None
+
+        if len(frames) > 1:
+            # 保持按时间的先后顺序，与逐行读取整个 CSV 的结果一致
+            df = pd.concat(frames, ignore_index=True)
+            df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        else:
+            df = frames[0]
+        # 将 NaN 填充为 'N/A'，以便后续的字符串处理和解析不易出错
+        _fill_missing(df, 'recognized_intent', 'N/A') #填充意图列，方便后续处理
+        _fill_missing(df, 'input_modalities', 'N/A') #填充模态列
+        return df
+
+    def _load_columnar_logs(self, paths: list, since: datetime = None, until: datetime = None):
+        """只读取分析用到的列；类别列读入后为 Categorical，timestamp 为 datetime。读取失败时返回 None。"""
+        try:
+            table = read_log_table(paths, ANALYSIS_COLUMNS, since, until)
+        except Exception as e:
+            print(f"读取列式日志时发生错误，改为读取 CSV: {e}")
+            return None
+        return table.to_pandas()
+
+    def _load_csv_logs(self, since: datetime = None, until: datetime = None, covered=()):
+        """
+        读取与时间窗口重叠的 CSV 日志分段，timestamp 解析为 datetime。
+        落在 covered 时间区间内的记录（已由 Parquet 分片提供）不读取或丢弃。没有记录时返回 None。
+        """
+        paths = [p for p in log_segment_paths(since, until, covered=covered) if os.path.getsize(p) > 0]
+        frames = []
+        for path in paths:
+            try:
+                # 使用 dtype=str 防止 pandas 自动推断列的类型；已封存的分段按扩展名自动解压 (.gz / .zst)
+                frames.append(pd.read_csv(path, dtype=str, usecols=lambda column: column in ANALYSIS_COLUMNS))
+            except pd.errors.EmptyDataError:
+                continue
+            except Exception as e:
+                print(f"读取日志文件 {path} 时发生错误: {e}")
+        if not frames:
+            return None
+
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        # 确保所有必要的列都存在，如果不存在则用默认值填充 NaN
+        for col in ANALYSIS_COLUMNS:
+            if col not in df.columns:
+                df[col] = pd.NA # 使用 pandas 的 NA 表示缺失值
+
+        timestamps = pd.to_datetime(df['timestamp'], errors='coerce')
+        keep = pd.Series(True, index=df.index)
+        if since is not None or until is not None:
+            # 分段按整段挑选，窗口边缘的分段里还有窗口外的记录
+            keep &= timestamps.notna()
+            if since is not None:
+                keep &= timestamps >= since
+            if until is not None:
+                keep &= timestamps <= until
+        for start, end in covered:
+            keep &= ~((timestamps >= start) & (timestamps <= end))
+        df['timestamp'] = timestamps
+        if not keep.all():
+            df = df[keep].reset_index(drop=True)
+        return df
+
     def _generate_analysis_report(self, df: pd.DataFrame) -> str:
         """
         根据DataFrame生成分析报告的文本内容。
@@ -76,7 +179,7 @@ class InteractionAnalyzer:
         # 全局常用指令/意图
         report_lines.append("--- 全局常用指令/意图 ---")
         # 使用 .value_counts() 统计，这里包括了 'N/A' 意图
-        global_commands = df['recognized_intent'].value_counts().to_dict()
+        global_commands = _positive_counts(df['recognized_intent'])
         for cmd, count in global_commands.items():
             # 过滤掉计数为0的 'N/A'，但如果 'N/A' 有计数则保留
             if cmd == 'N/A' and count == 0:
@@ -86,12 +189,7 @@ class InteractionAnalyzer:
 
         # 全局模态使用频率
         report_lines.append("--- 全局模态使用频率 ---")
-        all_modalities = defaultdict(int)
-        # 遍历 input_modalities 列，确保处理的是字符串
-        for modalities_str in df['input_modalities']:
-            if isinstance(modalities_str, str) and modalities_str.strip() != 'N/A': # 忽略 'N/A'
-                 for mod in modalities_str.split(';'):
-                     all_modalities[mod.strip()] += 1
+        all_modalities = _count_modalities(df['input_modalities'])
         for mod, count in all_modalities.items():
             report_lines.append(f"- {mod}: {count}次")
         report_lines.append("\n")
@@ -168,17 +266,11 @@ class InteractionAnalyzer:
 
         # 常用指令/意图
         # 统计所有 recognized_intent，包括 'N/A' 值
-        common_commands = user_logs['recognized_intent'].value_counts().to_dict()
+        common_commands = _positive_counts(user_logs['recognized_intent'])
         user_analysis_data['common_commands'] = common_commands
 
         # 偏好模态
-        modality_counts = defaultdict(int)
-        # 遍历 input_modalities 列，确保处理的是字符串并忽略 'N/A'
-        for modalities_str in user_logs['input_modalities']:
-             if isinstance(modalities_str, str) and modalities_str.strip() != 'N/A':
-                  for mod in modalities_str.split(';'):
-                       modality_counts[mod.strip()] += 1
-
+        modality_counts = _count_modalities(user_logs['input_modalities'])
         user_analysis_data['preferred_modality_counts'] = modality_counts
         if modality_counts:
             preferred_modality = max(modality_counts, key=modality_counts.get)
@@ -1,11 +1,20 @@
 # system_management/interaction_logger.py
 
+import atexit
 import csv
 import os
+import queue
+import threading
+import time
 from datetime import datetime
 # 从 config 中导入 INTERACTION_LOG_PATH 和 LOG_COLUMNS
 # 我们在 config.py 中已经移除了冗余的 LOG_HEADERS，统一使用 LOG_COLUMNS
 from .config import INTERACTION_LOG_PATH, LOG_COLUMNS
+from .config import LOG_FLUSH_INTERVAL, LOG_FLUSH_ROWS, LOG_QUEUE_SIZE, LOG_QUEUE_TIMEOUT
+from .config import LOG_ROTATE_MAX_BYTES, LOG_ROTATE_DAILY, LOG_COMPRESSION
+from .config import LOG_COLUMNAR_FORMAT, LOG_COLUMNAR_DIR, LOG_COLUMNAR_ROW_GROUP
+from .log_rotation import SegmentedLog
+from .columnar_log import ParquetLogSink, columnar_available
 
 def _ensure_data_dir_exists():
     """确保 data 目录存在"""
@@ -16,6 +25,7 @@ def _ensure_data_dir_exists():
 def initialize_log():
     """初始化日志文件：如果不存在则创建并写入表头。"""
     _ensure_data_dir_exists()
+    flush_log() # 先写完队列中的记录，后台线程发现文件被替换时会重新打开
     write_header = not os.path.exists(INTERACTION_LOG_PATH)
     if write_header:
         with open(INTERACTION_LOG_PATH, 'w', newline='', encoding='utf-8-sig') as f: # utf-8-sig 确保Excel能正确打开中文CSV
@@ -47,9 +57,283 @@ def initialize_log():
             print(f"检查日志表头时发生错误: {e}")
 
 
+class InteractionLogWriter:
+    """
+    交互日志的后台写入线程。
+
+    log_interaction 只把一行放入内存队列就返回；后台线程用一个常驻的文件句柄，
+    在积累到 batch_size 行或距本批第一行超过 flush_interval 秒时批量写入并 flush。
+    文件被删除或替换（例如清理 data 目录后重新初始化）时自动重新打开，新文件先写表头。
+    队列满时提交方最多阻塞 put_timeout 秒，仍然满则丢弃该行；stats() 返回背压指标。
+    给出 segments (SegmentedLog) 时，每批写入前检查是否需要轮转，封存和压缩也在后台线程中完成。
+    给出 columnar (ParquetLogSink) 时每批同时交给它，close() 时关闭它的当前分片。
+    """
+
+    def __init__(self, path: str, columns: list, flush_interval: float = 1.0, batch_size: int = 100,
+                 max_queue: int = 10000, put_timeout: float = 0.1, segments: SegmentedLog = None,
+                 columnar: ParquetLogSink = None):
+        self.path = path
+        self.columns = columns
+        self.segments = segments
+        self.columnar = columnar
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._writer = None
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,       # 提交的行数
+            "written": 0,         # 已写入文件的行数
+            "dropped": 0,         # 队列满且等待超时被丢弃的行数
+            "blocked": 0,         # 提交时因队列满而阻塞的次数
+            "blocked_seconds": 0.0, # 提交方累计阻塞时间
+            "max_queue_depth": 0, # 队列最大深度
+            "batches": 0,         # 写盘批次数
+            "rotations": 0,       # 分段轮转次数
+            "write_errors": 0,
+        }
+        atexit.register(self.close)
+
+    def submit(self, row: list) -> bool:
+        """提交一行日志，返回是否进入队列。"""
+        if self._closed:
+            # 关闭之后（例如 atexit 之后仍有记录）直接同步写入
+            self._write_rows([row])
+            return True
+        self._start()
+        with self._lock:
+            self._stats["submitted"] += 1
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            started = time.perf_counter()
+            try:
+                self._queue.put(row, timeout=self.put_timeout)
+                accepted = True
+            except queue.Full:
+                accepted = False
+            with self._lock:
+                self._stats["blocked"] += 1
+                self._stats["blocked_seconds"] += time.perf_counter() - started
+                if not accepted:
+                    self._stats["dropped"] += 1
+            if not accepted:
+                return False
+        depth = self._queue.qsize()
+        if depth > self._stats["max_queue_depth"]:
+            with self._lock:
+                self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+        return True
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._run, name="interaction-log-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        if self.segments is not None:
+            self.segments.recover()
+        while True:
+            item = self._queue.get()
+            batch, markers = [], []
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    markers.append(item)
+                    break # flush() 请求：立即写出已取出的行
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_rows(batch)
+            for marker in markers:
+                marker.set()
+            if stop:
+                break
+
+    def _open(self):
+        """打开（或在文件被替换后重新打开）日志文件，新文件先写表头。"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            st = None
+        if self._file is not None:
+            if st is not None and os.fstat(self._file.fileno()).st_ino == st.st_ino:
+                return
+            self._file.close()
+            self._file = None
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, 'a', newline='', encoding='utf-8-sig') # utf-8-sig 确保Excel能正确打开中文CSV
+        self._writer = csv.writer(self._file)
+        if st is None or st.st_size == 0:
+            self._writer.writerow(self.columns)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_rows(self, rows: list):
+        try:
+            if self.segments is not None and self.segments.should_rotate():
+                self._close_file()
+                if self.segments.maybe_rotate():
+                    with self._lock:
+                        self._stats["rotations"] += 1
+            self._open()
+            self._writer.writerows(rows)
+            self._file.flush()
+            with self._lock:
+                self._stats["written"] += len(rows)
+                self._stats["batches"] += 1
+        except Exception as e:
+            with self._lock:
+                self._stats["write_errors"] += 1
+            print(f"错误：写入日志失败 - {e}")
+        if self.columnar is not None:
+            try:
+                self.columnar.write_rows(rows)
+            except Exception as e:
+                with self._lock:
+                    self._stats["write_errors"] += 1
+                print(f"错误：写入列式日志失败 - {e}")
+
+    def _close_columnar(self):
+        if self.columnar is None:
+            return
+        try:
+            self.columnar.close()
+        except Exception as e:
+            with self._lock:
+                self._stats["write_errors"] += 1
+            print(f"错误：写入列式日志失败 - {e}")
+
+    def flush(self, timeout: float = None) -> bool:
+        """等待此前提交的日志全部写入文件，返回是否在超时前完成。"""
+        if self._thread is None or self._closed:
+            return True
+        marker = threading.Event()
+        self._queue.put(marker)
+        return marker.wait(timeout)
+
+    def close(self):
+        """写完队列中的日志并关闭文件（已注册到 atexit）。"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+        self._close_file()
+        self._close_columnar()
+
+    def stats(self) -> dict:
+        """背压与吞吐指标。"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        return stats
+
+
+def read_log_rows(f):
+    """逐行产出 CSV 日志的 (timestamp, user_id)，供分段统计使用，时间戳无法解析的行跳过。"""
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if not header or 'timestamp' not in header:
+        return
+    ts_index = header.index('timestamp')
+    user_index = header.index('user_id') if 'user_id' in header else None
+    for row in reader:
+        try:
+            timestamp = datetime.fromisoformat(row[ts_index])
+        except (IndexError, ValueError):
+            continue
+        user = row[user_index] if user_index is not None and user_index < len(row) else None
+        yield timestamp, user
+
+
+_log_segments = SegmentedLog(INTERACTION_LOG_PATH, read_log_rows, max_bytes=LOG_ROTATE_MAX_BYTES,
+                             rotate_daily=LOG_ROTATE_DAILY, compression=LOG_COMPRESSION, encoding='utf-8-sig')
+
+_columnar_sink = None
+if LOG_COLUMNAR_FORMAT == "parquet":
+    if columnar_available():
+        _columnar_sink = ParquetLogSink(LOG_COLUMNAR_DIR, LOG_COLUMNS, row_group_size=LOG_COLUMNAR_ROW_GROUP)
+    else:
+        print("警告：未安装 pyarrow，交互日志只写 CSV。")
+elif LOG_COLUMNAR_FORMAT is not None:
+    print(f"警告：不支持的列式日志格式 {LOG_COLUMNAR_FORMAT}，交互日志只写 CSV。")
+
+# 模块级的后台写入器，首次记录时启动线程
+_log_writer = InteractionLogWriter(INTERACTION_LOG_PATH, LOG_COLUMNS, flush_interval=LOG_FLUSH_INTERVAL,
+                                   batch_size=LOG_FLUSH_ROWS, max_queue=LOG_QUEUE_SIZE,
+                                   put_timeout=LOG_QUEUE_TIMEOUT, segments=_log_segments,
+                                   columnar=_columnar_sink)
+
+
+def columnar_log_enabled() -> bool:
+    """是否在写 Parquet 日志（配置启用且已安装 pyarrow）。"""
+    return _columnar_sink is not None
+
+
+def log_segment_paths(since: datetime = None, until: datetime = None, user_id: str = None, covered=()) -> list:
+    """
+    与时间窗口 [since, until] 重叠的日志文件（已封存的压缩分段在前，活动文件在最后），
+    完全落在 covered 中某个时间区间内的分段跳过。
+    """
+    return _log_segments.segment_paths(since, until, user_id, covered)
+
+
+def log_segment_dir() -> str:
+    """已封存分段及 manifest.json 所在目录。"""
+    return _log_segments.segment_dir
+
+
+def configure_logger(flush_interval: float = None, batch_size: int = None):
+    """调整批量写入的间隔（秒）和每批行数。"""
+    if flush_interval is not None:
+        _log_writer.flush_interval = flush_interval
+    if batch_size is not None:
+        _log_writer.batch_size = batch_size
+
+
+def flush_log(timeout: float = None) -> bool:
+    """等待已提交的日志全部写入文件（分析日志之前调用）。"""
+    return _log_writer.flush(timeout)
+
+
+def shutdown_logger():
+    """写完剩余日志并关闭文件，程序退出时也会自动调用。"""
+    _log_writer.close()
+
+
+def get_logger_stats() -> dict:
+    """返回日志写入的背压指标：提交/写入/丢弃行数、阻塞次数与时间、队列深度等。"""
+    return _log_writer.stats()
+
+
 def log_interaction(log_data: dict):
     """
-    记录一次交互到CSV文件。
+    记录一次交互到CSV文件（放入队列，由后台线程批量写入）。
     log_data: 一个字典，键应与 LOG_COLUMNS 中的值对应。
     """
     # initialize_log() # 每次记录都检查可能影响性能，但确保安全。可以移到模块加载时或启动时调用一次。
@@ -69,13 +353,8 @@ def log_interaction(log_data: dict):
             pass
 
 
-    try:
-        with open(INTERACTION_LOG_PATH, 'a', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            writer.writerow(row_to_write)
-        # print(f"日志记录成功: {log_entry}") # 通常生产环境不会打印每条日志
-    except Exception as e:
-        print(f"错误：写入日志失败 - {e}")
+    if not _log_writer.submit(row_to_write):
+        print("警告：日志队列已满，丢弃一条交互记录。")
 
 # 模块导入时即初始化日志，确保文件和表头准备就绪
 # initialize_log() # 在 main.py 中统一初始化
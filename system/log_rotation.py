@@ -0,0 +1,267 @@
+# log_rotation.py
+
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+try:
+    import zstandard # 可选：安装后可用 compression="zstd"
+except ImportError:
+    zstandard = None
+
+MANIFEST_NAME = "manifest.json"
+_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def open_segment(path: str, encoding: str = "utf-8", newline=None):
+    """以文本方式打开日志分段，按扩展名自动解压（.gz / .zst）。"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding=encoding, newline=newline)
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"读取 {path} 需要安装 zstandard")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True),
+                                encoding=encoding, newline=newline)
+    return open(path, "r", encoding=encoding, newline=newline)
+
+
+def _format_time(value: datetime) -> str:
+    return value.strftime(_TIME_FORMAT)
+
+
+def _parse_time(text: str) -> datetime:
+    return datetime.strptime(text, _TIME_FORMAT)
+
+
+class SegmentedLog:
+    """
+    追加式日志文件的分段轮转。
+
+    活动文件（path）照常追加；超过 max_bytes 或跨天时，活动文件被改名移入分段目录
+    （<文件名>_segments/）、压缩，并在 manifest.json 中记录该分段的时间范围、行数和出现过的用户。
+    分析时用 segment_paths(since, until) 只取与时间窗口重叠的分段，活动文件总是包含在内。
+
+    参数：
+        path: 活动日志文件路径
+        read_rows: 函数 read_rows(file_obj)，逐行产出 (timestamp: datetime, user)，解析失败的行跳过
+        max_bytes: 活动文件的大小上限，None 表示不按大小轮转
+        rotate_daily: 活动文件中第一条记录不是今天时轮转
+        compression: "gzip"、"zstd"（需要 zstandard）或 None（不压缩）
+        encoding: 日志文件编码
+    """
+
+    def __init__(self, path: str, read_rows, max_bytes: int = 10 * 1024 * 1024, rotate_daily: bool = True,
+                 compression: str = "gzip", encoding: str = "utf-8"):
+        if compression == "zstd" and zstandard is None:
+            print("警告：未安装 zstandard，日志分段改用 gzip 压缩。")
+            compression = "gzip"
+        self.path = path
+        self.read_rows = read_rows
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compression = compression
+        self.encoding = encoding
+        stem = os.path.basename(path)
+        self.segment_dir = os.path.join(os.path.dirname(path) or ".", f"{stem}_segments")
+        self.manifest_path = os.path.join(self.segment_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._manifest_lock = threading.Lock()
+        self._active_start = None # (inode, 第一条记录的时间)，避免每次检查都读文件
+
+    # --- 轮转 ---
+
+    def _first_timestamp(self, st):
+        if self._active_start is not None and self._active_start[0] == st.st_ino:
+            return self._active_start[1]
+        try:
+            with open_segment(self.path, self.encoding, newline="") as f:
+                first = next(iter(self.read_rows(f)), None)
+        except OSError:
+            return None
+        if first is None:
+            return None # 还没有记录，下次再读
+        self._active_start = (st.st_ino, first[0])
+        return first[0]
+
+    def should_rotate(self, now: datetime = None) -> bool:
+        """活动文件是否已超过大小上限或跨天。"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        if st.st_size == 0:
+            return False
+        if self.max_bytes is not None and st.st_size >= self.max_bytes:
+            return True
+        if self.rotate_daily:
+            start = self._first_timestamp(st)
+            if start is not None and start.date() != (now or datetime.now()).date():
+                return True
+        return False
+
+    def maybe_rotate(self, now: datetime = None, background: bool = False) -> bool:
+        """
+        需要时轮转，返回是否轮转。调用方应先关闭自己持有的活动文件句柄。
+        background=True 时只在当前线程改名，统计和压缩交给后台线程，适合在界面线程中调用。
+        """
+        with self._lock:
+            if not self.should_rotate(now):
+                return False
+            sealed = self._detach()
+        self._finish(sealed, background)
+        return True
+
+    def rotate(self, background: bool = False):
+        """立即把活动文件封存为一个分段（文件为空时什么都不做）。"""
+        with self._lock:
+            sealed = self._detach()
+        self._finish(sealed, background)
+
+    def _detach(self):
+        """把活动文件改名移入分段目录，返回新路径；之后的写入会创建新的活动文件。"""
+        try:
+            if os.path.getsize(self.path) == 0:
+                return None
+        except OSError:
+            return None
+        os.makedirs(self.segment_dir, exist_ok=True)
+        name = f"{os.path.basename(self.path)}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        sealed = os.path.join(self.segment_dir, name)
+        os.replace(self.path, sealed)
+        self._active_start = None
+        return sealed
+
+    def _finish(self, sealed, background):
+        if sealed is None:
+            return
+        if background:
+            threading.Thread(target=self._seal_quietly, args=(sealed,), name="log-segment-sealer",
+                             daemon=True).start()
+        else:
+            self._seal(sealed)
+
+    def _seal_quietly(self, sealed: str):
+        try:
+            self._seal(sealed)
+        except Exception as e:
+            # 未压缩的分段留在目录中，下次启动时由 recover() 补登记
+            print(f"警告：封存日志分段 {sealed} 失败: {e}")
+
+    def _seal(self, sealed: str):
+        """统计、压缩一个已移入分段目录的未压缩文件，并登记到 manifest。"""
+        entry = {"file": os.path.basename(sealed), "start": None, "end": None, "rows": 0, "users": []}
+        users = set()
+        start = end = None
+        with open_segment(sealed, self.encoding, newline="") as f:
+            for timestamp, user in self.read_rows(f):
+                entry["rows"] += 1
+                start = timestamp if start is None or timestamp < start else start
+                end = timestamp if end is None or timestamp > end else end
+                if user:
+                    users.add(user)
+        entry["start"] = _format_time(start) if start else None
+        entry["end"] = _format_time(end) if end else None
+        entry["users"] = sorted(users)
+        compressed = None
+        if self.compression in _EXTENSIONS:
+            compressed = sealed + _EXTENSIONS[self.compression]
+            self._compress(sealed, compressed)
+            entry["file"] = os.path.basename(compressed)
+        entry["bytes"] = os.path.getsize(os.path.join(self.segment_dir, entry["file"]))
+        with self._manifest_lock:
+            manifest = self.load_manifest()
+            manifest["segments"] = [s for s in manifest["segments"] if s["file"] != entry["file"]] + [entry]
+            self._write_manifest(manifest)
+        # 登记之后才删除未压缩文件，中途退出时 recover() 会重新处理
+        if compressed is not None:
+            os.remove(sealed)
+
+    def _compress(self, source: str, target: str):
+        temp = target + ".tmp"
+        with open(source, "rb") as src:
+            if self.compression == "zstd":
+                with open(temp, "wb") as dst:
+                    zstandard.ZstdCompressor().copy_stream(src, dst)
+            else:
+                with gzip.open(temp, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+        os.replace(temp, target)
+
+    def recover(self):
+        """补登记上次轮转中途退出而留下的未压缩分段（启动时调用一次）。"""
+        if not os.path.isdir(self.segment_dir):
+            return
+        with self._lock:
+            registered = {s["file"] for s in self.load_manifest()["segments"]}
+            pattern = re.compile(re.escape(os.path.basename(self.path)) + r"\.\d{8}-\d{6}-\d{6}$")
+            for name in sorted(os.listdir(self.segment_dir)):
+                if pattern.match(name) and name not in registered:
+                    try:
+                        self._seal(os.path.join(self.segment_dir, name))
+                    except Exception as e:
+                        print(f"警告：登记日志分段 {name} 失败: {e}")
+
+    # --- manifest ---
+
+    def load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        manifest.setdefault("segments", [])
+        return manifest
+
+    def _write_manifest(self, manifest: dict):
+        fd, temp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=self.segment_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.manifest_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    # --- 读取 ---
+
+    def segments(self, since: datetime = None, until: datetime = None, user=None) -> list:
+        """manifest 中与 [since, until] 重叠（且包含 user，若给出）的分段条目，按时间排序。"""
+        selected = []
+        for segment in self.load_manifest()["segments"]:
+            if segment["start"] is None:
+                continue
+            if since is not None and _parse_time(segment["end"]) < since:
+                continue
+            if until is not None and _parse_time(segment["start"]) > until:
+                continue
+            if user is not None and user not in segment["users"]:
+                continue
+            selected.append(segment)
+        return sorted(selected, key=lambda s: s["start"])
+
+    def segment_paths(self, since: datetime = None, until: datetime = None, user=None, covered=()) -> list:
+        """
+        需要读取的文件：重叠的已封存分段（按时间顺序），最后是活动文件（存在时）。
+        covered 为 [(start, end)] 时间区间，完全落在其中某个区间内的分段跳过（这些记录已有其他来源）。
+        """
+        paths = []
+        for segment in self.segments(since, until, user):
+            start, end = _parse_time(segment["start"]), _parse_time(segment["end"])
+            if any(low <= start and end <= high for low, high in covered):
+                continue
+            paths.append(os.path.join(self.segment_dir, segment["file"]))
+        if os.path.exists(self.path):
+            paths.append(self.path)
+        return paths
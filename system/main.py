@@ -5,6 +5,7 @@ import os
 import random
 import time
 import shutil # 引入 shutil 模块用于文件操作
+from datetime import datetime, timedelta
 
 # 确保可以正确导入同级目录或父级目录的模块
 # 如果直接运行 main.py 遇到 ImportError, 可能需要调整 Python 路径或使用 -m 运行
@@ -191,6 +192,11 @@ def is_action_permitted(action_tag: str, user_id: str = None) -> bool:
     target_user_id = user_id if user_id else _current_active_user_id
     return user_manager.check_permission(target_user_id, action_tag)
 
+def are_actions_permitted(action_tags: list, user_id: str = None) -> list:
+    """批量检查指定用户 (默认为当前活动用户) 对一组动作的权限，返回与 action_tags 对应的布尔值列表。"""
+    target_user_id = user_id if user_id else _current_active_user_id
+    return user_manager.check_permissions(target_user_id, action_tags)
+
 # --- Core: Event Handling and Feedback Interface ---
 def process_event_and_trigger_feedback(
     event_type: str,
@@ -288,7 +294,11 @@ def run_log_analysis_and_update_personalization():
     # interaction_analyzer needs the user_manager instance to update user configurations
     # Ensure user profiles are loaded before analysis attempts to update them
     # user_manager._load_all_profiles() # Analysis module should handle loading profiles or take profiles as input
-    interaction_analyzer.run_analysis(user_manager)
+    interaction_logger.flush_log() # 日志由后台线程批量写入，分析前先确保已全部落盘
+    since = None
+    if config.ANALYSIS_WINDOW_DAYS is not None:
+        since = datetime.now() - timedelta(days=config.ANALYSIS_WINDOW_DAYS)
+    interaction_analyzer.run_analysis(user_manager, since=since)
     print(f"分析报告已生成至: {config.ANALYSIS_REPORT_PATH}")
 
 
@@ -970,6 +980,11 @@ if __name__ == '__main__':
         except Exception as e:
             print(f"警告：清理语音引擎资源时出错 - {e}")
         
+        # 把尚未写盘的用户配置更改和交互日志写入文件
+        user_manager.flush_profiles()
+        interaction_logger.shutdown_logger()
+        print(f"交互日志写入统计: {interaction_logger.get_logger_stats()}")
+
         # 等待所有语音线程结束
         time.sleep(0.5)  # 给予语音线程足够的时间结束
 
@@ -1048,6 +1063,12 @@ if __name__ == "__main__":
             if os.path.exists(config.INTERACTION_LOG_PATH):
                 print(f"删除交互日志文件: {config.INTERACTION_LOG_PATH}")
                 os.remove(config.INTERACTION_LOG_PATH)
+            if os.path.isdir(interaction_logger.log_segment_dir()):
+                print(f"删除交互日志分段: {interaction_logger.log_segment_dir()}")
+                shutil.rmtree(interaction_logger.log_segment_dir())
+            if os.path.isdir(config.LOG_COLUMNAR_DIR):
+                print(f"删除列式交互日志: {config.LOG_COLUMNAR_DIR}")
+                shutil.rmtree(config.LOG_COLUMNAR_DIR)
                 
             # 如果分析报告文件存在，也删除它
             if os.path.exists(config.ANALYSIS_REPORT_PATH):
@@ -0,0 +1,53 @@
+# permissions.py
+
+ALL_PERMISSIONS = "ALL_PERMISSIONS"
+
+
+class PermissionIndex:
+    """
+    角色 → 权限的位集索引。
+
+    启动时把所有出现过的权限标签 (action_tag) 编号为整数位，每个角色编译成一个整数位集，
+    权限检查只是一次字典查找加一次位与运算。拥有 ALL_PERMISSIONS 的角色位集为 -1（所有位都置 1），
+    包括没有任何角色声明过的标签。
+    """
+
+    def __init__(self, roles_permissions: dict):
+        self._bits = {}
+        for permissions in roles_permissions.values():
+            for tag in permissions:
+                if tag != ALL_PERMISSIONS and tag not in self._bits:
+                    self._bits[tag] = 1 << len(self._bits)
+        self._role_masks = {role: self.mask_for(permissions) for role, permissions in roles_permissions.items()}
+
+    def tag_bit(self, action_tag: str) -> int:
+        """标签对应的位，未在任何角色中出现的标签为 0。"""
+        return self._bits.get(action_tag, 0)
+
+    def mask_for(self, action_tags) -> int:
+        """一组标签的位集。"""
+        if ALL_PERMISSIONS in action_tags:
+            return -1
+        mask = 0
+        for tag in action_tags:
+            mask |= self.tag_bit(tag)
+        return mask
+
+    def role_mask(self, role: str) -> int:
+        """角色的位集，未定义的角色没有任何权限。"""
+        return self._role_masks.get(role, 0)
+
+    @staticmethod
+    def allows(mask: int, action_tag_bit: int) -> bool:
+        return mask == -1 or bool(mask & action_tag_bit)
+
+    def check(self, mask: int, action_tag: str) -> bool:
+        """位集 mask 是否允许 action_tag。"""
+        return self.allows(mask, self.tag_bit(action_tag))
+
+    def check_many(self, mask: int, action_tags) -> list:
+        """批量检查，返回与 action_tags 一一对应的布尔值列表。"""
+        if mask == -1:
+            return [True] * len(action_tags)
+        bits = self._bits
+        return [bool(mask & bits.get(tag, 0)) for tag in action_tags]
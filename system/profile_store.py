@@ -0,0 +1,184 @@
+# profile_store.py
+
+import atexit
+import copy
+import json
+import os
+import tempfile
+import threading
+
+
+def atomic_write_json(path: str, data):
+    """先写同目录下的临时文件再原子替换，写到一半崩溃也不会留下损坏的 JSON。"""
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=4))
+
+
+def atomic_write_text(path: str, text: str):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _file_signature(path: str):
+    """文件的 (mtime_ns, size)，文件不存在时为 None。"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ProfileStore:
+    """
+    常驻内存的用户配置存储。
+
+    - 读取直接返回内存中的数据，只 stat 一次文件：mtime 或大小变化（被其他进程修改、删除）时才重新解析 JSON。
+    - 写入只更新内存并标记为脏，由后台线程在 flush_delay 秒后合并写盘（临时文件 + 原子替换）；
+      持锁期间只做序列化，写文件不阻塞读取。
+    - flush() 立即写盘；close() 在退出时写盘并结束后台线程，构造时已注册到 atexit。
+
+    get_all() / get() 返回深拷贝，调用方修改返回值不会影响缓存；save() 之后存储接管传入的字典，
+    调用方不应再修改它。"读取-修改-保存" 应持有 lock，避免并发修改互相覆盖。
+    """
+
+    def __init__(self, path: str, loader=None, flush_delay: float = 0.5):
+        """
+        参数：
+            path: JSON 文件路径
+            loader: 无参函数，从磁盘读取并返回全部配置（可在其中补全默认数据），默认直接解析 JSON
+            flush_delay: 写入后等待合并的时间（秒）
+        """
+        self.path = path
+        self.loader = loader or self._read_json
+        self.flush_delay = flush_delay
+        self.lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._data = None
+        self._signature = None
+        self._dirty = False
+        self._writing = False
+        self._version = 0
+        self.generation = 0 # 每次从磁盘加载加 1，依赖配置内容的缓存据此失效
+        self._closed = False
+        self._wakeup = threading.Condition(self.lock)
+        self._flusher = None
+        atexit.register(self.close)
+
+    def _read_json(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _ensure_loaded(self):
+        """首次访问或文件被外部修改时（重新）加载，调用方持有 lock。"""
+        signature = _file_signature(self.path)
+        # 自己正在写盘时文件签名会变化，不算外部修改
+        if self._data is None or (signature != self._signature and not self._writing):
+            if self._dirty and self._data is not None:
+                print(f"警告：{self.path} 已被外部修改，丢弃尚未写盘的配置更改。")
+            self._load()
+
+    def refresh(self) -> int:
+        """只检查文件是否被外部修改（必要时重新加载），返回当前的 generation。"""
+        with self.lock:
+            self._ensure_loaded()
+            return self.generation
+
+    def get_all(self) -> dict:
+        """返回全部配置的副本，文件被外部修改时先重新加载。"""
+        with self.lock:
+            self._ensure_loaded()
+            return copy.deepcopy(self._data)
+
+    def get(self, key, default=None):
+        """返回单个条目的副本，不存在时返回 default。"""
+        with self.lock:
+            self._ensure_loaded()
+            if key not in self._data:
+                return default
+            return copy.deepcopy(self._data[key])
+
+    def _load(self):
+        self._data = self.loader()
+        self.generation += 1
+        self._dirty = False
+        self._signature = _file_signature(self.path)
+
+    def reload(self):
+        """丢弃内存中的数据，下次读取时从磁盘重新加载。"""
+        with self.lock:
+            self._data = None
+            self._dirty = False
+
+    def save(self, data: dict = None):
+        """替换（或确认已原地修改）内存中的配置，稍后由后台线程写盘。"""
+        with self.lock:
+            if data is not None:
+                self._data = data
+            self._dirty = True
+            self._version += 1
+            if self._flusher is None and not self._closed:
+                self._flusher = threading.Thread(target=self._run_flusher, name="profile-store-flusher",
+                                                 daemon=True)
+                self._flusher.start()
+            self._wakeup.notify()
+        if self._closed:
+            self.flush()
+
+    def _run_flusher(self):
+        while True:
+            with self.lock:
+                while not self._dirty and not self._closed:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                # 等待一小段时间，合并突发的多次写入
+                version = self._version
+                self._wakeup.wait(self.flush_delay)
+                if self._version != version:
+                    continue
+            self.flush()
+
+    def flush(self):
+        """立即把未写盘的更改写入磁盘。"""
+        with self._write_lock:
+            with self.lock:
+                if not self._dirty or self._data is None:
+                    return
+                text = json.dumps(self._data, ensure_ascii=False, indent=4)
+                version = self._version
+                self._writing = True
+            written = False
+            try:
+                atomic_write_text(self.path, text)
+                written = True
+            except OSError as e:
+                print(f"保存用户配置失败: {e}")
+            finally:
+                with self.lock:
+                    self._writing = False
+                    if written:
+                        self._signature = _file_signature(self.path)
+                        # 写盘期间又有新的更改时保持为脏，等下一次写盘
+                        self._dirty = self._version != version
+
+    def close(self):
+        """写入未保存的更改并结束后台线程。"""
+        with self.lock:
+            self._closed = True
+            self._wakeup.notify_all()
+            flusher, self._flusher = self._flusher, None
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+        self.flush()
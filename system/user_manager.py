@@ -1,8 +1,12 @@
 # user_manager.py
 
+import copy
+import functools
 import json
 import os
 from .config import USER_PROFILES_PATH, DEFAULT_USER_ID, DEFAULT_ROLE
+from .profile_store import ProfileStore, atomic_write_json
+from .permissions import PermissionIndex
 from .config import EVENT_USER_DISTRACTED, EVENT_COMMAND_SUCCESS, EVENT_COMMAND_FAILURE, EVENT_PERMISSION_DENIED, EVENT_GENERIC_INFO # 导入事件类型
 
 # 角色及其权限定义 (可以考虑将其移至单独的 permissions_config.json 文件)
@@ -33,14 +37,20 @@ ROLES_PERMISSIONS = {
     ]
 }
 
+# 角色权限在启动时编译为位集，权限检查是一次位运算
+_permission_index = PermissionIndex(ROLES_PERMISSIONS)
+# 用户ID -> 角色位集的缓存，角色变化或配置文件重新加载时失效
+_user_permission_masks = {}
+_user_permission_generation = None
+
 def _ensure_data_dir_exists():
     """确保 data 目录存在"""
     data_dir = os.path.dirname(USER_PROFILES_PATH)
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
 
-def _load_all_profiles() -> dict:
-    """辅助函数：从JSON文件加载所有用户配置。"""
+def _read_profiles_file() -> dict:
+    """辅助函数：从JSON文件读取所有用户配置（只在文件变化时由 ProfileStore 调用）。"""
     _ensure_data_dir_exists()
     if not os.path.exists(USER_PROFILES_PATH) or os.stat(USER_PROFILES_PATH).st_size == 0:
         # 如果文件不存在或为空, 创建一个包含默认访客的配置
@@ -78,7 +88,7 @@ def _load_all_profiles() -> dict:
                 }
             }
         }
-        _save_all_profiles(default_profiles)
+        atomic_write_json(USER_PROFILES_PATH, default_profiles)
         print(f"创建默认用户配置文件: {USER_PROFILES_PATH}")
         return default_profiles
     try:
@@ -118,7 +128,7 @@ def _load_all_profiles() -> dict:
                         "visual_animation_enabled": True # 是否启用动画效果
                     }
                 }
-                 _save_all_profiles(profiles) # 添加默认用户后保存
+                 atomic_write_json(USER_PROFILES_PATH, profiles) # 添加默认用户后保存
             return profiles
     except (json.JSONDecodeError, FileNotFoundError) as e:
         print(f"加载用户配置文件失败 ({e})，将返回一个包含默认访客的配置。")
@@ -126,27 +136,59 @@ def _load_all_profiles() -> dict:
         return {DEFAULT_USER_ID: {"name": "访客", "role": DEFAULT_ROLE, "common_commands": {}, "interaction_habits": {}, "feedback_preferences": {}}}
 
 
+# 用户配置常驻内存：文件 mtime 变化时才重新解析，写入由后台线程合并后原子写盘，退出时自动写盘
+_profile_store = ProfileStore(USER_PROFILES_PATH, loader=_read_profiles_file)
+
+
+def _load_all_profiles() -> dict:
+    """辅助函数：返回所有用户配置的副本（文件被外部修改时自动重新加载）。"""
+    return _profile_store.get_all()
+
+
 def _save_all_profiles(profiles: dict):
-    """辅助函数：将所有用户配置保存到JSON文件。"""
-    _ensure_data_dir_exists()
-    with open(USER_PROFILES_PATH, 'w', encoding='utf-8') as f:
-        json.dump(profiles, f, ensure_ascii=False, indent=4)
+    """辅助函数：更新所有用户配置，稍后由后台线程写入JSON文件。"""
+    _profile_store.save(profiles)
     # print(f"用户数据已保存到: {USER_PROFILES_PATH}") # 通常生产环境不会打印每次保存
 
+
+def _with_profile_lock(func):
+    """修改配置的函数持有存储锁，避免后台写盘时字典正在变化。"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _profile_store.lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def reload_profiles():
+    """丢弃内存中的配置，下次访问时从文件重新加载。"""
+    _profile_store.reload()
+
+
+def flush_profiles():
+    """立即把尚未写盘的配置更改写入文件（程序退出时也会自动执行）。"""
+    _profile_store.flush()
+
+
 def load_user_profile(user_id: str) -> dict:
-    """加载指定用户的配置。如果用户不存在，则返回默认访客的配置。"""
-    profiles = _load_all_profiles()
-    # 使用 get，如果user_id不存在，再尝试获取默认访客。确保始终返回一个字典。
-    return profiles.get(user_id, profiles.get(DEFAULT_USER_ID, {}))
+    """加载指定用户的配置（副本）。如果用户不存在，则返回默认访客的配置。"""
+    profile = _profile_store.get(user_id)
+    if profile is None:
+        # 如果user_id不存在，再尝试获取默认访客。确保始终返回一个字典。
+        profile = _profile_store.get(DEFAULT_USER_ID, {})
+    return profile
 
+@_with_profile_lock
 def save_user_profile(user_id: str, profile_data: dict):
     """保存或更新指定用户的配置。"""
     profiles = _load_all_profiles()
     # 这里简单替换，如果需要合并现有数据，需要更复杂的逻辑
-    profiles[user_id] = profile_data
+    profiles[user_id] = copy.deepcopy(profile_data) # 调用方之后修改 profile_data 不影响已保存的配置
     _save_all_profiles(profiles)
+    _invalidate_permission_cache(user_id)
     print(f"用户 '{user_id}' 的配置已更新。")
 
+@_with_profile_lock
 def add_user(user_id: str, name: str, role: str, initial_preferences: dict = None):
     """添加一个新用户。"""
     if role not in ROLES_PERMISSIONS:
@@ -196,8 +238,10 @@ def add_user(user_id: str, name: str, role: str, initial_preferences: dict = Non
 
     profiles[user_id] = default_profile_data
     _save_all_profiles(profiles)
+    _invalidate_permission_cache(user_id)
     print(f"用户 '{user_id}' ({name}) 已添加，角色为 '{role}'。")
 
+@_with_profile_lock
 def delete_user(user_id: str):
     """删除一个用户。"""
     profiles = _load_all_profiles()
@@ -207,10 +251,12 @@ def delete_user(user_id: str):
     if user_id in profiles:
         del profiles[user_id]
         _save_all_profiles(profiles)
+        _invalidate_permission_cache(user_id)
         print(f"用户 '{user_id}' 已被删除。")
     else:
         print(f"警告：用户 '{user_id}' 未找到，无法删除。")
 
+@_with_profile_lock
 def change_user_role(user_id: str, new_role: str):
     """修改用户的角色。"""
     if new_role not in ROLES_PERMISSIONS:
@@ -221,6 +267,7 @@ def change_user_role(user_id: str, new_role: str):
 
     profiles[user_id]["role"] = new_role
     _save_all_profiles(profiles)
+    _invalidate_permission_cache(user_id)
     print(f"用户 '{user_id}' 的角色已更改为 '{new_role}'。")
 
 def get_user_role(user_id: str) -> str:
@@ -228,13 +275,34 @@ def get_user_role(user_id: str) -> str:
     profile = load_user_profile(user_id)
     return profile.get("role", DEFAULT_ROLE) # 如果role字段缺失，返回默认角色
 
+def _invalidate_permission_cache(user_id: str = None):
+    """清除某个用户（None 表示所有用户）缓存的角色位集。"""
+    if user_id is None:
+        _user_permission_masks.clear()
+    else:
+        _user_permission_masks.pop(user_id, None)
+
+def _user_permission_mask(user_id: str) -> int:
+    """用户角色的权限位集，按用户缓存。"""
+    global _user_permission_generation
+    generation = _profile_store.refresh() # 配置文件被外部修改时会重新加载，缓存随之失效
+    if _user_permission_generation != generation:
+        _invalidate_permission_cache()
+        _user_permission_generation = generation
+    mask = _user_permission_masks.get(user_id)
+    if mask is None:
+        # 与修改角色的函数互斥，避免把旧角色的位集写回缓存
+        with _profile_store.lock:
+            mask = _user_permission_masks[user_id] = _permission_index.role_mask(get_user_role(user_id))
+    return mask
+
 def check_permission(user_id: str, action_tag: str) -> bool:
     """检查用户是否有权限执行某个动作 (action_tag)。"""
-    role = get_user_role(user_id)
-    permissions = ROLES_PERMISSIONS.get(role, [])
-    if "ALL_PERMISSIONS" in permissions:
-        return True
-    return action_tag in permissions
+    return _permission_index.check(_user_permission_mask(user_id), action_tag)
+
+def check_permissions(user_id: str, action_tags: list) -> list:
+    """批量检查用户对一组动作的权限，返回与 action_tags 一一对应的布尔值列表。"""
+    return _permission_index.check_many(_user_permission_mask(user_id), action_tags)
 
 def get_feedback_preferences(user_id: str, event_type: str) -> dict:
     """获取用户针对特定事件类型的反馈偏好。"""
@@ -259,6 +327,7 @@ def get_feedback_preferences(user_id: str, event_type: str) -> dict:
     return final_prefs
 
 # --- 新增方法：更新用户个性化数据（从分析结果而来）---
+@_with_profile_lock
 def update_user_personalization_from_analysis(user_id: str, analysis_data: dict):
     """
     根据日志分析结果更新用户的个性化数据（常用指令、交互习惯等）。
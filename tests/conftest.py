@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# system 的各模块在导入时就会读写 data 目录，先把路径指向临时目录，测试不触碰仓库中的数据
+from system import config
+
+_DATA_DIR = tempfile.mkdtemp(prefix="system-tests-")
+config.DATA_DIR = _DATA_DIR
+config.USER_PROFILES_PATH = os.path.join(_DATA_DIR, "user_profiles.json")
+config.INTERACTION_LOG_PATH = os.path.join(_DATA_DIR, "interaction_log.csv")
+config.LOG_COLUMNAR_DIR = os.path.join(_DATA_DIR, "interaction_log_parquet")
+config.ANALYSIS_REPORT_PATH = os.path.join(_DATA_DIR, "reports", "analysis_report.txt")
@@ -0,0 +1,128 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+if BACKEND not in sys.path:
+    sys.path.append(BACKEND)
+import batch_analyze
+
+
+class _FakeFaceContext:
+    def __init__(self):
+        self.face_located = False
+
+    def refresh(self, frame):
+        self.face_located = frame.mean() > 100
+
+    def reset(self):
+        self.face_located = False
+
+
+class _FakeGaze:
+    """模拟瞳孔校准：看到若干张人脸之后才给出视线结果"""
+
+    def __init__(self):
+        self.seen = 0
+
+    def refresh(self, frame, face_context):
+        self.seen += int(face_context.face_located)
+
+    def reset(self):
+        self.seen = 0
+
+    def look_down(self):
+        return False
+
+    def look_right(self):
+        return self.seen >= 4 and self.seen % 2 == 0
+
+    def look_left(self):
+        return False
+
+    def look_center(self):
+        return self.seen >= 4
+
+
+class _FakeHead:
+    """模拟点头计数：结果取决于之前所有帧"""
+
+    def __init__(self):
+        self.movements = 0
+
+    def get_status(self, frame, face_context, now):
+        self.movements += int(face_context.face_located)
+        return "点头" if self.movements % 5 == 0 else "静止"
+
+    def reset(self):
+        self.movements = 0
+
+
+class _FakeGesture:
+    """模拟手势投票缓冲区"""
+
+    def __init__(self):
+        self.buffer = []
+
+    def process(self, frame):
+        self.buffer = (self.buffer + [frame.mean() > 100])[-3:]
+        return SimpleNamespace(gesture="握拳" if sum(self.buffer) >= 2 else "无")
+
+    def reset(self):
+        self.buffer = []
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10.0, (32, 24))
+    if not writer.isOpened():
+        pytest.skip("OpenCV 不支持写 MJPG 视频")
+    for i in range(45):
+        # 亮、暗交替的片段：亮帧视为检测到人脸
+        value = 220 if (i // 3) % 3 else 20
+        writer.write(np.full((24, 32, 3), value, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def fake_worker(monkeypatch):
+    monkeypatch.setattr(batch_analyze, "_worker", {
+        "face_context": _FakeFaceContext(),
+        "gaze": _FakeGaze(),
+        "headpose": _FakeHead(),
+        "gesture": _FakeGesture(),
+    })
+
+
+def _analyze(path, chunk_size, parts=2, warmup=6):
+    # 单线程执行器：各段依次在同一组模型上分析，相当于一个工作进程
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return batch_analyze.analyze_video(executor, path, chunk_size, parts, warmup)
+
+
+def test_split_frames_covers_video():
+    assert batch_analyze.split_frames(10, 3) == [(0, 3), (3, 6), (6, None)]
+    assert batch_analyze.split_frames(0, 4) == [(0, None)]
+    assert batch_analyze.split_frames(2, 4) == [(0, None)]
+
+
+def test_results_do_not_depend_on_chunk_size(video, fake_worker):
+    small = _analyze(video, chunk_size=4)
+    large = _analyze(video, chunk_size=7)
+    assert list(small["frame_index"]) == list(range(45))
+    for name in ("face_found", "gaze", "head", "gesture"):
+        assert list(small[name]) == list(large[name]), name
+
+
+def test_warmup_discards_frames_before_part(video, fake_worker):
+    columns = _analyze(video, chunk_size=5, parts=3, warmup=4)
+    assert list(columns["frame_index"]) == list(range(45))
+    assert np.allclose(columns["timestamp"], np.arange(45) / 10.0)
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from system import interaction_analyzer
+from system.columnar_log import ParquetLogSink, part_intervals, part_paths
+from system.config import LOG_COLUMNS
+from system.interaction_logger import InteractionLogWriter, read_log_rows
+from system.log_rotation import SegmentedLog
+
+BASE = datetime(2026, 3, 1, 8, 0, 0)
+INTENTS = ["PLAY_MUSIC", "CONFIRM_ACTION", "", "START_NAVIGATION"]
+MODALITIES = ["voice", "gesture", "voice;gesture", ""]
+
+
+def _row(i, day):
+    timestamp = BASE + timedelta(days=day, minutes=i)
+    data = {
+        "timestamp": timestamp.isoformat(sep=" ", timespec="milliseconds"),
+        "user_id": f"user{i % 3}",
+        "user_role": "driver",
+        "event_type": "VOICE_COMMAND",
+        "recognized_intent": INTENTS[i % 4],
+        "input_modalities": MODALITIES[(i + day) % 4],
+        "event_data": str({"i": i}),
+    }
+    return [data.get(column, "") for column in LOG_COLUMNS]
+
+
+@pytest.fixture
+def logs(tmp_path, monkeypatch):
+    """按天轮转的 CSV 日志 + Parquet 目录，分析器指向它们"""
+    csv_path = str(tmp_path / "interaction_log.csv")
+    parquet_dir = str(tmp_path / "parquet")
+    segments = SegmentedLog(csv_path, read_log_rows, encoding="utf-8-sig")
+    writer = InteractionLogWriter(csv_path, LOG_COLUMNS, flush_interval=60, batch_size=10000, segments=segments)
+    monkeypatch.setattr(interaction_analyzer, "columnar_log_enabled", lambda: True)
+    monkeypatch.setattr(interaction_analyzer.config, "LOG_COLUMNAR_DIR", parquet_dir)
+    monkeypatch.setattr(interaction_analyzer, "log_segment_paths",
+                        lambda since=None, until=None, user_id=None, covered=(): segments.segment_paths(
+                            since, until, user_id, covered))
+
+    def write(days, sink):
+        writer.columnar = sink
+        for day in days:
+            for i in range(40):
+                writer.submit(_row(i, day))
+            assert writer.flush(timeout=5) # 每天一批，轮转时 CSV 按天封存
+
+    yield write, parquet_dir
+    writer.columnar = None
+    writer.close()
+
+
+def _records(df):
+    return list(zip(df["timestamp"].astype("datetime64[ms]"), df["user_id"].astype(str),
+                    df["recognized_intent"].astype(str), df["input_modalities"].astype(str)))
+
+
+def test_merges_csv_history_and_unfinished_parts(logs):
+    write, parquet_dir = logs
+    write([0, 1], None) # 启用列式日志之前：只有 CSV
+
+    sink = ParquetLogSink(parquet_dir, LOG_COLUMNS)
+    write([2, 3], sink)
+    sink.close() # 正常退出，跨天加上关闭共两个分片
+
+    crashed = ParquetLogSink(parquet_dir, LOG_COLUMNS)
+    write([4], crashed) # 异常退出：分片没有写完，记录只在 CSV 中
+    crashed._writer = None
+
+    sink = ParquetLogSink(parquet_dir, LOG_COLUMNS)
+    write([5], sink)
+    sink.close()
+    current = ParquetLogSink(parquet_dir, LOG_COLUMNS)
+    write([6], current) # 当前运行中的分片尚未完成
+
+    assert len(part_paths(parquet_dir)) == 3
+    analyzer = interaction_analyzer.InteractionAnalyzer()
+    merged = analyzer._load_logs()
+    csv_only = analyzer._load_csv_logs()
+    assert len(merged) == 7 * 40
+    assert _records(merged) == _records(csv_only.fillna({"recognized_intent": "N/A", "input_modalities": "N/A"}))
+
+    since, until = BASE + timedelta(days=1, minutes=20), BASE + timedelta(days=5, minutes=10)
+    window = analyzer._load_logs(since, until)
+    expected = [r for r in _records(merged) if since <= r[0] <= until]
+    assert _records(window) == expected
+
+
+def test_part_stays_open_across_flushes(logs):
+    write, parquet_dir = logs
+    sink = ParquetLogSink(parquet_dir, LOG_COLUMNS, row_group_size=16)
+    for _ in range(3):
+        write([0], sink) # 每次 flush_log 都不会生成新的分片
+    assert part_paths(parquet_dir) == []
+    sink.close()
+    [(path, start, end)] = part_intervals(parquet_dir)
+    assert start == BASE and end == BASE + timedelta(minutes=39)
+    sink.write_rows([_row(0, 1)]) # 关闭之后的记录只写 CSV
+    assert len(part_paths(parquet_dir)) == 1
@@ -0,0 +1,62 @@
+import csv
+import os
+
+from system.interaction_logger import InteractionLogWriter
+
+COLUMNS = ["timestamp", "user_id", "event_type"]
+
+
+def _read(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.reader(f))
+
+
+def _writer(tmp_path, **kwargs):
+    path = str(tmp_path / "log.csv")
+    return path, InteractionLogWriter(path, COLUMNS, flush_interval=60, batch_size=1000, **kwargs)
+
+
+def test_flush_writes_pending_rows_with_single_header(tmp_path):
+    path, writer = _writer(tmp_path)
+    for i in range(250):
+        assert writer.submit([f"2026-01-01 00:00:{i % 60:02d}.000", "u1", "E"])
+    # flush_interval 很长，只有 flush() 会让这些行写盘
+    assert writer.flush(timeout=5)
+    rows = _read(path)
+    assert rows[0] == COLUMNS
+    assert len(rows) == 251
+    writer.submit(["2026-01-01 00:01:00.000", "u2", "E"])
+    assert writer.flush(timeout=5)
+    rows = _read(path)
+    assert len(rows) == 252 and rows.count(COLUMNS) == 1
+    writer.close()
+    assert writer.stats()["written"] == 251
+
+
+def test_reopens_file_deleted_while_open(tmp_path):
+    path, writer = _writer(tmp_path)
+    writer.submit(["2026-01-01 00:00:00.000", "u1", "E"])
+    assert writer.flush(timeout=5)
+    os.remove(path)
+    writer.submit(["2026-01-01 00:00:01.000", "u1", "E"])
+    assert writer.flush(timeout=5)
+    assert _read(path) == [COLUMNS, ["2026-01-01 00:00:01.000", "u1", "E"]]
+    writer.close()
+
+
+def test_rows_after_close_are_written_synchronously(tmp_path):
+    path, writer = _writer(tmp_path)
+    writer.submit(["2026-01-01 00:00:00.000", "u1", "E"])
+    writer.close()
+    writer.submit(["2026-01-01 00:00:01.000", "u1", "E"])
+    assert len(_read(path)) == 3
+    assert writer.flush(timeout=1)
+
+
+def test_full_queue_drops_and_counts(tmp_path):
+    path, writer = _writer(tmp_path, max_queue=1, put_timeout=0.01)
+    writer._start = lambda: None # 不启动后台线程，让队列保持满
+    assert writer.submit(["t", "u", "E"])
+    assert not writer.submit(["t", "u", "E"])
+    stats = writer.stats()
+    assert stats["dropped"] == 1 and stats["blocked"] == 1
@@ -0,0 +1,67 @@
+import datetime
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("reportlab")
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+if BACKEND not in sys.path:
+    sys.path.append(BACKEND)
+try:
+    import log_analyzer
+except Exception as e: # 导入时注册 Windows 的 simsun.ttc 字体，其他系统上没有该字体
+    pytest.skip(f"log_analyzer 无法导入: {e}", allow_module_level=True)
+
+LOG_LINES = [
+    "orphan line before any timestamp",
+    "[2024-05-01 09:59:59] [driver1] 语音: 打开音乐",
+    "  continuation of the 09:59:59 entry",
+    "[2024-05-01 10:00:00] [driver1] 语音: 打开导航",
+    "Traceback (most recent call last):",
+    "  ZeroDivisionError: division by zero",
+    "[2024-05-01 10:30:00] 手势: 握拳",
+    "[2024-05-01 11:00:01] [driver1] 语音: 关闭音乐",
+    "  continuation of the 11:00:01 entry",
+    "[2099-13-45 99:99:99] not a real timestamp",
+]
+
+
+@pytest.fixture
+def loaded_lines(tmp_path, monkeypatch):
+    path = tmp_path / "log.txt"
+    path.write_text("\n".join(LOG_LINES) + "\n", encoding="utf-8")
+    lines = []
+    monkeypatch.setattr(log_analyzer.LogAnalyzer, "_parse_log_line", lambda self, line: lines.append(line))
+
+    def load(since=None, until=None):
+        lines.clear()
+        log_analyzer.LogAnalyzer(log_file=str(path), since=since, until=until)
+        return list(lines)
+
+    return load
+
+
+def test_window_keeps_continuation_lines_with_their_entry(loaded_lines):
+    lines = loaded_lines(since=datetime.datetime(2024, 5, 1, 10, 0, 0, 500000),
+                         until=datetime.datetime(2024, 5, 1, 11, 0, 0))
+    assert lines == [
+        "[2024-05-01 10:00:00] [driver1] 语音: 打开导航",
+        "Traceback (most recent call last):",
+        "ZeroDivisionError: division by zero",
+        "[2024-05-01 10:30:00] 手势: 握拳",
+    ]
+
+
+def test_unparseable_prefix_follows_previous_entry(loaded_lines):
+    lines = loaded_lines(since=datetime.datetime(2024, 5, 1, 11, 0, 0))
+    assert lines == [
+        "[2024-05-01 11:00:01] [driver1] 语音: 关闭音乐",
+        "continuation of the 11:00:01 entry",
+        "[2099-13-45 99:99:99] not a real timestamp",
+    ]
+
+
+def test_no_window_keeps_every_line(loaded_lines):
+    assert loaded_lines() == [line.strip() for line in LOG_LINES]
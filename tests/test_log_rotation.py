@@ -0,0 +1,99 @@
+import gzip
+import os
+import threading
+from datetime import datetime, timedelta
+
+from system.log_rotation import SegmentedLog, open_segment
+
+
+def _read_rows(f):
+    for line in f:
+        timestamp, user, _ = line.rstrip("\n").split("|", 2)
+        yield datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S"), user
+
+
+def _append(path, timestamp, user, text="x"):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(f"{timestamp:%Y-%m-%d %H:%M:%S}|{user}|{text}\n")
+
+
+def _lines(path):
+    with open_segment(path) as f:
+        return f.read().splitlines()
+
+
+def test_rotates_by_size_and_records_manifest(tmp_path):
+    path = str(tmp_path / "log.txt")
+    log = SegmentedLog(path, _read_rows, max_bytes=200, rotate_daily=False)
+    start = datetime.now()
+    for i in range(30):
+        log.maybe_rotate()
+        _append(path, start + timedelta(minutes=i), f"u{i % 2}")
+    segments = log.segments()
+    assert segments, "超过大小上限应当轮转"
+    assert all(s["file"].endswith(".gz") for s in segments)
+    assert set(segments[0]["users"]) == {"u0", "u1"}
+    total = sum(s["rows"] for s in segments) + len(_lines(path))
+    assert total == 30
+    # 分段内容可以解压读回，顺序与写入一致
+    lines = [line for p in log.segment_paths() for line in _lines(p)]
+    assert len(lines) == 30 and lines == sorted(lines)
+
+
+def test_rotates_on_day_change(tmp_path):
+    path = str(tmp_path / "log.txt")
+    log = SegmentedLog(path, _read_rows, max_bytes=None)
+    yesterday = datetime.now() - timedelta(days=1)
+    _append(path, yesterday, "u1")
+    assert log.maybe_rotate()
+    assert not os.path.exists(path)
+    assert not log.maybe_rotate() # 活动文件不存在时不轮转
+    _append(path, datetime.now(), "u1")
+    assert not log.maybe_rotate()
+    [segment] = log.segments()
+    assert segment["rows"] == 1 and segment["start"].startswith(f"{yesterday:%Y-%m-%d}")
+
+
+def test_segment_paths_selects_overlapping_window(tmp_path):
+    path = str(tmp_path / "log.txt")
+    log = SegmentedLog(path, _read_rows, max_bytes=None, rotate_daily=False)
+    base = datetime(2026, 1, 1)
+    for day in range(5):
+        _append(path, base + timedelta(days=day, hours=1), "u")
+        _append(path, base + timedelta(days=day, hours=2), "u")
+        log.rotate()
+    _append(path, base + timedelta(days=10), "u")
+    since = base + timedelta(days=2, hours=1, minutes=30)
+    until = base + timedelta(days=3, hours=12)
+    paths = log.segment_paths(since, until)
+    assert len(paths) == 3 and paths[-1] == path # 第 2、3 天的分段加上活动文件
+    assert [s["start"][:10] for s in log.segments(since, until)] == ["2026-01-03", "2026-01-04"]
+    assert log.segments(user="nobody") == []
+
+
+def test_recover_registers_interrupted_segments(tmp_path):
+    path = str(tmp_path / "log.txt")
+    log = SegmentedLog(path, _read_rows, max_bytes=None, rotate_daily=False)
+    _append(path, datetime(2026, 1, 1), "u1")
+    log.rotate()
+    # 模拟在压缩前退出：改名后的未压缩文件留在分段目录里，manifest 中没有记录
+    _append(path, datetime(2026, 1, 2), "u2")
+    sealed = log._detach()
+    assert len(log.segments()) == 1
+
+    SegmentedLog(path, _read_rows).recover()
+    segments = log.segments()
+    assert [s["users"] for s in segments] == [["u1"], ["u2"]]
+    assert not os.path.exists(sealed)
+    with gzip.open(sealed + ".gz", "rt", encoding="utf-8") as f:
+        assert f.read().startswith("2026-01-02 00:00:00|u2|")
+
+
+def test_background_rotation_seals_segment(tmp_path):
+    path = str(tmp_path / "log.txt")
+    log = SegmentedLog(path, _read_rows, max_bytes=1, rotate_daily=False)
+    _append(path, datetime(2026, 1, 1), "u1")
+    assert log.maybe_rotate(background=True)
+    for thread in [t for t in threading.enumerate() if t.name == "log-segment-sealer"]:
+        thread.join()
+    assert [s["rows"] for s in log.segments()] == [1]
@@ -0,0 +1,55 @@
+from system.permissions import ALL_PERMISSIONS, PermissionIndex
+from system.user_manager import ROLES_PERMISSIONS
+
+
+def _reference_check(roles_permissions, role, action_tag):
+    """位集化之前的检查逻辑"""
+    permissions = roles_permissions.get(role, [])
+    if ALL_PERMISSIONS in permissions:
+        return True
+    return action_tag in permissions
+
+
+def _all_tags(roles_permissions):
+    tags = {tag for permissions in roles_permissions.values() for tag in permissions}
+    return sorted(tags - {ALL_PERMISSIONS}) + ["UNKNOWN_ACTION", ""]
+
+
+def test_matches_reference_for_configured_roles():
+    index = PermissionIndex(ROLES_PERMISSIONS)
+    tags = _all_tags(ROLES_PERMISSIONS)
+    for role in list(ROLES_PERMISSIONS) + ["undefined_role"]:
+        mask = index.role_mask(role)
+        expected = [_reference_check(ROLES_PERMISSIONS, role, tag) for tag in tags]
+        assert [index.check(mask, tag) for tag in tags] == expected, role
+        assert index.check_many(mask, tags) == expected, role
+
+
+def test_matches_reference_for_many_tags():
+    # 超过 64 个标签时位集仍然正确（Python 整数没有位宽限制）
+    roles = {
+        "admin": [ALL_PERMISSIONS],
+        "even": [f"T{i}" for i in range(0, 100, 2)],
+        "odd": [f"T{i}" for i in range(1, 100, 2)],
+        "none": [],
+    }
+    index = PermissionIndex(roles)
+    tags = _all_tags(roles)
+    for role in roles:
+        assert index.check_many(index.role_mask(role), tags) == \
+            [_reference_check(roles, role, tag) for tag in tags]
+
+
+def test_user_manager_check_permission_follows_role_change():
+    from system import user_manager
+
+    user_manager.add_user("perm_test", "测试", "passenger")
+    try:
+        tags = _all_tags(ROLES_PERMISSIONS)
+        for role in ROLES_PERMISSIONS:
+            user_manager.change_user_role("perm_test", role)
+            expected = [_reference_check(ROLES_PERMISSIONS, role, tag) for tag in tags]
+            assert [user_manager.check_permission("perm_test", tag) for tag in tags] == expected
+            assert user_manager.check_permissions("perm_test", tags) == expected
+    finally:
+        user_manager.delete_user("perm_test")
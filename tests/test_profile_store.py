@@ -0,0 +1,57 @@
+import json
+
+from system.profile_store import ProfileStore
+
+
+def _store(tmp_path, data=None):
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps(data or {"guest": {"role": "passenger", "common_commands": {}}}), encoding="utf-8")
+    return ProfileStore(str(path), flush_delay=0.01)
+
+
+def test_get_all_returns_copy(tmp_path):
+    store = _store(tmp_path)
+    profiles = store.get_all()
+    profiles["guest"]["common_commands"]["X"] = 1
+    assert store.get_all()["guest"]["common_commands"] == {}
+
+
+def test_get_returns_copy_and_default(tmp_path):
+    store = _store(tmp_path)
+    profile = store.get("guest")
+    profile["role"] = "admin"
+    assert store.get("guest")["role"] == "passenger"
+    assert store.get("missing") is None
+    assert store.get("missing", {}) == {}
+
+
+def test_save_is_flushed_and_external_edit_reloaded(tmp_path):
+    store = _store(tmp_path)
+    profiles = store.get_all()
+    profiles["driver"] = {"role": "driver"}
+    store.save(profiles)
+    store.flush()
+    on_disk = json.loads((tmp_path / "profiles.json").read_text(encoding="utf-8"))
+    assert on_disk["driver"] == {"role": "driver"}
+
+    generation = store.refresh()
+    (tmp_path / "profiles.json").write_text(json.dumps({"other": {"role": "admin"}}), encoding="utf-8")
+    assert store.get_all() == {"other": {"role": "admin"}}
+    assert store.generation > generation
+    store.close()
+
+
+def test_load_user_profile_for_unknown_user_does_not_alias_guest():
+    from system import user_manager
+    from system.config import DEFAULT_USER_ID
+
+    guest_before = user_manager.load_user_profile(DEFAULT_USER_ID)
+    profile = user_manager.load_user_profile("ghost")
+    profile["common_commands"] = {"X": 1}
+    assert user_manager.load_user_profile(DEFAULT_USER_ID) == guest_before
+
+    user_manager.save_user_profile("ghost", profile)
+    profile["common_commands"]["Y"] = 2 # 保存后调用方继续修改，不影响已保存的配置
+    assert user_manager.load_user_profile("ghost")["common_commands"] == {"X": 1}
+    assert user_manager.load_user_profile(DEFAULT_USER_ID) == guest_before
+    user_manager.delete_user("ghost")
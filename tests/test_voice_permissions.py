@@ -0,0 +1,68 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pygame")
+pytest.importorskip("numpy")
+
+RECORD_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "backend", "voice", "record.py")
+
+
+@pytest.fixture(scope="module")
+def record(tmp_path_factory):
+    # 无声卡的环境中用 SDL 的 dummy 音频驱动初始化 mixer；record 在当前目录下创建 temp 目录
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("voice"))
+    try:
+        # 仓库根目录下也有 voice 目录，按文件路径加载 backend 中的 record.py
+        spec = importlib.util.spec_from_file_location("voice.record", RECORD_PATH)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["voice.record"] = module
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(cwd)
+    return module
+
+
+@pytest.fixture
+def executed(record, monkeypatch):
+    commands = []
+    monkeypatch.setattr(record, "execute_command", commands.append)
+    monkeypatch.setattr(record, "_intent_debouncer", record.IntentDebouncer(window=0))
+    yield commands
+    record.assign_seat("driver", None)
+
+
+def test_driver_seat_rejects_unauthorized_command(record, executed):
+    record.assign_seat("driver", "seat_test_passenger", role="passenger")
+    assert record.handle_command_text("打开导航", seat="driver",
+                                      user_id=record.seat_occupancy.user_for("driver")) is None
+    # 单麦克风模式按驾驶位登记的乘员检查
+    assert record.handle_command_text("打开导航", user_id=record._single_mic_user()) is None
+    assert executed == []
+
+
+def test_driver_seat_allows_driver_commands(record, executed):
+    record.assign_seat("driver", "seat_test_driver", role="driver")
+    assert record.handle_command_text("打开导航", user_id=record._single_mic_user()) == "打开导航"
+    assert executed == ["打开导航"]
+
+
+def test_unclaimed_seat_uses_guest_permissions(record, executed):
+    assert record.seat_occupancy.user_for("passenger") == record.DEFAULT_USER_ID
+    assert not record.is_command_permitted("打开导航", record.seat_occupancy.user_for("passenger"))
+    assert record.is_command_permitted("打开音乐", record.seat_occupancy.user_for("passenger"))
+
+
+def test_assign_seat_updates_system_role(record, executed):
+    from system import user_manager
+
+    record.assign_seat("driver", "seat_test_switch", role="driver")
+    assert record.is_command_permitted("打开导航", "seat_test_switch")
+    record.assign_seat("driver", "seat_test_switch", role="passenger")
+    assert user_manager.get_user_role("seat_test_switch") == "passenger"
+    assert not record.is_command_permitted("打开导航", "seat_test_switch")